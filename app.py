@@ -1,8 +1,8 @@
 from __future__ import annotations
 
+import json
 import re
 import sqlite3
-from collections import Counter
 from functools import lru_cache
 from pathlib import Path
 
@@ -169,126 +169,130 @@ def _row_to_dict(row: sqlite3.Row) -> dict:
     return record
 
 
-@lru_cache(maxsize=1)
-def _dataset_summary() -> dict[str, object]:
-    totals = {
-        "total_rows": 0,
-        "unique_tracks": 0,
-        "unique_artists": 0,
-        "average_popularity": None,
-        "average_danceability": None,
-        "average_energy": None,
-        "release_year_range": {"min": None, "max": None},
-    }
-    artist_counter: Counter[str] = Counter()
-    genre_counter: Counter[str] = Counter()
-    yearly_counter: Counter[int] = Counter()
-
-    pop_sum = 0.0
-    pop_count = 0
-    dance_sum = 0.0
-    dance_count = 0
-    energy_sum = 0.0
-    energy_count = 0
+SUMMARY_TABLE = "dataset_summary"
+SUMMARY_KEY = "summary"
 
-    seen_tracks = set()
-    seen_artists = set()
 
+def _load_summary_sidecar() -> dict[str, object] | None:
     with _connect() as conn:
-        cursor = conn.execute(
+        try:
+            row = conn.execute(
+                f'SELECT payload FROM "{SUMMARY_TABLE}" WHERE key = ?',
+                (SUMMARY_KEY,),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    if not row:
+        return None
+    try:
+        return json.loads(row["payload"])
+    except json.JSONDecodeError:
+        return None
+
+
+def _store_summary_sidecar(summary: dict[str, object]) -> None:
+    try:
+        with _connect() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{SUMMARY_TABLE}" (key TEXT PRIMARY KEY, payload TEXT NOT NULL)'
+            )
+            conn.execute(
+                f'INSERT OR REPLACE INTO "{SUMMARY_TABLE}" (key, payload) VALUES (?, ?)',
+                (SUMMARY_KEY, json.dumps(summary)),
+            )
+    except sqlite3.Error:
+        # Read-only datasets still work; every worker just recomputes once.
+        pass
+
+
+def _compute_dataset_summary() -> dict[str, object]:
+    with _connect() as conn:
+        totals_row = conn.execute(
             """
             SELECT
-                "Track URI",
-                "Artist Name(s)",
-                "Genres",
-                "Release Year",
-                "Popularity",
-                "Danceability",
-                "Energy"
+                COUNT(*),
+                COUNT(DISTINCT "Track URI"),
+                COUNT(DISTINCT NULLIF("Artist Name(s)", '')),
+                AVG("Popularity"),
+                AVG("Danceability"),
+                AVG("Energy"),
+                MIN("Release Year"),
+                MAX("Release Year")
             FROM tracks
             """
-        )
-        while True:
-            rows = cursor.fetchmany(10000)
-            if not rows:
-                break
-            for row in rows:
-                totals["total_rows"] += 1
-                track_uri = row["Track URI"]
-                artist = row["Artist Name(s)"] or ""
-
-                if track_uri not in seen_tracks:
-                    seen_tracks.add(track_uri)
-                if artist:
-                    artist_counter[artist] += 1
-                    if artist not in seen_artists:
-                        seen_artists.add(artist)
-
-                if row["Popularity"] is not None:
-                    pop_sum += row["Popularity"]
-                    pop_count += 1
-                if row["Danceability"] is not None:
-                    dance_sum += row["Danceability"]
-                    dance_count += 1
-                if row["Energy"] is not None:
-                    energy_sum += row["Energy"]
-                    energy_count += 1
-
-                if row["Release Year"] is not None:
-                    year = int(row["Release Year"])
-                    yearly_counter[year] += 1
-
-                genres = row["Genres"] or ""
-                for genre in genres.split(","):
-                    genre = genre.strip()
-                    if genre:
-                        genre_counter[genre] += 1
-
-    totals["unique_tracks"] = len(seen_tracks)
-    totals["unique_artists"] = len(seen_artists)
-    if pop_count:
-        totals["average_popularity"] = round(pop_sum / pop_count, 2)
-    if dance_count:
-        totals["average_danceability"] = round(dance_sum / dance_count, 2)
-    if energy_count:
-        totals["average_energy"] = round(energy_sum / energy_count, 2)
-    if yearly_counter:
-        totals["release_year_range"]["min"] = min(yearly_counter)
-        totals["release_year_range"]["max"] = max(yearly_counter)
-
-    def _top(counter: Counter[str], limit: int) -> list[dict]:
-        return [
-            {"name": name, "count": count}
-            for name, count in counter.most_common(limit)
-        ]
-
-    top_tracks = []
-    with _connect() as conn:
-        rows = conn.execute(
+        ).fetchone()
+        artist_rows = conn.execute(
             """
-            SELECT "Track URI", "Track Name", "Artist Name(s)", "Popularity"
+            SELECT "Artist Name(s)", COUNT(*) AS count
             FROM tracks
-            WHERE "Popularity" IS NOT NULL
-            ORDER BY "Popularity" DESC
+            WHERE "Artist Name(s)" IS NOT NULL AND "Artist Name(s)" != ''
+            GROUP BY "Artist Name(s)"
+            ORDER BY count DESC
             LIMIT 10
             """
         ).fetchall()
-        top_tracks = [dict(row) for row in rows]
+        yearly_rows = conn.execute(
+            """
+            SELECT CAST("Release Year" AS INTEGER) AS year, COUNT(*)
+            FROM tracks
+            WHERE "Release Year" IS NOT NULL
+            GROUP BY year
+            ORDER BY year
+            """
+        ).fetchall()
+        top_tracks = [
+            dict(row)
+            for row in conn.execute(
+                """
+                SELECT "Track URI", "Track Name", "Artist Name(s)", "Popularity"
+                FROM tracks
+                WHERE "Popularity" IS NOT NULL
+                ORDER BY "Popularity" DESC
+                LIMIT 10
+                """
+            ).fetchall()
+        ]
 
-    yearly_release_counts = [
-        {"year": year, "count": count}
-        for year, count in sorted(yearly_counter.items())
-    ]
+        genre_counts = pd.Series(dtype="int64")
+        for chunk in pd.read_sql_query(
+            'SELECT "Genres" FROM tracks WHERE "Genres" IS NOT NULL', conn, chunksize=50_000
+        ):
+            genres = chunk["Genres"].str.split(",").explode().str.strip()
+            genre_counts = genre_counts.add(genres[genres != ""].value_counts(), fill_value=0)
 
+    def _rounded(value: float | None) -> float | None:
+        return round(value, 2) if value is not None else None
+
+    top_genres = genre_counts.sort_values(ascending=False, kind="stable").head(15)
     return {
-        "totals": totals,
-        "top_artists": _top(artist_counter, 10),
-        "top_genres": _top(genre_counter, 15),
-        "yearly_release_counts": yearly_release_counts,
+        "totals": {
+            "total_rows": totals_row[0],
+            "unique_tracks": totals_row[1],
+            "unique_artists": totals_row[2],
+            "average_popularity": _rounded(totals_row[3]),
+            "average_danceability": _rounded(totals_row[4]),
+            "average_energy": _rounded(totals_row[5]),
+            "release_year_range": {
+                "min": int(totals_row[6]) if totals_row[6] is not None else None,
+                "max": int(totals_row[7]) if totals_row[7] is not None else None,
+            },
+        },
+        "top_artists": [{"name": row[0], "count": row[1]} for row in artist_rows],
+        "top_genres": [{"name": str(name), "count": int(count)} for name, count in top_genres.items()],
+        "yearly_release_counts": [{"year": row[0], "count": row[1]} for row in yearly_rows],
         "top_tracks": top_tracks,
     }
 
 
+@lru_cache(maxsize=1)
+def _dataset_summary() -> dict[str, object]:
+    summary = _load_summary_sidecar()
+    if summary is None:
+        summary = _compute_dataset_summary()
+        _store_summary_sidecar(summary)
+    return summary
+
+
 @lru_cache(maxsize=1)
 def _has_search_text_column() -> bool:
     with _connect() as conn:
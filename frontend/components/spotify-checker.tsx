@@ -15,6 +15,14 @@ type CountStat = DatasetStats["top_artists"][number];
 type YearlyCount = DatasetStats["yearly_release_counts"][number];
 type TopTrack = DatasetStats["top_tracks"][number];
 
+interface SyncStatus {
+  state: "idle" | "queued" | "running" | "done" | "failed";
+  stage?: string | null;
+  progress: number;
+  error?: string | null;
+  synced_at?: number | null;
+}
+
 interface PlaylistSummary {
   id: string;
   name: string;
@@ -36,6 +44,8 @@ export function SpotifyChecker() {
   const [playlistStats, setPlaylistStats] = React.useState<Record<string, DatasetStats>>({});
   const [playlistStatsLoading, setPlaylistStatsLoading] = React.useState(false);
   const [view, setView] = React.useState<"overview" | "playlists">("overview");
+  const [syncStatus, setSyncStatus] = React.useState<SyncStatus | null>(null);
+  const syncActive = syncStatus?.state === "queued" || syncStatus?.state === "running";
 
   React.useEffect(() => {
     if (typeof window === "undefined") return;
@@ -78,11 +88,18 @@ export function SpotifyChecker() {
     setPlaylistsLoading(true);
     setPlaylistError(null);
     try {
-      const resp = await fetch(`${API_BASE}/auth/spotify/users/${profile.id}/playlists`, { cache: "no-store" });
+      const [resp, statsResp] = await Promise.all([
+        fetch(`${API_BASE}/auth/spotify/users/${profile.id}/playlists`, { cache: "no-store" }),
+        fetch(`${API_BASE}/auth/spotify/users/${profile.id}/playlists/stats`, { cache: "no-store" }).catch(() => null),
+      ]);
       const payload = await resp.json();
       if (!resp.ok) {
         throw new Error((payload as { detail?: string })?.detail ?? "Unable to load playlists");
       }
+      if (statsResp?.ok) {
+        const entries = (await statsResp.json()) as { playlist_id: string; stats: DatasetStats }[];
+        setPlaylistStats(Object.fromEntries(entries.map((entry) => [entry.playlist_id, entry.stats])));
+      }
       const data = payload as PlaylistSummary[];
       setPlaylists(data);
       if (data.length > 0) {
@@ -144,12 +161,46 @@ export function SpotifyChecker() {
     [profile?.id, playlistTracks, playlistStats]
   );
 
+  const fetchSyncStatus = React.useCallback(
+    async (method: "GET" | "POST" = "GET") => {
+      if (!profile?.id) return;
+      try {
+        const resp = await fetch(`${API_BASE}/auth/spotify/users/${profile.id}/sync`, { method, cache: "no-store" });
+        if (resp.ok) {
+          setSyncStatus((await resp.json()) as SyncStatus);
+        }
+      } catch {
+        // status polling is best effort
+      }
+    },
+    [profile?.id]
+  );
+
   React.useEffect(() => {
     if (profile?.id) {
       void fetchStats();
       void fetchPlaylists();
+      void fetchSyncStatus();
+    }
+  }, [profile?.id, fetchStats, fetchPlaylists, fetchSyncStatus]);
+
+  // Endpoints serve the last synced library; poll the background sync and reload once it lands.
+  const wasSyncing = React.useRef(false);
+  React.useEffect(() => {
+    if (syncActive) {
+      wasSyncing.current = true;
+      const timer = window.setTimeout(() => void fetchSyncStatus(), 1500);
+      return () => window.clearTimeout(timer);
+    }
+    if (wasSyncing.current && syncStatus?.state === "done") {
+      wasSyncing.current = false;
+      setPlaylistStats({});
+      setPlaylistTracks({});
+      void fetchStats();
+      void fetchPlaylists();
     }
-  }, [profile?.id, fetchStats, fetchPlaylists]);
+    return undefined;
+  }, [syncActive, syncStatus, fetchSyncStatus, fetchStats, fetchPlaylists]);
 
   React.useEffect(() => {
     if (activePlaylistId) {
@@ -194,8 +245,8 @@ export function SpotifyChecker() {
           <p className="text-sm text-white/70">View stats from your synced Spotify library.</p>
         </div>
         {connected ? (
-          <Button onClick={fetchStats} variant="secondary" disabled={loading}>
-            {loading ? "Syncing…" : "Sync library"}
+          <Button onClick={() => void fetchSyncStatus("POST")} variant="secondary" disabled={syncActive}>
+            {syncActive ? "Syncing…" : "Sync library"}
           </Button>
         ) : (
           <Button variant="primary" onClick={connect}>
@@ -203,10 +254,21 @@ export function SpotifyChecker() {
           </Button>
         )}
       </div>
-      {error && <p className="text-sm text-red-300">{error}</p>}
+      {error && !syncActive && <p className="text-sm text-red-300">{error}</p>}
+      {syncStatus?.state === "failed" && syncStatus.error && (
+        <p className="text-sm text-red-300">{syncStatus.error}</p>
+      )}
       {!connected && <p className="text-sm text-white/60">Connect Spotify to audit your personal listening stats.</p>}
-      {loading && connected && <p className="text-sm text-white/60">Syncing your latest listening history…</p>}
-      {connected && !loading && !stats && !error && <p className="text-sm text-white/60">No Spotify data synced yet.</p>}
+      {syncActive && connected && (
+        <p className="text-sm text-white/60">
+          Syncing your latest listening history… {syncStatus?.stage ? `${syncStatus.stage}, ` : ""}
+          {Math.round((syncStatus?.progress ?? 0) * 100)}%
+        </p>
+      )}
+      {loading && connected && !syncActive && <p className="text-sm text-white/60">Loading your library stats…</p>}
+      {connected && !loading && !syncActive && !stats && !error && (
+        <p className="text-sm text-white/60">No Spotify data synced yet.</p>
+      )}
 
       <div className="flex gap-3 text-xs uppercase tracking-[0.25rem] text-white/60">
         <button
@@ -2,7 +2,9 @@
 """Convert the Spotify CSV dataset into a SQLite database.
 
 Running this script will read the CSV file in chunks, write it to a SQLite
-database, and add a few helpful indexes for fast lookups.
+database, and add a few helpful indexes for fast lookups. Dataset summary
+statistics are accumulated per chunk and stored in a ``dataset_summary``
+table so the Flask app does not need to scan every row on startup.
 
 Usage:
     python scripts/csv_to_sqlite.py \
@@ -13,6 +15,7 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import json
 import sqlite3
 from pathlib import Path
 
@@ -23,6 +26,94 @@ DEFAULT_CSV = Path("data/combined_spotify_tracks.csv")
 DEFAULT_SQLITE = Path("data/combined_spotify_tracks.sqlite")
 TABLE_NAME = "tracks"
 CHUNK_SIZE = 50_000
+SUMMARY_TABLE = "dataset_summary"
+SUMMARY_KEY = "summary"
+
+
+class SummaryAccumulator:
+    """Fold per-chunk column aggregates into the `/stats` payload shape."""
+
+    def __init__(self) -> None:
+        self.total_rows = 0
+        self.track_uris: set[str] = set()
+        self.artist_counts = pd.Series(dtype="int64")
+        self.genre_counts = pd.Series(dtype="int64")
+        self.year_counts = pd.Series(dtype="int64")
+        self.sums = {"Popularity": 0.0, "Danceability": 0.0, "Energy": 0.0}
+        self.counts = {"Popularity": 0, "Danceability": 0, "Energy": 0}
+        self.top_tracks = pd.DataFrame()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.total_rows += len(chunk)
+        self.track_uris.update(chunk["Track URI"].dropna().unique())
+
+        artists = chunk["Artist Name(s)"].dropna()
+        artists = artists[artists != ""]
+        self.artist_counts = self.artist_counts.add(artists.value_counts(), fill_value=0)
+
+        genres = chunk["Genres"].dropna().str.split(",").explode().str.strip()
+        genres = genres[genres != ""]
+        self.genre_counts = self.genre_counts.add(genres.value_counts(), fill_value=0)
+
+        years = pd.to_numeric(chunk["Release Year"], errors="coerce").dropna().astype("int64")
+        self.year_counts = self.year_counts.add(years.value_counts(), fill_value=0)
+
+        for column in self.sums:
+            values = pd.to_numeric(chunk[column], errors="coerce")
+            self.sums[column] += float(values.sum())
+            self.counts[column] += int(values.count())
+
+        columns = ["Track URI", "Track Name", "Artist Name(s)", "Popularity"]
+        ranked = chunk[columns].assign(Popularity=pd.to_numeric(chunk["Popularity"], errors="coerce"))
+        ranked = ranked.dropna(subset=["Popularity"]).nlargest(10, "Popularity")
+        self.top_tracks = pd.concat([self.top_tracks, ranked]).nlargest(10, "Popularity")
+
+    def _average(self, column: str) -> float | None:
+        if not self.counts[column]:
+            return None
+        return round(self.sums[column] / self.counts[column], 2)
+
+    @staticmethod
+    def _top(counts: pd.Series, limit: int) -> list[dict]:
+        top = counts.sort_values(ascending=False, kind="stable").head(limit)
+        return [{"name": str(name), "count": int(count)} for name, count in top.items()]
+
+    def summary(self) -> dict[str, object]:
+        years = self.year_counts.sort_index()
+        top_tracks = [
+            {key: (None if pd.isna(value) else value) for key, value in row.items()}
+            for row in self.top_tracks.to_dict("records")
+        ]
+        return {
+            "totals": {
+                "total_rows": self.total_rows,
+                "unique_tracks": len(self.track_uris),
+                "unique_artists": int(len(self.artist_counts)),
+                "average_popularity": self._average("Popularity"),
+                "average_danceability": self._average("Danceability"),
+                "average_energy": self._average("Energy"),
+                "release_year_range": {
+                    "min": int(years.index.min()) if len(years) else None,
+                    "max": int(years.index.max()) if len(years) else None,
+                },
+            },
+            "top_artists": self._top(self.artist_counts, 10),
+            "top_genres": self._top(self.genre_counts, 15),
+            "yearly_release_counts": [
+                {"year": int(year), "count": int(count)} for year, count in years.items()
+            ],
+            "top_tracks": top_tracks,
+        }
+
+
+def write_summary(conn: sqlite3.Connection, summary: dict[str, object]) -> None:
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{SUMMARY_TABLE}" (key TEXT PRIMARY KEY, payload TEXT NOT NULL)'
+    )
+    conn.execute(
+        f'INSERT OR REPLACE INTO "{SUMMARY_TABLE}" (key, payload) VALUES (?, ?)',
+        (SUMMARY_KEY, json.dumps(summary)),
+    )
 
 
 def convert(csv_path: Path, sqlite_path: Path, chunksize: int = CHUNK_SIZE) -> None:
@@ -40,6 +131,7 @@ def convert(csv_path: Path, sqlite_path: Path, chunksize: int = CHUNK_SIZE) -> N
 
     chunks = pd.read_csv(csv_path, chunksize=chunksize)
     total_rows = 0
+    accumulator = SummaryAccumulator()
 
     for chunk in chunks:
         chunk["search_text"] = (
@@ -50,9 +142,11 @@ def convert(csv_path: Path, sqlite_path: Path, chunksize: int = CHUNK_SIZE) -> N
             + chunk["Album Name"].fillna("").str.lower()
         )
         chunk.to_sql(TABLE_NAME, conn, if_exists="append", index=False)
+        accumulator.update(chunk)
         total_rows += len(chunk)
         print(f"Inserted {total_rows:,} rows...", flush=True)
 
+    write_summary(conn, accumulator.summary())
     conn.commit()
     conn.close()
 
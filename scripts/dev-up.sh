@@ -88,7 +88,7 @@ fi
 
 if [ "${AUTO_IMPORT_DATA:-0}" = "1" ]; then
   echo "[dev] Importing dataset into Postgres"
-  uv run --project services/api-gateway python services/api-gateway/scripts/import_sqlite.py --create-schema --postgres-url "$DATABASE_URL" || true
+  uv run --project services/api-gateway --group scripts python services/api-gateway/scripts/import_sqlite.py --create-schema --postgres-url "$DATABASE_URL" || true
 fi
 
 start_service() {
@@ -10,17 +10,29 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...cache import get_client
 from ...config import get_settings
+from ...coordination import mark, take
 from ...db import get_session, session_scope
 from ...models import PlaylistTrack, SpotifyToken, SpotifyUser, Track, UserPlaylist
-from ...schemas import SpotifySeedTrack, SpotifyUserPlaylist, StatsResponse, TrackSummary
-from ...services.spotify import SpotifyServiceError, fetch_spotify_seed_tracks, sync_user_library
-from ...services.user_stats import compute_user_library_stats, compute_playlist_stats
+from ...schemas import (
+    SketchSummary,
+    SpotifyPlaylistStats,
+    SpotifySeedTrack,
+    SpotifyUserPlaylist,
+    StatsComparisonResponse,
+    StatsResponse,
+    SyncStatus,
+    TrackSummary,
+)
+from ...services.quantiles import compare_user_to_catalog
+from ...services.sketch_store import playlist_scope, union_summary, user_scope
+from ...services.spotify import SpotifyServiceError, fetch_spotify_seed_tracks
+from ...services.spotify_tokens import cache_access_token
+from ...services.user_stats import compute_user_library_stats, compute_playlist_stats, load_playlist_stats
+from ...sync_queue import get_sync_status, request_sync
 from ...utils import to_summary_schema
 
 STATE_TTL_SECONDS = 600
-_state_memory: dict[str, float] = {}
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -33,27 +45,12 @@ def _require_spotify_settings():
 
 
 async def _store_state_token(state: str) -> None:
-    client = await get_client()
-    key = f"spotify:state:{state}"
-    if client:
-        await client.setex(key, STATE_TTL_SECONDS, "1")
-    else:
-        _state_memory[state] = time.time() + STATE_TTL_SECONDS
+    await mark(f"spotify:state:{state}", STATE_TTL_SECONDS)
 
 
 async def _validate_state_token(state: str) -> None:
-    client = await get_client()
-    key = f"spotify:state:{state}"
-    if client:
-        exists = await client.get(key)
-        if not exists:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid OAuth state")
-        await client.delete(key)
-        return
-    expiry = _state_memory.get(state)
-    if not expiry or expiry < time.time():
+    if not await take(f"spotify:state:{state}"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid OAuth state")
-    _state_memory.pop(state, None)
 
 
 @router.get("/spotify/login")
@@ -149,6 +146,7 @@ async def _persist_tokens(profile: dict, token_data: dict) -> None:
             token.expires_at = expires_at
 
         await session.commit()
+    await cache_access_token(user_id, token_data.get("access_token"), expires_at)
 
 
 @router.get("/spotify/users/{user_id}/top-tracks", response_model=list[SpotifySeedTrack])
@@ -164,24 +162,52 @@ async def spotify_user_top_tracks(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
+@router.get("/spotify/users/{user_id}/sync", response_model=SyncStatus)
+async def spotify_user_sync_status(
+    user_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> SyncStatus:
+    return await get_sync_status(session, user_id)
+
+
+@router.post("/spotify/users/{user_id}/sync", response_model=SyncStatus, status_code=status.HTTP_202_ACCEPTED)
+async def spotify_user_sync(
+    user_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> SyncStatus:
+    return await request_sync(session, user_id, force=True)
+
+
 @router.get("/spotify/users/{user_id}/stats", response_model=StatsResponse)
 async def spotify_user_stats(
     user_id: str,
     session: AsyncSession = Depends(get_session),
 ) -> StatsResponse:
-    await sync_user_library(session, user_id)
+    await request_sync(session, user_id)
     stats = await compute_user_library_stats(session, user_id)
     if stats.totals.total_rows == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No Spotify data synced for this user")
     return stats
 
 
+@router.get("/spotify/users/{user_id}/stats/compare", response_model=StatsComparisonResponse)
+async def spotify_user_stats_compare(
+    user_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> StatsComparisonResponse:
+    await request_sync(session, user_id)
+    comparison = await compare_user_to_catalog(session, user_id)
+    if comparison.tracks == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No Spotify data synced for this user")
+    return comparison
+
+
 @router.get("/spotify/users/{user_id}/playlists", response_model=list[SpotifyUserPlaylist])
 async def spotify_user_playlists(
     user_id: str,
     session: AsyncSession = Depends(get_session),
 ) -> list[SpotifyUserPlaylist]:
-    await sync_user_library(session, user_id)
+    await request_sync(session, user_id)
     rows = (
         await session.execute(
             select(UserPlaylist).where(UserPlaylist.user_id == user_id)
@@ -193,13 +219,22 @@ async def spotify_user_playlists(
     ]
 
 
+@router.get("/spotify/users/{user_id}/playlists/stats", response_model=list[SpotifyPlaylistStats])
+async def spotify_user_playlists_stats(
+    user_id: str,
+    session: AsyncSession = Depends(get_session),
+) -> list[SpotifyPlaylistStats]:
+    await request_sync(session, user_id)
+    return await load_playlist_stats(session, user_id)
+
+
 @router.get("/spotify/users/{user_id}/playlists/{playlist_id}/tracks", response_model=list[TrackSummary])
 async def spotify_user_playlist_tracks(
     user_id: str,
     playlist_id: str,
     session: AsyncSession = Depends(get_session),
 ) -> list[TrackSummary]:
-    await sync_user_library(session, user_id)
+    await request_sync(session, user_id)
     rows = (
         await session.execute(
             select(Track)
@@ -217,8 +252,23 @@ async def spotify_user_playlist_stats(
     playlist_id: str,
     session: AsyncSession = Depends(get_session),
 ) -> StatsResponse:
-    await sync_user_library(session, user_id)
+    await request_sync(session, user_id)
     stats = await compute_playlist_stats(session, user_id, playlist_id)
     if stats.totals.total_rows == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Playlist not found or empty")
     return stats
+
+
+@router.get("/spotify/analytics/union", response_model=SketchSummary)
+async def spotify_union_analytics(
+    user_ids: list[str] = Query(default_factory=list),
+    playlist_ids: list[str] = Query(default_factory=list),
+    session: AsyncSession = Depends(get_session),
+) -> SketchSummary:
+    scopes = [user_scope(user_id) for user_id in user_ids] + [playlist_scope(playlist_id) for playlist_id in playlist_ids]
+    if not scopes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide at least one user or playlist")
+    summary = await union_summary(session, scopes)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No analytics synced for the requested scopes")
+    return summary
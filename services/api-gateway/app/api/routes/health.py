@@ -1,8 +1,15 @@
 from fastapi import APIRouter
 
+from ...services.spotify_client import spotify_metrics
+
 router = APIRouter()
 
 
 @router.get("", summary="Health check")
 async def read_health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/spotify", summary="Spotify client throughput and throttling")
+async def read_spotify_health() -> dict[str, object]:
+    return spotify_metrics()
@@ -80,6 +80,7 @@ async def recommend_endpoint(
         limit=25,
         spotify_user_id=payload.spotify_user_id,
         seed_limit=payload.seed_limit,
+        diversity=payload.diversity,
     )
     return recs
 
@@ -19,6 +19,12 @@ class Settings(BaseSettings):
     spotify_client_id: Optional[str] = Field(default=None, description="Spotify application client ID")
     spotify_client_secret: Optional[str] = Field(default=None, description="Spotify application client secret")
     spotify_redirect_uri: Optional[str] = Field(default=None, description="Spotify OAuth redirect URI")
+    spotify_api_base_url: str = Field("https://api.spotify.com/v1", description="Spotify Web API base URL")
+    spotify_accounts_base_url: str = Field("https://accounts.spotify.com", description="Spotify accounts service URL")
+    spotify_max_concurrency: int = Field(8, description="Maximum in-flight Spotify API requests per process")
+    spotify_requests_per_second: float = Field(20.0, description="Sustained Spotify request rate per process")
+    spotify_burst: int = Field(20, description="Spotify requests allowed in a burst above the sustained rate")
+    spotify_max_retries: int = Field(3, description="Retries for throttled or failed Spotify requests")
     spotify_scopes: str = Field(
         default="user-read-email user-read-recently-played user-top-read playlist-read-private",
         description="Space separated Spotify scopes"
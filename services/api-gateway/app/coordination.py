@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Generic, List, Optional, Set, Tuple, TypeVar
+
+from .cache import get_client
+
+_logger = logging.getLogger(__name__)
+
+MIRROR_MAX_ENTRIES = 10_000
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+V = TypeVar("V")
+
+
+class TTLMirror(Generic[V]):
+    """Bounded LRU of expiring values; the process-local view of shared Redis keys."""
+
+    def __init__(self, max_entries: int = MIRROR_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: V, ttl_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def keys(self) -> List[str]:
+        now = time.monotonic()
+        return [key for key, (expires_at, _) in self._entries.items() if expires_at > now]
+
+    def pop(self, key: str) -> Optional[V]:
+        value = self.get(key)
+        self._entries.pop(key, None)
+        return value
+
+
+_marks: TTLMirror[bool] = TTLMirror()
+_local_locks: Set[str] = set()
+
+
+async def mark(key: str, ttl_seconds: int) -> None:
+    """Set a fleet-wide flag that expires after ``ttl_seconds``."""
+    _marks.set(key, True, ttl_seconds)
+    client = await get_client()
+    if client:
+        await client.set(key, "1", ex=ttl_seconds)
+
+
+async def is_marked(key: str) -> bool:
+    if _marks.get(key):
+        return True
+    client = await get_client()
+    if not client:
+        return False
+    remaining_ms = await client.pttl(key)
+    if remaining_ms and remaining_ms > 0:
+        _marks.set(key, True, remaining_ms / 1000)
+        return True
+    return False
+
+
+async def take(key: str) -> bool:
+    """Consume a one-shot flag; only the first caller across the fleet gets ``True``."""
+    local = bool(_marks.pop(key))
+    client = await get_client()
+    if client:
+        return bool(await client.delete(key))
+    return local
+
+
+async def _keep_lock(client, key: str, token: str, ttl_seconds: int) -> None:
+    while True:
+        await asyncio.sleep(ttl_seconds / 3)
+        try:
+            if not await client.eval(_RENEW_LOCK_SCRIPT, 1, key, token, int(ttl_seconds * 1000)):
+                _logger.warning("Lost lock %s while holding it", key)
+                return
+        except Exception as exc:  # pragma: no cover - retry on the next beat
+            _logger.debug("Failed to renew lock %s: %s", key, exc)
+
+
+@asynccontextmanager
+async def distributed_lock(key: str, ttl_seconds: int, renew: bool = False) -> AsyncIterator[bool]:
+    """Try to hold ``key`` fleet-wide for at most ``ttl_seconds``; yields whether it was acquired.
+
+    With ``renew`` the TTL is extended every third of it for as long as the block runs, so
+    long jobs keep the lock while a crashed holder still loses it after ``ttl_seconds``.
+    Without Redis the lock only covers this process.
+    """
+    client = await get_client()
+    token = secrets.token_hex(8)
+    if client:
+        acquired = bool(await client.set(key, token, nx=True, ex=ttl_seconds))
+    else:
+        acquired = key not in _local_locks
+        if acquired:
+            _local_locks.add(key)
+    keeper = asyncio.create_task(_keep_lock(client, key, token, ttl_seconds)) if acquired and client and renew else None
+    try:
+        yield acquired
+    finally:
+        if keeper is not None:
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+        if acquired:
+            if client:
+                try:
+                    await client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+                except Exception as exc:  # pragma: no cover - the TTL releases it anyway
+                    _logger.debug("Failed to release lock %s: %s", key, exc)
+            else:
+                _local_locks.discard(key)
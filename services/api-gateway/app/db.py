@@ -5,6 +5,7 @@ from contextlib import asynccontextmanager
 from typing import Optional
 from urllib.parse import parse_qsl, urlencode, urlsplit
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -12,6 +13,23 @@ from .config import get_settings
 from .models import Base
 
 
+# Serialises dense id assignment between gateway workers and the importer (pg_advisory_xact_lock).
+TRACK_IDS_LOCK_KEY = 0x7472_6964
+
+# Gives every track without one the next dense id; existing ids never change.
+ASSIGN_TRACK_IDS_SQL = """
+WITH numbered AS (
+    SELECT "Track URI" AS uri,
+           (SELECT COALESCE(MAX("track_id"), 0) FROM "tracks")
+           + ROW_NUMBER() OVER (ORDER BY "Track URI") AS track_id
+    FROM "tracks"
+    WHERE "track_id" IS NULL
+)
+UPDATE "tracks" SET "track_id" = numbered.track_id
+FROM numbered
+WHERE "tracks"."Track URI" = numbered.uri
+"""
+
 _engine: Optional[AsyncEngine] = None
 _session_factory: Optional[sessionmaker] = None
 
@@ -73,3 +91,13 @@ async def init_db() -> None:
     engine = _get_engine()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            # Catalogs imported before dense ids existed get the column; the importer fills it.
+            await conn.execute(text('ALTER TABLE tracks ADD COLUMN IF NOT EXISTS track_id INTEGER'))
+            await conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_tracks_track_id ON tracks (track_id)'))
+        # Catalogs loaded other than through the importer get their ids here. The check keeps the
+        # common startup read-only; the lock keeps workers from racing on MAX(track_id).
+        if await conn.scalar(text('SELECT EXISTS (SELECT 1 FROM "tracks" WHERE "track_id" IS NULL)')):
+            if conn.dialect.name == "postgresql":
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": TRACK_IDS_LOCK_KEY})
+            await conn.execute(text(ASSIGN_TRACK_IDS_SQL))
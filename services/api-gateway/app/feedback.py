@@ -1,26 +1,215 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import os
+import socket
 import time
-from typing import List
+from typing import List, Optional
+
+from sqlalchemy import insert
 
 from .cache import get_client
+from .db import session_scope
+from .models import TrackFeedbackEvent
 from .schemas import TrackFeedback
+from .services.exclusions import queue_exclusion
+
+_logger = logging.getLogger(__name__)
+
+_STREAM_KEY = "feedback:stream:v1"
+_STREAM_MAXLEN = 100_000
+_CONSUMER_GROUP = "feedback-sink"
+_CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+_CLAIM_IDLE_MS = 60_000
+
+# Bandit counters read by the ML service's Thompson sampler.
+_TRACK_COUNTERS_KEY = "bandit:tracks:v1"
+_SEED_COUNTERS_PREFIX = "bandit:seed:v1:"
 
-_MEMORY_BUFFER: List[dict] = []
-_MAX_BUFFER = 200
-_REDIS_KEY = "feedback:tracks:v1"
+_QUEUE_SIZE = 10_000
+_BATCH_SIZE = 500
+_FLUSH_INTERVAL = 0.25  # seconds
+_SINK_BATCH_SIZE = 1_000
+
+_COPY_COLUMNS = ('"Track URI"', "verdict", "spotify_user_id", "seed_context", "notes", "created_at")
+
+# Queued after the last event on shutdown; the writer flushes what it holds and exits.
+_STOP: dict = {}
+
+_queue: Optional[asyncio.Queue[dict]] = None
+_writer: Optional[asyncio.Task] = None
+_tasks: List[asyncio.Task] = []
+_overflowed = 0
 
 
 async def record_feedback(payload: TrackFeedback) -> None:
+    """Buffer a feedback event; batches are written behind the request path.
+
+    When the buffer is full the event is written inline rather than making the request wait for space.
+    """
+    global _overflowed
     entry = payload.model_dump()
     entry["ts"] = time.time()
+    if _queue is None:
+        await _flush([entry])
+        return
+    try:
+        _queue.put_nowait(entry)
+    except asyncio.QueueFull:
+        _overflowed += 1
+        if _overflowed == 1 or _overflowed % 1000 == 0:
+            _logger.warning("Feedback buffer full; %d events written inline so far", _overflowed)
+        await _flush([entry])
+
+
+async def start_feedback_writer() -> None:
+    global _queue, _writer
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    _writer = asyncio.create_task(_flush_loop(_queue))
+    if await get_client():
+        _tasks.append(asyncio.create_task(_consume_loop()))
+
+
+async def stop_feedback_writer() -> None:
+    """Flush the writer's in-flight batch and everything still queued before returning."""
+    global _queue, _writer
+    queue, writer = _queue, _writer
+    _queue, _writer = None, None
+    if queue is not None and writer is not None and not writer.done():
+        await queue.put(_STOP)
+        await asyncio.gather(writer, return_exceptions=True)
+    # The sink consumer only acks what it has written; unread stream entries wait for the next consumer.
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    if queue is None:
+        return
+    remaining: List[dict] = []
+    while not queue.empty():
+        entry = queue.get_nowait()
+        if entry is not _STOP:
+            remaining.append(entry)
+    if remaining:
+        await _flush(remaining)
+
+
+async def _flush_loop(queue: asyncio.Queue[dict]) -> None:
+    stopping = False
+    while not stopping:
+        entry = await queue.get()
+        if entry is _STOP:
+            return
+        batch = [entry]
+        deadline = time.monotonic() + _FLUSH_INTERVAL
+        while len(batch) < _BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if entry is _STOP:
+                stopping = True
+                break
+            batch.append(entry)
+        try:
+            await _flush(batch)
+        except Exception as exc:  # pragma: no cover - keep the writer alive
+            _logger.warning("Dropped %d feedback events: %s", len(batch), exc)
+
+
+async def _flush(batch: List[dict]) -> None:
+    client = await get_client()
+    if not client:
+        await _write_to_sink(batch)
+        return
+
+    async with client.pipeline(transaction=False) as pipe:
+        for entry in batch:
+            pipe.xadd(_STREAM_KEY, {"data": json.dumps(entry)}, maxlen=_STREAM_MAXLEN, approximate=True)
+            field = f"{entry['track_uri']}:{entry['verdict']}"
+            pipe.hincrby(_TRACK_COUNTERS_KEY, field, 1)
+            for seed_uri in dict.fromkeys(entry.get("seed_context") or []):
+                pipe.hincrby(f"{_SEED_COUNTERS_PREFIX}{seed_uri}", field, 1)
+            if entry["verdict"] == "down" and entry.get("spotify_user_id"):
+                queue_exclusion(pipe, entry["spotify_user_id"], entry["track_uri"])
+        await pipe.execute()
+
+
+async def _consume_loop() -> None:
     client = await get_client()
-    if client:
-        await client.lpush(_REDIS_KEY, json.dumps(entry))
-        await client.ltrim(_REDIS_KEY, 0, 999)
+    if not client:
         return
+    try:
+        await client.xgroup_create(_STREAM_KEY, _CONSUMER_GROUP, id="0", mkstream=True)
+    except Exception as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+    while True:
+        try:
+            # Adopt batches left pending by crashed consumers before reading new ones.
+            _, claimed, *_ = await client.xautoclaim(
+                _STREAM_KEY, _CONSUMER_GROUP, _CONSUMER_NAME, _CLAIM_IDLE_MS, count=_SINK_BATCH_SIZE
+            )
+            messages = [entry for entry in claimed if entry and entry[1]]
+            if not messages:
+                response = await client.xreadgroup(
+                    _CONSUMER_GROUP,
+                    _CONSUMER_NAME,
+                    {_STREAM_KEY: ">"},
+                    count=_SINK_BATCH_SIZE,
+                    block=1000,
+                )
+                messages = [message for _, stream_messages in response or [] for message in stream_messages]
+            if not messages:
+                continue
+            entries = []
+            for _, fields in messages:
+                try:
+                    entries.append(json.loads(fields["data"]))
+                except (KeyError, json.JSONDecodeError):
+                    continue
+            await _write_to_sink(entries)
+            await client.xack(_STREAM_KEY, _CONSUMER_GROUP, *[message_id for message_id, _ in messages])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - retry on the next poll
+            _logger.warning("Feedback sink iteration failed: %s", exc)
+            await asyncio.sleep(1.0)
+
 
-    _MEMORY_BUFFER.insert(0, entry)
-    if len(_MEMORY_BUFFER) > _MAX_BUFFER:
-        _MEMORY_BUFFER.pop()
+def _to_row(entry: dict) -> tuple:
+    return (
+        entry["track_uri"],
+        entry["verdict"],
+        entry.get("spotify_user_id"),
+        ",".join(entry.get("seed_context") or []) or None,
+        entry.get("notes"),
+        float(entry.get("ts") or time.time()),
+    )
+
+
+async def _write_to_sink(entries: List[dict]) -> None:
+    if not entries:
+        return
+    rows = [_to_row(entry) for entry in entries]
+    async with session_scope() as session:
+        connection = await session.connection()
+        if connection.dialect.name == "postgresql":
+            raw = await connection.get_raw_connection()
+            async with raw.driver_connection.cursor() as cursor:
+                copy_sql = f"COPY {TrackFeedbackEvent.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN"
+                async with cursor.copy(copy_sql) as copy:
+                    for row in rows:
+                        await copy.write_row(row)
+        else:
+            keys = ("track_uri", "verdict", "spotify_user_id", "seed_context", "notes", "created_at")
+            await session.execute(insert(TrackFeedbackEvent), [dict(zip(keys, row)) for row in rows])
+        await session.commit()
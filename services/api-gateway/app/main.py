@@ -8,8 +8,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from .api import api_router
 from .config import get_settings
 from .services.ml_client import close_client as close_ml_client
+from .services.spotify_client import close_client as close_spotify_client
+from .services.spotify_tokens import start_token_refresher, stop_token_refresher
 from .cache import close_client as close_cache_client
 from .db import init_db
+from .feedback import start_feedback_writer, stop_feedback_writer
+from .stats import start_stats_listener, stop_stats_listener
+from .sync_queue import start_sync_workers, stop_sync_workers
 
 
 def create_app() -> FastAPI:
@@ -18,10 +23,19 @@ def create_app() -> FastAPI:
     @asynccontextmanager
     async def lifespan(_: FastAPI):
         await init_db()
+        await start_feedback_writer()
+        await start_stats_listener()
+        await start_sync_workers()
+        await start_token_refresher()
         try:
             yield
         finally:
+            await stop_token_refresher()
+            await stop_sync_workers()
+            await stop_stats_listener()
+            await stop_feedback_writer()
             await close_ml_client()
+            await close_spotify_client()
             await close_cache_client()
 
     app = FastAPI(
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, Float, Integer, Numeric, String
+from sqlalchemy import Column, Float, Index, Integer, LargeBinary, Numeric, String, Text
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -10,6 +10,8 @@ class Track(Base):
     __tablename__ = "tracks"
 
     track_uri = Column("Track URI", String, primary_key=True)
+    # Dense surrogate assigned at ingest; the unique index is the id -> URI direction.
+    track_id = Column("track_id", Integer, nullable=True, unique=True, index=True)
     track_name = Column("Track Name", String, nullable=False)
     album_name = Column("Album Name", String, nullable=True)
     artist_names = Column("Artist Name(s)", String, nullable=True)
@@ -41,6 +43,33 @@ class Track(Base):
         return [genre.strip() for genre in self.genres.split(",") if genre.strip()]
 
 
+class CatalogStats(Base):
+    __tablename__ = "catalog_stats"
+
+    id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    payload = Column(Text, nullable=False)
+    refreshed_at = Column(Float, nullable=False)
+
+
+class AnalyticsSketch(Base):
+    __tablename__ = "analytics_sketches"
+
+    scope = Column(String, primary_key=True)
+    payload = Column(LargeBinary, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+class FeatureDistribution(Base):
+    __tablename__ = "feature_distributions"
+
+    feature = Column(String, primary_key=True)
+    lower = Column(Float, nullable=False)
+    upper = Column(Float, nullable=False)
+    counts = Column(LargeBinary, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
 class SpotifyUser(Base):
     __tablename__ = "spotify_users"
 
@@ -50,6 +79,14 @@ class SpotifyUser(Base):
     followers = Column(Integer, nullable=True)
 
 
+class UserLibraryState(Base):
+    __tablename__ = "user_library_state"
+
+    user_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    synced_at = Column(Float, nullable=True)
+
+
 class SpotifyToken(Base):
     __tablename__ = "spotify_tokens"
 
@@ -70,6 +107,16 @@ class UserPlaylist(Base):
     snapshot_id = Column(String, nullable=True)
 
 
+class PlaylistStats(Base):
+    __tablename__ = "playlist_stats"
+
+    playlist_id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False, index=True)
+    snapshot_id = Column(String, nullable=True)
+    payload = Column(Text, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
 class PlaylistTrack(Base):
     __tablename__ = "playlist_tracks"
 
@@ -83,3 +130,46 @@ class UserTrack(Base):
     user_id = Column(String, primary_key=True)
     track_uri = Column("Track URI", String, primary_key=True)
     weight = Column(Float, nullable=False)
+
+
+class UserSavedTrack(Base):
+    """Full mirror of a user's saved tracks; the newest ``added_at`` is the incremental-sync cursor."""
+
+    __tablename__ = "user_saved_tracks"
+    __table_args__ = (Index("ix_user_saved_tracks_user_added", "user_id", "added_at"),)
+
+    user_id = Column(String, primary_key=True)
+    track_uri = Column("Track URI", String, primary_key=True)
+    added_at = Column(Float, nullable=False)
+    seen_at = Column(Float, nullable=False)
+
+
+class UserSavedTracksState(Base):
+    """Spotify's saved-track total at the last sync and when the mirror was last fully reconciled."""
+
+    __tablename__ = "user_saved_tracks_state"
+
+    user_id = Column(String, primary_key=True)
+    spotify_total = Column(Integer, nullable=False)
+    scanned_at = Column(Float, nullable=False)
+
+
+class UserTasteProfile(Base):
+    __tablename__ = "user_taste_profiles"
+
+    user_id = Column(String, primary_key=True)
+    payload = Column(Text, nullable=False)
+    track_count = Column(Integer, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+class TrackFeedbackEvent(Base):
+    __tablename__ = "track_feedback"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    track_uri = Column("Track URI", String, nullable=False, index=True)
+    verdict = Column(String, nullable=False)
+    spotify_user_id = Column(String, nullable=True, index=True)
+    seed_context = Column(String, nullable=True)
+    notes = Column(String, nullable=True)
+    created_at = Column(Float, nullable=False)
@@ -61,10 +61,35 @@ class StatsResponse(BaseModel):
     top_tracks: List[dict]
 
 
+class FeaturePercentile(BaseModel):
+    feature: str
+    user_mean: Optional[float] = None
+    user_median: Optional[float] = None
+    catalog_median: Optional[float] = None
+    percentile: Optional[float] = None
+    percentile_band: List[float] = Field(default_factory=list)
+
+
+class StatsComparisonResponse(BaseModel):
+    user_id: str
+    tracks: int
+    features: List[FeaturePercentile]
+
+
+class SketchSummary(BaseModel):
+    scopes: List[str]
+    rows: int
+    unique_tracks: int
+    unique_artists: int
+    top_artists: List[dict]
+    top_genres: List[dict]
+
+
 class RecommendationRequest(BaseModel):
     uris: List[str] = Field(default_factory=list)
     spotify_user_id: Optional[str] = None
     seed_limit: int = Field(3, ge=1, le=5)
+    diversity: float = Field(0.0, ge=0.0, le=1.0, description="MMR weight of novelty versus relevance")
 
 
 class RecommendationResponseItem(TrackSummary):
@@ -106,6 +131,22 @@ class SpotifyUserPlaylist(BaseModel):
     tracks: Optional[int] = None
 
 
+class SpotifyPlaylistStats(BaseModel):
+    playlist_id: str
+    snapshot_id: Optional[str] = None
+    stats: StatsResponse
+
+
+class SyncStatus(BaseModel):
+    user_id: str
+    state: str = "idle"  # idle | queued | running | done | failed
+    stage: Optional[str] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    synced_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
+
 class TrackFeedback(BaseModel):
     track_uri: str
     verdict: Literal["up", "down"]
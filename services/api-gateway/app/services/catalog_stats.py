@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import CatalogStats, Track
+from ..schemas import StatsResponse, StatsTotals
+from .quantiles import rebuild_feature_cdfs
+
+CATALOG_STATS_ID = "catalog"
+GENRE_CHUNK_SIZE = 20_000
+
+
+async def genre_histogram(session: AsyncSession, limit: int | None = None) -> List[dict]:
+    """Exact genre counts over the whole catalog.
+
+    Postgres explodes the comma separated column server side; other engines
+    stream it in fixed-size partitions so memory stays bounded by the number
+    of distinct genres rather than the number of rows.
+    """
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql":
+        tokens = (
+            select(func.trim(func.unnest(func.string_to_array(Track.genres, ","))).label("genre"))
+            .where(Track.genres.isnot(None))
+            .subquery()
+        )
+        stmt = (
+            select(tokens.c.genre, func.count())
+            .where(tokens.c.genre != "")
+            .group_by(tokens.c.genre)
+            .order_by(func.count().desc(), tokens.c.genre)
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        rows = (await session.execute(stmt)).all()
+        return [{"name": row[0], "count": int(row[1])} for row in rows]
+
+    counter: Counter[str] = Counter()
+    result = await session.stream(
+        select(Track.genres)
+        .where(Track.genres.isnot(None))
+        .execution_options(yield_per=GENRE_CHUNK_SIZE)
+    )
+    async for partition in result.partitions():
+        counter.update(
+            token
+            for (raw,) in partition
+            for token in (genre.strip() for genre in raw.split(","))
+            if token
+        )
+    return [{"name": name, "count": count} for name, count in counter.most_common(limit)]
+
+
+async def compute_statistics(session: AsyncSession) -> StatsResponse:
+    totals_row = (
+        await session.execute(
+            select(
+                func.count(Track.track_uri),
+                func.count(func.distinct(Track.track_uri)),
+                func.count(func.distinct(Track.artist_names)),
+                func.avg(Track.popularity),
+                func.avg(Track.danceability),
+                func.avg(Track.energy),
+                func.min(Track.release_year),
+                func.max(Track.release_year),
+            )
+        )
+    ).first()
+
+    totals = {
+        "total_rows": int(totals_row[0] or 0),
+        "unique_tracks": int(totals_row[1] or 0),
+        "unique_artists": int(totals_row[2] or 0),
+        "average_popularity": float(totals_row[3]) if totals_row[3] is not None else None,
+        "average_danceability": float(totals_row[4]) if totals_row[4] is not None else None,
+        "average_energy": float(totals_row[5]) if totals_row[5] is not None else None,
+        "release_year_range": {
+            "min": int(totals_row[6]) if totals_row[6] is not None else None,
+            "max": int(totals_row[7]) if totals_row[7] is not None else None,
+        },
+    }
+
+    top_artists_rows = (
+        await session.execute(
+            select(Track.artist_names, func.count())
+            .group_by(Track.artist_names)
+            .order_by(func.count().desc())
+            .limit(10)
+        )
+    ).all()
+    top_artists = [
+        {"name": row[0], "count": int(row[1])}
+        for row in top_artists_rows
+        if row[0]
+    ]
+
+    top_genres = await genre_histogram(session, limit=15)
+
+    yearly_rows = (
+        await session.execute(
+            select(Track.release_year, func.count())
+            .where(Track.release_year.isnot(None))
+            .group_by(Track.release_year)
+            .order_by(Track.release_year)
+        )
+    ).all()
+    yearly_counts = [
+        {"year": int(row[0]), "count": int(row[1])}
+        for row in yearly_rows
+    ]
+
+    top_tracks_rows = (
+        await session.execute(
+            select(Track.track_uri, Track.track_name, Track.artist_names, Track.popularity)
+            .order_by(Track.popularity.desc().nullslast())
+            .limit(10)
+        )
+    ).all()
+    top_tracks = [
+        {
+            "Track URI": row[0],
+            "Track Name": row[1],
+            "Artist Name(s)": row[2],
+            "Popularity": float(row[3]) if row[3] is not None else None,
+        }
+        for row in top_tracks_rows
+    ]
+
+    return StatsResponse(
+        totals=totals,
+        top_artists=top_artists,
+        top_genres=top_genres,
+        yearly_release_counts=yearly_counts,
+        top_tracks=top_tracks,
+    )
+
+
+async def load_catalog_stats(session: AsyncSession) -> Optional[StatsResponse]:
+    row = await session.get(CatalogStats, CATALOG_STATS_ID)
+    if row is None:
+        return None
+    return StatsResponse.model_validate(json.loads(row.payload))
+
+
+async def refresh_catalog_stats(session: AsyncSession) -> StatsResponse:
+    """Recompute the catalog aggregates and feature CDFs and store them under a new version stamp.
+
+    This scans the whole catalog, so only the importer and ``--stats-only`` call it.
+    """
+    stats = await compute_statistics(session)
+    connection = await session.connection()
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    # One upsert, so concurrent refreshes (importer, workers) never race on the first insert.
+    stmt = insert(CatalogStats).values(
+        id=CATALOG_STATS_ID,
+        version=1,
+        payload=json.dumps(stats.model_dump()),
+        refreshed_at=time.time(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogStats.id],
+        set_={
+            "version": CatalogStats.version + 1,
+            "payload": stmt.excluded.payload,
+            "refreshed_at": stmt.excluded.refreshed_at,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+    await rebuild_feature_cdfs(session)
+    return stats
+
+
+def empty_catalog_stats() -> StatsResponse:
+    """What requests see before the importer (or ``--stats-only``) has materialised the row."""
+    return StatsResponse(
+        totals=StatsTotals(
+            total_rows=0,
+            unique_tracks=0,
+            unique_artists=0,
+            average_popularity=None,
+            average_danceability=None,
+            average_energy=None,
+            release_year_range={"min": None, "max": None},
+        ),
+        top_artists=[],
+        top_genres=[],
+        yearly_release_counts=[],
+        top_tracks=[],
+    )
+
+
+async def get_catalog_stats(session: AsyncSession) -> StatsResponse:
+    """Read the materialised stats; a missing row yields empty stats rather than a catalog scan."""
+    return await load_catalog_stats(session) or empty_catalog_stats()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _plus_plus_init(points: np.ndarray, weights: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = np.empty((k, points.shape[1]), dtype=np.float64)
+    centroids[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+    closest = ((points - centroids[0]) ** 2).sum(axis=1)
+    for index in range(1, k):
+        mass = closest * weights
+        total = mass.sum()
+        if total <= 0:
+            # Fewer distinct points than clusters; the duplicates collapse later.
+            centroids[index:] = centroids[index - 1]
+            break
+        centroids[index] = points[rng.choice(len(points), p=mass / total)]
+        closest = np.minimum(closest, ((points - centroids[index]) ** 2).sum(axis=1))
+    return centroids
+
+
+def weighted_kmeans(
+    points: np.ndarray,
+    k: int,
+    weights: Optional[np.ndarray] = None,
+    iterations: int = 25,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cluster ``points`` (n x d) into at most ``k`` groups with weighted Lloyd iterations.
+
+    Returns ``(centroids, shares, labels)``: empty clusters are dropped, ``shares`` are each
+    cluster's fraction of the total weight (largest first) and ``labels`` index ``centroids``.
+    Seeding is k-means++ from a fixed ``seed``, so the same input gives the same clusters.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n == 0:
+        return np.empty((0, points.shape[1] if points.ndim == 2 else 0)), np.empty(0), np.empty(0, dtype=np.int64)
+    weights = np.ones(n) if weights is None else np.clip(np.asarray(weights, dtype=np.float64), 1e-9, None)
+    k = max(1, min(k, n))
+
+    centroids = _plus_plus_init(points, weights, k, np.random.default_rng(seed))
+    labels = np.zeros(n, dtype=np.int64)
+    for iteration in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if iteration and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        mass = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points * weights[:, None])
+        filled = mass > 0
+        centroids[filled] = sums[filled] / mass[filled, None]
+
+    mass = np.bincount(labels, weights=weights, minlength=k)
+    order = [index for index in np.argsort(-mass) if mass[index] > 0]
+    remap = np.full(k, -1, dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return centroids[order], mass[order] / mass.sum(), remap[labels]
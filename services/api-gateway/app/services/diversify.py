@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..models import Track
+
+RankedItem = Tuple[Track, float, Optional[Dict[str, float]]]
+
+MMR_POOL_SIZE = 300
+
+_FEATURE_COLUMNS = [
+    Track.danceability,
+    Track.energy,
+    Track.valence,
+    Track.acousticness,
+    Track.instrumentalness,
+    Track.speechiness,
+    Track.liveness,
+    Track.tempo,
+]
+_TEMPO_SCALE = 200.0
+
+# Blend of the three pairwise similarity signals used for redundancy.
+_FEATURE_WEIGHT = 0.5
+_ARTIST_WEIGHT = 0.3
+_GENRE_WEIGHT = 0.2
+
+
+def _feature_matrix(tracks: Sequence[Track]) -> np.ndarray:
+    matrix = np.zeros((len(tracks), len(_FEATURE_COLUMNS)), dtype=np.float32)
+    for row, track in enumerate(tracks):
+        for col, column in enumerate(_FEATURE_COLUMNS):
+            value = getattr(track, column.key)
+            if value is None:
+                continue
+            value = float(value)
+            if column.key == "tempo":
+                value = min(value / _TEMPO_SCALE, 1.0)
+            matrix[row, col] = value
+    # Centre on the pool so cosine measures relative direction, not magnitude.
+    matrix -= matrix.mean(axis=0, keepdims=True)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _membership_matrix(token_lists: Sequence[List[str]], normalize: bool) -> np.ndarray:
+    vocabulary: Dict[str, int] = {}
+    for tokens in token_lists:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+    matrix = np.zeros((len(token_lists), max(len(vocabulary), 1)), dtype=np.float32)
+    for row, tokens in enumerate(token_lists):
+        for token in tokens:
+            matrix[row, vocabulary[token]] = 1.0
+    if normalize:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _artist_tokens(track: Track) -> List[str]:
+    if not track.artist_names:
+        return []
+    return [artist.strip().lower() for artist in track.artist_names.split(",") if artist.strip()]
+
+
+def _genre_tokens(track: Track) -> List[str]:
+    return [genre.lower() for genre in track.genres_list()]
+
+
+def diversify(items: Sequence[RankedItem], limit: int, weight: float, pool_size: int = MMR_POOL_SIZE) -> List[RankedItem]:
+    """Re-rank score-sorted items with maximal marginal relevance.
+
+    ``weight`` trades relevance (0.0) against novelty versus the already
+    selected tracks (1.0). Each step only compares the newest pick against the
+    pool, keeping a running max-similarity vector, so the cost is O(limit * n).
+    """
+    pool = list(items[:pool_size])
+    if weight <= 0 or len(pool) < 2 or limit < 2:
+        return pool[:limit]
+
+    tracks = [track for track, _, _ in pool]
+    features = _feature_matrix(tracks)
+    artists = _membership_matrix([_artist_tokens(track) for track in tracks], normalize=False)
+    genres = _membership_matrix([_genre_tokens(track) for track in tracks], normalize=True)
+
+    scores = np.array([score for _, score, _ in pool], dtype=np.float32)
+    spread = float(scores.max() - scores.min())
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+
+    max_similarity = np.zeros(len(pool), dtype=np.float32)
+    available = np.ones(len(pool), dtype=bool)
+    selected: List[int] = []
+
+    for _ in range(min(limit, len(pool))):
+        mmr = (1.0 - weight) * relevance - weight * max_similarity
+        mmr[~available] = -np.inf
+        index = int(np.argmax(mmr))
+        selected.append(index)
+        available[index] = False
+
+        similarity = (
+            _FEATURE_WEIGHT * np.clip(features @ features[index], 0.0, 1.0)
+            + _ARTIST_WEIGHT * ((artists @ artists[index]) > 0)
+            + _GENRE_WEIGHT * (genres @ genres[index])
+        )
+        np.maximum(max_similarity, similarity, out=max_similarity)
+
+    return [pool[index] for index in selected]
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Iterable, List, Sequence
+
+import numpy as np
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache import get_client
+from ..models import TrackFeedbackEvent, UserSavedTrack, UserTrack
+
+_logger = logging.getLogger(__name__)
+
+# Candidates are filtered here, before ranking; the ML service never sees excluded tracks.
+# Keyed by URI rather than dense track id on purpose: feedback and library sync only know
+# URIs, and mapping them would put a catalog lookup on the write-behind feedback path.
+EXCLUSION_KEY_PREFIX = "exclude:bloom:v1:"
+# 2^19 bits (64 KiB) with 7 probes keeps false positives under 1% up to ~50k tracks.
+BLOOM_BITS = 1 << 19
+BLOOM_HASHES = 7
+EXCLUSION_TTL_SECONDS = 30 * 24 * 3600
+
+
+def exclusion_key(user_id: str) -> str:
+    return f"{EXCLUSION_KEY_PREFIX}{user_id}"
+
+
+def bloom_offsets(track_uri: str) -> List[int]:
+    """Bit offsets for ``track_uri`` via double hashing over one BLAKE2b digest."""
+    digest = hashlib.blake2b(track_uri.encode("utf-8"), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    second = int.from_bytes(digest[8:], "big") | 1
+    return [(first + index * second) % BLOOM_BITS for index in range(BLOOM_HASHES)]
+
+
+def build_bloom(track_uris: Iterable[str]) -> bytes:
+    bits = np.zeros(BLOOM_BITS, dtype=np.uint8)
+    offsets = [offset for uri in track_uris for offset in bloom_offsets(uri)]
+    if offsets:
+        bits[np.asarray(offsets, dtype=np.int64)] = 1
+    # packbits is MSB-first, matching Redis SETBIT/BITFIELD offsets.
+    return np.packbits(bits).tobytes()
+
+
+async def _downvoted_uris(session: AsyncSession, user_id: str) -> List[str]:
+    rows = await session.execute(
+        select(TrackFeedbackEvent.track_uri, TrackFeedbackEvent.verdict)
+        .where(TrackFeedbackEvent.spotify_user_id == user_id)
+        .order_by(TrackFeedbackEvent.created_at, TrackFeedbackEvent.id)
+    )
+    latest = {uri: verdict for uri, verdict in rows}
+    return [uri for uri, verdict in latest.items() if verdict == "down"]
+
+
+async def rebuild_exclusion_filter(session: AsyncSession, user_id: str) -> int:
+    """Replace the user's filter with their library plus standing downvotes; returns the size.
+
+    Bloom filters cannot forget, so a reversed downvote only drops out on this rebuild.
+    """
+    client = await get_client()
+    if not client:
+        return 0
+    library = await session.execute(
+        union(
+            select(UserTrack.track_uri).where(UserTrack.user_id == user_id),
+            select(UserSavedTrack.track_uri).where(UserSavedTrack.user_id == user_id),
+        )
+    )
+    uris = set(library.scalars())
+    uris.update(await _downvoted_uris(session, user_id))
+    await client.set(exclusion_key(user_id), build_bloom(uris), ex=EXCLUSION_TTL_SECONDS)
+    return len(uris)
+
+
+def queue_exclusion(pipe: Any, user_id: str, track_uri: str) -> None:
+    """Add ``track_uri`` to the user's filter as part of an existing pipeline."""
+    key = exclusion_key(user_id)
+    for offset in bloom_offsets(track_uri):
+        pipe.setbit(key, offset, 1)
+    pipe.expire(key, EXCLUSION_TTL_SECONDS)
+
+
+async def filter_excluded(user_id: str, track_uris: Sequence[str]) -> List[str]:
+    """Drop URIs the user already owns or downvoted, with one BITFIELD round trip.
+
+    Without Redis (or a filter) nothing is dropped.
+    """
+    client = await get_client()
+    if not client or not track_uris:
+        return list(track_uris)
+    operation = client.bitfield(exclusion_key(user_id))
+    for uri in track_uris:
+        for offset in bloom_offsets(uri):
+            operation.get("u1", offset)
+    try:
+        bits = await operation.execute()
+    except Exception as exc:  # pragma: no cover - filtering is best effort
+        _logger.debug("Failed to read exclusion filter for %s: %s", user_id, exc)
+        return list(track_uris)
+    hits = np.asarray(bits, dtype=np.uint8).reshape(len(track_uris), BLOOM_HASHES).all(axis=1)
+    return [uri for uri, hit in zip(track_uris, hits) if not hit]
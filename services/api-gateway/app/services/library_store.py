@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Type, TypeVar
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Base, PlaylistTrack, UserSavedTrack, UserTrack
+
+# Diffs at least this large are staged through COPY instead of multi-row VALUES.
+COPY_THRESHOLD = 1_000
+_DELETE_CHUNK_SIZE = 1_000
+
+T = TypeVar("T")
+
+
+@dataclass
+class RowDiff:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+def _column_names(model: Type[Base], keys: Sequence[str]) -> List[str]:
+    columns = model.__mapper__.columns
+    return [columns[key].name for key in keys]
+
+
+def _chunks(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _copy_merge(
+    session: AsyncSession,
+    model: Type[Base],
+    rows: Sequence[dict],
+    conflict: Sequence[str],
+    update: Sequence[str],
+) -> None:
+    """COPY rows into a transaction-scoped temp table, then merge them with one INSERT ... SELECT."""
+    connection = await session.connection()
+    quote = connection.dialect.identifier_preparer.quote
+    table = quote(model.__tablename__)
+    keys = list(rows[0])
+    column_list = ", ".join(quote(name) for name in _column_names(model, keys))
+    stage = quote(f"stage_{model.__tablename__}")
+
+    await session.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table}) ON COMMIT DROP"))
+    await session.execute(text(f"TRUNCATE {stage}"))
+    raw = await connection.get_raw_connection()
+    async with raw.driver_connection.cursor() as cursor:
+        async with cursor.copy(f"COPY {stage} ({column_list}) FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(tuple(row[key] for key in keys))
+
+    conflict_list = ", ".join(quote(name) for name in _column_names(model, conflict))
+    if update:
+        assignments = ", ".join(
+            f"{quote(name)} = EXCLUDED.{quote(name)}" for name in _column_names(model, update)
+        )
+        action = f"DO UPDATE SET {assignments}"
+    else:
+        action = "DO NOTHING"
+    await session.execute(
+        text(
+            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} "
+            f"ON CONFLICT ({conflict_list}) {action}"
+        )
+    )
+
+
+async def upsert_rows(
+    session: AsyncSession,
+    model: Type[Base],
+    rows: Sequence[dict],
+    conflict: Sequence[str],
+    update: Sequence[str] = (),
+) -> None:
+    """Insert ``rows`` keyed by attribute name; conflicting keys update ``update`` or are skipped."""
+    if not rows:
+        return
+    connection = await session.connection()
+    dialect = connection.dialect.name
+    if dialect == "postgresql" and len(rows) >= COPY_THRESHOLD:
+        await _copy_merge(session, model, rows, conflict, update)
+        return
+
+    keys = list(rows[0])
+    names = dict(zip(keys, _column_names(model, keys)))
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    index_elements = _column_names(model, conflict)
+    for chunk in _chunks(rows, COPY_THRESHOLD):
+        stmt = insert(model.__table__).values([{names[key]: row[key] for key in keys} for row in chunk])
+        if update:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={name: stmt.excluded[name] for name in _column_names(model, update)},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        await session.execute(stmt)
+
+
+async def sync_user_tracks(session: AsyncSession, user_id: str, weights: Mapping[str, float]) -> RowDiff:
+    """Write only the weight changes between the stored library and ``weights``."""
+    stored: Dict[str, float] = dict(
+        (
+            await session.execute(
+                select(UserTrack.track_uri, UserTrack.weight).where(UserTrack.user_id == user_id)
+            )
+        ).all()
+    )
+    removed = [uri for uri in stored if uri not in weights]
+    upserts = [
+        {"user_id": user_id, "track_uri": uri, "weight": float(weight)}
+        for uri, weight in weights.items()
+        if stored.get(uri) != float(weight)
+    ]
+    diff = RowDiff(
+        inserted=sum(1 for row in upserts if row["track_uri"] not in stored),
+        deleted=len(removed),
+    )
+    diff.updated = len(upserts) - diff.inserted
+
+    for chunk in _chunks(removed, _DELETE_CHUNK_SIZE):
+        await session.execute(
+            delete(UserTrack).where(UserTrack.user_id == user_id, UserTrack.track_uri.in_(chunk))
+        )
+    await upsert_rows(session, UserTrack, upserts, conflict=("user_id", "track_uri"), update=("weight",))
+    return diff
+
+
+async def sync_playlist_tracks(session: AsyncSession, playlists: Mapping[str, Sequence[str]]) -> RowDiff:
+    """Make each playlist's stored track set match ``playlists`` with minimal writes."""
+    if not playlists:
+        return RowDiff()
+    stored: Dict[str, Set[str]] = defaultdict(set)
+    rows = await session.execute(
+        select(PlaylistTrack.playlist_id, PlaylistTrack.track_uri).where(
+            PlaylistTrack.playlist_id.in_(list(playlists))
+        )
+    )
+    for playlist_id, track_uri in rows:
+        stored[playlist_id].add(track_uri)
+
+    diff = RowDiff()
+    inserts: List[dict] = []
+    for playlist_id, uris in playlists.items():
+        wanted = list(dict.fromkeys(uris))
+        current = stored[playlist_id]
+        stale = list(current.difference(wanted))
+        for chunk in _chunks(stale, _DELETE_CHUNK_SIZE):
+            await session.execute(
+                delete(PlaylistTrack).where(
+                    PlaylistTrack.playlist_id == playlist_id,
+                    PlaylistTrack.track_uri.in_(chunk),
+                )
+            )
+        diff.deleted += len(stale)
+        inserts.extend({"playlist_id": playlist_id, "track_uri": uri} for uri in wanted if uri not in current)
+    diff.inserted = len(inserts)
+    await upsert_rows(session, PlaylistTrack, inserts, conflict=("playlist_id", "track_uri"))
+    return diff
+
+
+async def saved_tracks_cursor(session: AsyncSession, user_id: str) -> Tuple[Optional[float], int]:
+    """Return the newest mirrored ``added_at`` and how many mirrored saves share it."""
+    newest = await session.scalar(select(func.max(UserSavedTrack.added_at)).where(UserSavedTrack.user_id == user_id))
+    if newest is None:
+        return None, 0
+    count = await session.scalar(
+        select(func.count()).where(UserSavedTrack.user_id == user_id, UserSavedTrack.added_at == newest)
+    )
+    return newest, int(count or 0)
+
+
+async def drop_unseen_saved_tracks(session: AsyncSession, user_id: str, seen_since: float) -> int:
+    """Delete mirrored saves a full scan started at ``seen_since`` did not touch."""
+    result = await session.execute(
+        delete(UserSavedTrack).where(UserSavedTrack.user_id == user_id, UserSavedTrack.seen_at < seen_since)
+    )
+    return result.rowcount or 0
+
+
+async def newest_saved_tracks(session: AsyncSession, user_id: str, limit: int) -> List[str]:
+    rows = await session.execute(
+        select(UserSavedTrack.track_uri)
+        .where(UserSavedTrack.user_id == user_id)
+        .order_by(UserSavedTrack.added_at.desc())
+        .limit(limit)
+    )
+    return list(rows.scalars())
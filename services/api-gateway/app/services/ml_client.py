@@ -30,16 +30,19 @@ async def close_client() -> None:
 
 async def rank_candidates(
     seeds: List[Dict[str, Any]],
-    candidate_uris: List[str],
+    candidate_uris: Optional[List[str]] = None,
     exploration: float = 0.05,
     alpha: float | None = None,
     beta: float | None = None,
     gamma: float | None = None,
+    candidate_ids: Optional[List[int]] = None,
 ) -> List[dict[str, object]]:
+    """Rank candidates by dense ``candidate_ids`` (seeds carry ``track_id``) or by URI."""
     client = await _get_client()
     payload = {
         "seeds": seeds,
         "candidate_uris": candidate_uris,
+        "candidate_ids": candidate_ids,
         "exploration": exploration,
         "alpha": alpha,
         "beta": beta,
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import FeatureDistribution, Track, UserTrack
+from ..schemas import FeaturePercentile, StatsComparisonResponse
+
+CDF_BINS = 1000
+_STREAM_CHUNK_SIZE = 20_000
+_CACHE_TTL_SECONDS = 300
+
+# Feature -> (column, lower bound, upper bound); values outside are clamped to the edge bins.
+COMPARE_FEATURES: Dict[str, Tuple[object, float, float]] = {
+    "energy": (Track.energy, 0.0, 1.0),
+    "danceability": (Track.danceability, 0.0, 1.0),
+    "valence": (Track.valence, 0.0, 1.0),
+    "acousticness": (Track.acousticness, 0.0, 1.0),
+    "instrumentalness": (Track.instrumentalness, 0.0, 1.0),
+    "speechiness": (Track.speechiness, 0.0, 1.0),
+    "liveness": (Track.liveness, 0.0, 1.0),
+    "tempo": (Track.tempo, 0.0, 250.0),
+    "loudness": (Track.loudness, -60.0, 5.0),
+    "popularity": (Track.popularity, 0.0, 100.0),
+}
+
+_cdf_cache: Optional[Tuple[float, Dict[str, "FeatureCDF"]]] = None
+
+
+class FeatureCDF:
+    """Fixed-bin cumulative distribution; lookups are a clip plus an array index."""
+
+    def __init__(self, lower: float, upper: float, counts: np.ndarray) -> None:
+        self.lower = lower
+        self.upper = upper
+        self.total = int(counts.sum())
+        cumulative = np.cumsum(counts, dtype=np.float64)
+        self.cumulative = cumulative / cumulative[-1] if self.total else cumulative
+
+    def _bins(self, values: np.ndarray) -> np.ndarray:
+        scaled = (values - self.lower) / (self.upper - self.lower) * len(self.cumulative)
+        return np.clip(scaled.astype(np.int64), 0, len(self.cumulative) - 1)
+
+    def percentiles(self, values: np.ndarray) -> np.ndarray:
+        return self.cumulative[self._bins(values)] * 100.0
+
+    def quantile(self, fraction: float) -> float:
+        index = int(np.searchsorted(self.cumulative, fraction))
+        width = (self.upper - self.lower) / len(self.cumulative)
+        return self.lower + (min(index, len(self.cumulative) - 1) + 0.5) * width
+
+
+def _histogram(values: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    values = values[~np.isnan(values)]
+    return np.histogram(np.clip(values, lower, upper), bins=CDF_BINS, range=(lower, upper))[0].astype(np.int64)
+
+
+async def rebuild_feature_cdfs(session: AsyncSession) -> Dict[str, FeatureCDF]:
+    """Stream the catalog once and store a fixed-bin histogram per feature."""
+    global _cdf_cache
+    names = list(COMPARE_FEATURES)
+    counts = {name: np.zeros(CDF_BINS, dtype=np.int64) for name in names}
+    columns = [COMPARE_FEATURES[name][0] for name in names]
+    result = await session.stream(select(*columns).execution_options(yield_per=_STREAM_CHUNK_SIZE))
+    async for partition in result.partitions():
+        matrix = np.array(partition, dtype=np.float64)
+        for position, name in enumerate(names):
+            _, lower, upper = COMPARE_FEATURES[name]
+            counts[name] += _histogram(matrix[:, position], lower, upper)
+
+    now = time.time()
+    cdfs: Dict[str, FeatureCDF] = {}
+    for name in names:
+        _, lower, upper = COMPARE_FEATURES[name]
+        row = await session.get(FeatureDistribution, name)
+        if row is None:
+            row = FeatureDistribution(feature=name)
+            session.add(row)
+        row.lower = lower
+        row.upper = upper
+        row.counts = counts[name].astype("<i8").tobytes()
+        row.updated_at = now
+        cdfs[name] = FeatureCDF(lower, upper, counts[name])
+    await session.commit()
+    _cdf_cache = (now, cdfs)
+    return cdfs
+
+
+async def load_feature_cdfs(session: AsyncSession) -> Dict[str, FeatureCDF]:
+    """Read the stored histograms; they are built by the importer and catalog stats refreshes.
+
+    Never scans the catalog: until a refresh has run this returns an empty mapping.
+    """
+    global _cdf_cache
+    if _cdf_cache is not None and time.time() - _cdf_cache[0] < _CACHE_TTL_SECONDS:
+        return _cdf_cache[1]
+    rows = (await session.execute(select(FeatureDistribution))).scalars().all()
+    if not rows:
+        return {}
+    cdfs = {
+        row.feature: FeatureCDF(row.lower, row.upper, np.frombuffer(row.counts, dtype="<i8"))
+        for row in rows
+    }
+    _cdf_cache = (time.time(), cdfs)
+    return cdfs
+
+
+async def compare_user_to_catalog(session: AsyncSession, user_id: str) -> StatsComparisonResponse:
+    cdfs = await load_feature_cdfs(session)
+    names = [name for name in COMPARE_FEATURES if name in cdfs]
+    if not names:
+        # No stats refresh has stored the catalog distribution yet.
+        return StatsComparisonResponse(user_id=user_id, tracks=0, features=[])
+    rows = (
+        await session.execute(
+            select(*[COMPARE_FEATURES[name][0] for name in names])
+            .join(UserTrack, UserTrack.track_uri == Track.track_uri)
+            .where(UserTrack.user_id == user_id)
+        )
+    ).all()
+    matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(names))
+
+    features: List[FeaturePercentile] = []
+    for position, name in enumerate(names):
+        cdf = cdfs[name]
+        values = matrix[:, position]
+        values = values[~np.isnan(values)]
+        catalog_median = cdf.quantile(0.5) if cdf.total else None
+        if not values.size or not cdf.total:
+            features.append(FeaturePercentile(feature=name, catalog_median=catalog_median))
+            continue
+        track_percentiles = cdf.percentiles(values)
+        mean = float(values.mean())
+        features.append(
+            FeaturePercentile(
+                feature=name,
+                user_mean=mean,
+                user_median=float(np.median(values)),
+                catalog_median=catalog_median,
+                percentile=float(cdf.percentiles(np.array([mean]))[0]),
+                percentile_band=[float(value) for value in np.percentile(track_percentiles, [25, 75])],
+            )
+        )
+    return StatsComparisonResponse(user_id=user_id, tracks=len(rows), features=features)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from functools import reduce
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import AnalyticsSketch, PlaylistTrack, Track, UserPlaylist, UserTrack
+from ..schemas import SketchSummary
+from .sketches import TrackSketch
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def playlist_scope(playlist_id: str) -> str:
+    return f"playlist:{playlist_id}"
+
+
+async def store_sketch(session: AsyncSession, scope: str, sketch: TrackSketch) -> None:
+    row = await session.get(AnalyticsSketch, scope)
+    if row is None:
+        row = AnalyticsSketch(scope=scope)
+        session.add(row)
+    row.payload = sketch.to_bytes()
+    row.updated_at = time.time()
+
+
+async def delete_sketches(session: AsyncSession, scopes: Sequence[str]) -> None:
+    """Drop stored sketches, e.g. for playlists that were removed or emptied. The caller commits."""
+    if scopes:
+        await session.execute(delete(AnalyticsSketch).where(AnalyticsSketch.scope.in_(list(scopes))))
+
+
+async def load_sketches(session: AsyncSession, scopes: Sequence[str]) -> Dict[str, TrackSketch]:
+    if not scopes:
+        return {}
+    rows = (
+        await session.execute(select(AnalyticsSketch).where(AnalyticsSketch.scope.in_(list(scopes))))
+    ).scalars().all()
+    return {row.scope: TrackSketch.from_bytes(row.payload) for row in rows}
+
+
+async def update_library_sketches(session: AsyncSession, user_id: str) -> None:
+    """Rebuild the user and per-playlist sketches from the freshly synced rows."""
+    library_rows = (
+        await session.execute(
+            select(Track.track_uri, Track.artist_names, Track.genres)
+            .join(UserTrack, UserTrack.track_uri == Track.track_uri)
+            .where(UserTrack.user_id == user_id)
+        )
+    ).all()
+    library = TrackSketch()
+    library.add_rows([tuple(row) for row in library_rows])
+    await store_sketch(session, user_scope(user_id), library)
+
+    playlist_rows = (
+        await session.execute(
+            select(PlaylistTrack.playlist_id, Track.track_uri, Track.artist_names, Track.genres)
+            .join(Track, Track.track_uri == PlaylistTrack.track_uri)
+            .join(UserPlaylist, UserPlaylist.id == PlaylistTrack.playlist_id)
+            .where(UserPlaylist.user_id == user_id)
+        )
+    ).all()
+    grouped: Dict[str, list] = defaultdict(list)
+    for playlist_id, uri, artists, genres in playlist_rows:
+        grouped[playlist_id].append((uri, artists, genres))
+    for playlist_id, rows in grouped.items():
+        sketch = TrackSketch()
+        sketch.add_rows(rows)
+        await store_sketch(session, playlist_scope(playlist_id), sketch)
+    # Playlists that no longer have catalog tracks must not keep answering from an old sketch.
+    playlist_ids = (
+        await session.execute(select(UserPlaylist.id).where(UserPlaylist.user_id == user_id))
+    ).scalars()
+    await delete_sketches(
+        session, [playlist_scope(playlist_id) for playlist_id in playlist_ids if playlist_id not in grouped]
+    )
+    await session.commit()
+
+
+async def union_summary(session: AsyncSession, scopes: Sequence[str], limit: int = 10) -> Optional[SketchSummary]:
+    """Answer distinct/top-k questions for a union of scopes by merging stored sketches."""
+    sketches = await load_sketches(session, scopes)
+    if not sketches:
+        return None
+    merged = reduce(lambda left, right: left.merge(right), sketches.values())
+    return SketchSummary(
+        scopes=sorted(sketches),
+        rows=merged.rows,
+        unique_tracks=merged.tracks.estimate(),
+        unique_artists=merged.artists.estimate(),
+        top_artists=[{"name": name, "count": count} for name, count in merged.top_artists.top(limit)],
+        top_genres=[{"name": name, "count": count} for name, count in merged.top_genres.top(limit)],
+    )
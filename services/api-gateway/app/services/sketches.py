@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _hash64(items: Sequence[str], salt: bytes = b"") -> np.ndarray:
+    digests = b"".join(
+        hashlib.blake2b(item.encode("utf-8"), digest_size=8, salt=salt).digest() for item in items
+    )
+    return np.frombuffer(digests, dtype="<u8")
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    # frexp is exact for 32-bit halves, so split before converting to float.
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high > 0, high_bits + 32, low_bits).astype(np.int64)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count estimator (~1.6% standard error at p=12)."""
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None) -> None:
+        self.precision = precision
+        size = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(size, dtype=np.uint8)
+
+    def add_many(self, items: Sequence[str]) -> None:
+        if not items:
+            return
+        hashes = _hash64(items)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - _bit_length(remainder) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self) -> dict:
+        return {"p": self.precision, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(int(data["p"]), registers)
+
+
+class SpaceSaving:
+    """Bounded heavy-hitter tracker; any item above N/capacity is guaranteed to be kept."""
+
+    def __init__(self, capacity: int = 64, counters: Optional[Dict[str, int]] = None) -> None:
+        self.capacity = capacity
+        self.counters: Dict[str, int] = dict(counters or {})
+
+    def add_many(self, items: Iterable[str]) -> None:
+        batch: Dict[str, int] = {}
+        for item in items:
+            batch[item] = batch.get(item, 0) + 1
+        for item, count in sorted(batch.items(), key=lambda entry: entry[1], reverse=True):
+            self._offer(item, count)
+
+    def _offer(self, item: str, count: int) -> None:
+        if item in self.counters or len(self.counters) < self.capacity:
+            self.counters[item] = self.counters.get(item, 0) + count
+            return
+        victim = min(self.counters, key=self.counters.__getitem__)
+        floor = self.counters.pop(victim)
+        self.counters[item] = floor + count
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        capacity = max(self.capacity, other.capacity)
+        combined = dict(self.counters)
+        for item, count in other.counters.items():
+            combined[item] = combined.get(item, 0) + count
+        kept = sorted(combined.items(), key=lambda entry: entry[1], reverse=True)[:capacity]
+        return SpaceSaving(capacity, dict(kept))
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        return sorted(self.counters.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        return cls(int(data["capacity"]), {str(key): int(value) for key, value in data["counters"].items()})
+
+
+def split_tokens(raw: Optional[str], lower: bool = False) -> List[str]:
+    if not raw:
+        return []
+    tokens = [token.strip() for token in raw.split(",")]
+    return [token.lower() if lower else token for token in tokens if token]
+
+
+@dataclass
+class TrackSketch:
+    """Distinct and heavy-hitter summaries over a set of tracks."""
+
+    rows: int = 0
+    tracks: HyperLogLog = field(default_factory=HyperLogLog)
+    artists: HyperLogLog = field(default_factory=HyperLogLog)
+    top_artists: SpaceSaving = field(default_factory=SpaceSaving)
+    top_genres: SpaceSaving = field(default_factory=SpaceSaving)
+
+    def add_rows(self, rows: Sequence[Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """Fold ``(track_uri, artist_names, genres)`` rows into the sketch."""
+        if not rows:
+            return
+        self.rows += len(rows)
+        self.tracks.add_many([uri for uri, _, _ in rows if uri])
+        artist_tokens = [artist for _, artists, _ in rows for artist in split_tokens(artists)]
+        self.artists.add_many(artist_tokens)
+        self.top_artists.add_many(artist_tokens)
+        self.top_genres.add_many(genre for _, _, genres in rows for genre in split_tokens(genres, lower=True))
+
+    def merge(self, other: "TrackSketch") -> "TrackSketch":
+        return TrackSketch(
+            rows=self.rows + other.rows,
+            tracks=self.tracks.merge(other.tracks),
+            artists=self.artists.merge(other.artists),
+            top_artists=self.top_artists.merge(other.top_artists),
+            top_genres=self.top_genres.merge(other.top_genres),
+        )
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(
+            {
+                "rows": self.rows,
+                "tracks": self.tracks.to_dict(),
+                "artists": self.artists.to_dict(),
+                "top_artists": self.top_artists.to_dict(),
+                "top_genres": self.top_genres.to_dict(),
+            }
+        ).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "TrackSketch":
+        data = json.loads(payload)
+        return cls(
+            rows=int(data["rows"]),
+            tracks=HyperLogLog.from_dict(data["tracks"]),
+            artists=HyperLogLog.from_dict(data["artists"]),
+            top_artists=SpaceSaving.from_dict(data["top_artists"]),
+            top_genres=SpaceSaving.from_dict(data["top_genres"]),
+        )
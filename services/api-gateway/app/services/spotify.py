@@ -1,75 +1,64 @@
 from __future__ import annotations
 
-import base64
+import asyncio
 import time
-from typing import Dict, List, Sequence
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, TypeVar
 
-import httpx
 from sqlalchemy import delete, select
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..config import get_settings
-from ..models import SpotifyToken, Track, UserTrack, UserPlaylist, PlaylistTrack
+from ..coordination import distributed_lock, is_marked, mark
+from ..db import session_scope
+from ..models import Track, UserLibraryState, UserSavedTrack, UserSavedTracksState, UserTrack, UserPlaylist, PlaylistTrack
 from ..schemas import SpotifySeedTrack
-
-
-_LIBRARY_SYNC_TTL = 300  # seconds
-_library_sync_memory: dict[str, float] = {}
-
-
-class SpotifyServiceError(Exception):
-    """Raised when Spotify data cannot be fetched or refreshed."""
-
-
-async def _ensure_access_token(session: AsyncSession, token: SpotifyToken) -> str | None:
-    now = int(time.time())
-    if token.expires_at and token.expires_at - 90 > now:
-        return token.access_token
-    if not token.refresh_token:
-        return token.access_token
-    return await _refresh_access_token(session, token)
-
-
-async def _refresh_access_token(session: AsyncSession, token: SpotifyToken) -> str | None:
-    settings = get_settings()
-    if not settings.spotify_client_id or not settings.spotify_client_secret:
-        raise SpotifyServiceError("Spotify credentials are not configured")
-    if not token.refresh_token:
-        raise SpotifyServiceError("Spotify refresh token missing")
-
-    credentials = f"{settings.spotify_client_id}:{settings.spotify_client_secret}".encode("utf-8")
-    auth_header = base64.b64encode(credentials).decode("utf-8")
-    data = {
-        "grant_type": "refresh_token",
-        "refresh_token": token.refresh_token,
-    }
-    headers = {
-        "Authorization": f"Basic {auth_header}",
-        "Content-Type": "application/x-www-form-urlencoded",
-    }
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post("https://accounts.spotify.com/api/token", data=data, headers=headers)
-    if response.status_code >= 400:
-        raise SpotifyServiceError("Failed to refresh Spotify token")
-    payload = response.json()
-    token.access_token = payload.get("access_token", token.access_token)
-    expires_in = int(payload.get("expires_in") or 3600)
-    token.expires_at = int(time.time()) + expires_in
-    if payload.get("refresh_token"):
-        token.refresh_token = payload["refresh_token"]
-    await session.commit()
-    return token.access_token
-
-
-async def _call_spotify_api(access_token: str, params: dict) -> httpx.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        return await client.get(
-            "https://api.spotify.com/v1/me/top/tracks",
-            params=params,
-            headers=headers,
-        )
+from .exclusions import rebuild_exclusion_filter
+from .library_store import (
+    drop_unseen_saved_tracks,
+    newest_saved_tracks,
+    saved_tracks_cursor,
+    sync_playlist_tracks,
+    sync_user_tracks,
+    upsert_rows,
+)
+from .sketch_store import delete_sketches, playlist_scope, update_library_sketches
+from .spotify_client import (
+    SpotifyHTTPError,
+    SpotifyServiceError,
+    SpotifyUnauthorizedError,
+    cached_get,
+    fetch_pages,
+    iter_pages,
+    spotify_get,
+)
+from .spotify_tokens import get_access_token, refresh_access_token
+from .taste_profile import refresh_taste_profile
+from .user_stats import refresh_playlist_stats, refresh_user_library_stats
+
+
+LIBRARY_SYNC_TTL_SECONDS = 300
+# Renewed while the sync runs, so this only bounds how long a crashed holder blocks others.
+_SYNC_LOCK_TTL_SECONDS = 90
+
+
+T = TypeVar("T")
+SyncProgress = Callable[[str, float], Awaitable[None]]
+
+_RANGE_WEIGHTS = {
+    "short_term": 1.0,
+    "medium_term": 0.85,
+    "long_term": 0.7,
+}
+_TOP_TRACK_RANGES = tuple(_RANGE_WEIGHTS)
+_SAVED_PAGE_SIZE = 50
+# Pages requested at once during a full saved-tracks scan.
+_SAVED_BACKFILL_WINDOW = 4
+# Add-plus-remove pairs keep the total unchanged; only a full scan reconciles them.
+_SAVED_FULL_SCAN_SECONDS = 7 * 24 * 3600
+# Top tracks drift slowly: serve cached lists for a while, then revalidate with the stored ETag.
+_TOP_TRACKS_CACHE_PREFIX = "spotify:top-tracks:v1:"
+_TOP_TRACKS_FRESH_SECONDS = 900
+_TOP_TRACKS_KEEP_SECONDS = 7 * 24 * 3600
 
 
 def _normalize_track_payload(payload: dict | None) -> tuple[str, str, str] | None:
@@ -90,37 +79,84 @@ def _normalize_track_payload(payload: dict | None) -> tuple[str, str, str] | Non
     return uri, name, artists
 
 
-async def _pull_user_top_tracks(session: AsyncSession, user_id: str, limit: int, time_range: str = "medium_term") -> List[SpotifySeedTrack]:
-    token = await session.get(SpotifyToken, user_id)
-    if not token:
-        raise SpotifyServiceError("Spotify account not linked.")
-    access_token = await _ensure_access_token(session, token)
-    if not access_token:
-        raise SpotifyServiceError("Spotify access token unavailable.")
+def _raise_for_status(status_code: int) -> None:
+    if status_code == 401:
+        raise SpotifyUnauthorizedError("Spotify rejected the access token.")
+    if status_code == 429:
+        raise SpotifyServiceError("Spotify rate limit exceeded; try again shortly.")
+    if status_code >= 400:
+        raise SpotifyServiceError("Spotify API request failed.")
 
-    params = {"limit": min(limit, 50), "time_range": time_range}
-    response = await _call_spotify_api(access_token, params)
 
-    # If unauthorized, try a single refresh attempt.
-    if response.status_code == 401 and token.refresh_token:
-        access_token = await _refresh_access_token(session, token)
-        if not access_token:
-            raise SpotifyServiceError("Unable to refresh Spotify token.")
-        response = await _call_spotify_api(access_token, params)
+async def _fetch_all_pages(path: str, access_token: str, page_size: int, limit: int) -> List[dict]:
+    try:
+        return await fetch_pages(path, access_token, page_size=page_size, limit=limit)
+    except SpotifyHTTPError as exc:
+        _raise_for_status(exc.status_code)
+        raise
 
-    if response.status_code >= 400:
-        raise SpotifyServiceError("Spotify API request failed.")
 
-    tracks: List[SpotifySeedTrack] = []
-    for item in response.json().get("items", []):
+def _parse_top_tracks(payload: dict) -> List[dict]:
+    tracks: List[dict] = []
+    for item in payload.get("items", []):
         normalized = _normalize_track_payload(item)
         if not normalized:
             continue
         uri, name, artists = normalized
-        tracks.append(SpotifySeedTrack(track_uri=uri, track_name=name, artist_names=artists))
+        tracks.append({"track_uri": uri, "track_name": name, "artist_names": artists})
     return tracks
 
 
+async def _fetch_top_tracks(
+    access_token: str,
+    user_id: str,
+    limit: int,
+    time_range: str = "medium_term",
+    refetch: bool = False,
+) -> List[SpotifySeedTrack]:
+    # Always request the full page so every limit shares one cache entry. ``refetch`` skips
+    # the fresh window; the stored ETag still turns an unchanged list into a 304.
+    status_code, tracks = await cached_get(
+        f"{_TOP_TRACKS_CACHE_PREFIX}{user_id}:{time_range}",
+        "/me/top/tracks",
+        access_token,
+        {"limit": 50, "time_range": time_range},
+        _parse_top_tracks,
+        fresh_seconds=0 if refetch else _TOP_TRACKS_FRESH_SECONDS,
+        keep_seconds=_TOP_TRACKS_KEEP_SECONDS,
+    )
+    _raise_for_status(status_code)
+    return [SpotifySeedTrack(**track) for track in tracks[: min(limit, 50)]]
+
+
+async def _fetch_all_top_tracks(
+    access_token: str,
+    user_id: str,
+    limit: int,
+    ranges: Sequence[str],
+    refetch: bool = False,
+) -> List[List[SpotifySeedTrack]]:
+    return list(
+        await asyncio.gather(
+            *(_fetch_top_tracks(access_token, user_id, limit, time_range, refetch) for time_range in ranges)
+        )
+    )
+
+
+async def _call_with_refresh(
+    session: AsyncSession,
+    user_id: str,
+    fetch: Callable[[str], Awaitable[T]],
+) -> T:
+    access_token = await get_access_token(session, user_id)
+    try:
+        return await fetch(access_token)
+    except SpotifyUnauthorizedError:
+        # If unauthorized, try a single refresh attempt.
+        access_token = await refresh_access_token(session, user_id, rejected=access_token)
+    return await fetch(access_token)
+
+
 async def _annotate_catalog_membership(session: AsyncSession, tracks: Sequence[SpotifySeedTrack]) -> List[SpotifySeedTrack]:
     if not tracks:
         return []
@@ -137,162 +173,274 @@ async def _annotate_catalog_membership(session: AsyncSession, tracks: Sequence[S
     return annotated
 
 
-async def _fetch_saved_tracks(access_token: str, limit: int = 400) -> List[SpotifySeedTrack]:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    collected: List[SpotifySeedTrack] = []
-    url = "https://api.spotify.com/v1/me/tracks"
-    params = {"limit": 50}
-    async with httpx.AsyncClient(timeout=20) as client:
-        next_url: str | None = url
-        while next_url and len(collected) < limit:
-            resp = await client.get(next_url, headers=headers, params=params if next_url == url else None)
-            if resp.status_code >= 400:
-                break
-            data = resp.json()
-            for item in data.get("items", []):
-                normalized = _normalize_track_payload(item)
-                if not normalized:
-                    continue
-                uri, name, artists = normalized
-                collected.append(SpotifySeedTrack(track_uri=uri, track_name=name, artist_names=artists))
-                if len(collected) >= limit:
-                    break
-            next_url = data.get("next")
-            params = None
-    return collected
+def _parse_added_at(value: object) -> Optional[float]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
 
 
-async def _fetch_playlist_tracks(access_token: str, playlist_id: str, limit: int = 200) -> List[str]:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    collected: List[str] = []
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-    params = {"limit": 100}
-    async with httpx.AsyncClient(timeout=20) as client:
-        next_url: str | None = url
-        while next_url and len(collected) < limit:
-            resp = await client.get(next_url, headers=headers, params=params if next_url == url else None)
-            if resp.status_code >= 400:
-                break
-            data = resp.json()
-            for item in data.get("items", []):
+async def _stream_saved_tracks(
+    session: AsyncSession,
+    access_token: str,
+    user_id: str,
+    cursor: Optional[float],
+    seen_at: float,
+) -> Tuple[int, int]:
+    """Upsert saved tracks page by page, newest first; returns Spotify's reported total and
+    how many items were seen, including ones that could not be stored (e.g. a null ``track``).
+
+    With a ``cursor`` paging stops at the first save older than it. Each page is committed
+    before the next is requested, so memory stays bounded by the page window.
+    """
+    window = 1 if cursor is not None else _SAVED_BACKFILL_WINDOW
+    total = seen = 0
+    try:
+        async for total, items in iter_pages("/me/tracks", access_token, _SAVED_PAGE_SIZE, window=window):
+            rows: List[dict] = []
+            reached_cursor = False
+            for item in items:
                 normalized = _normalize_track_payload(item)
-                if not normalized:
-                    continue
-                collected.append(normalized[0])
-                if len(collected) >= limit:
+                added_at = _parse_added_at(item.get("added_at")) if isinstance(item, dict) else None
+                if cursor is not None and added_at is not None and added_at < cursor:
+                    reached_cursor = True
                     break
-            next_url = data.get("next")
-            params = None
+                seen += 1
+                if not normalized or added_at is None:
+                    continue
+                rows.append(
+                    {"user_id": user_id, "track_uri": normalized[0], "added_at": added_at, "seen_at": seen_at}
+                )
+            await upsert_rows(
+                session, UserSavedTrack, rows, conflict=("user_id", "track_uri"), update=("added_at", "seen_at")
+            )
+            await session.commit()
+            if reached_cursor:
+                break
+    except SpotifyHTTPError as exc:
+        _raise_for_status(exc.status_code)
+        raise
+    return total, seen
+
+
+async def _sync_saved_tracks(access_token: str, user_id: str) -> None:
+    """Mirror the user's saved tracks into ``user_saved_tracks``.
+
+    Known users only page back to the newest stored save. Spotify's total should then have
+    grown by exactly the saves seen above that point; otherwise (first sync, interrupted
+    backfill, removals) a full scan stamps every save it sees and drops the rest. An add
+    and a removal between syncs cancel out in the total, so a full scan also runs at least
+    every ``_SAVED_FULL_SCAN_SECONDS``.
+    """
+    # Runs alongside the other library fetches, so it cannot share the caller's session.
+    async with session_scope() as session:
+        state = await session.get(UserSavedTracksState, user_id)
+        cursor, at_cursor = await saved_tracks_cursor(session, user_id)
+        if state is not None and cursor is not None and time.time() - state.scanned_at < _SAVED_FULL_SCAN_SECONDS:
+            total, seen = await _stream_saved_tracks(session, access_token, user_id, cursor, time.time())
+            # Totals count unplayable saves too, which is why ``seen`` includes them.
+            if total == state.spotify_total + seen - at_cursor:
+                state.spotify_total = total
+                await session.commit()
+                return
+        started = time.time()
+        total, _ = await _stream_saved_tracks(session, access_token, user_id, None, started)
+        await drop_unseen_saved_tracks(session, user_id, started)
+        if state is None:
+            state = UserSavedTracksState(user_id=user_id)
+            session.add(state)
+        state.spotify_total = total
+        state.scanned_at = started
+        await session.commit()
+
+
+async def _fetch_playlist_tracks(access_token: str, playlist_id: str, limit: int = 200) -> List[str] | None:
+    """Return the playlist's track URIs, or ``None`` if Spotify would not serve them."""
+    try:
+        items = await _fetch_all_pages(f"/playlists/{playlist_id}/tracks", access_token, page_size=100, limit=limit)
+    except SpotifyUnauthorizedError:
+        raise
+    except SpotifyServiceError:
+        return None
+    collected: List[str] = []
+    for item in items:
+        normalized = _normalize_track_payload(item)
+        if normalized:
+            collected.append(normalized[0])
     return collected
 
 
-async def _fetch_user_playlists(access_token: str, user_id: str, limit: int = 20) -> List[dict]:
-    headers = {"Authorization": f"Bearer {access_token}"}
+async def _fetch_user_playlists(
+    access_token: str,
+    user_id: str,
+    limit: int = 20,
+    known_snapshots: Mapping[str, str | None] | None = None,
+) -> List[dict]:
+    """List the user's own playlists, fetching tracks only where the snapshot moved.
+
+    Unchanged playlists come back with ``track_uris=None``; a failed track fetch keeps
+    the previously stored snapshot so the next sync retries it.
+    """
+    known_snapshots = known_snapshots or {}
     playlists: List[dict] = []
-    url = "https://api.spotify.com/v1/me/playlists"
-    params = {"limit": 20}
-    async with httpx.AsyncClient(timeout=20) as client:
-        next_url: str | None = url
-        while next_url and len(playlists) < limit:
-            resp = await client.get(next_url, headers=headers, params=params if next_url == url else None)
-            if resp.status_code >= 400:
+    next_url: str | None = "/me/playlists"
+    params: dict | None = {"limit": 20}
+    # Listing stays sequential: the owner filter decides how many pages are needed.
+    while next_url and len(playlists) < limit:
+        resp = await spotify_get(next_url, access_token, params)
+        # A partial listing would make persistence drop the missing playlists, so fail instead.
+        _raise_for_status(resp.status_code)
+        data = resp.json()
+        for item in data.get("items", []):
+            playlist_id = item.get("id")
+            owner_id = item.get("owner", {}).get("id")
+            if not playlist_id or owner_id != user_id:
+                continue
+            playlist = {
+                "id": playlist_id,
+                "name": item.get("name") or "Untitled playlist",
+                "description": item.get("description"),
+                "tracks_total": item.get("tracks", {}).get("total"),
+                "snapshot_id": item.get("snapshot_id"),
+                "track_uris": None,
+            }
+            playlists.append(playlist)
+            if len(playlists) >= limit:
                 break
-            data = resp.json()
-            for item in data.get("items", []):
-                playlist_id = item.get("id")
-                owner_id = item.get("owner", {}).get("id")
-                if not playlist_id or owner_id != user_id:
-                    continue
-                playlist = {
-                    "id": playlist_id,
-                    "name": item.get("name") or "Untitled playlist",
-                    "description": item.get("description"),
-                    "tracks_total": item.get("tracks", {}).get("total"),
-                    "track_uris": [],
-                }
-                playlists.append(playlist)
-                if len(playlists) >= limit:
-                    break
-            next_url = data.get("next")
-            params = None
+        next_url = data.get("next")
+        params = None
 
-    for playlist in playlists:
-        track_uris = await _fetch_playlist_tracks(access_token, playlist["id"])
+    changed = [
+        playlist
+        for playlist in playlists
+        if playlist["snapshot_id"] is None or known_snapshots.get(playlist["id"]) != playlist["snapshot_id"]
+    ]
+    track_lists = await asyncio.gather(
+        *(_fetch_playlist_tracks(access_token, playlist["id"]) for playlist in changed)
+    )
+    for playlist, track_uris in zip(changed, track_lists):
+        if track_uris is None:
+            playlist["snapshot_id"] = known_snapshots.get(playlist["id"])
+            continue
         playlist["track_uris"] = list(dict.fromkeys(track_uris))
     return playlists
 
 
 async def _persist_user_playlists(session: AsyncSession, user_id: str, playlists: List[dict]) -> None:
-    existing_ids = (
-        await session.execute(select(UserPlaylist.id).where(UserPlaylist.user_id == user_id))
-    ).scalars().all()
-    if existing_ids:
-        await session.execute(delete(PlaylistTrack).where(PlaylistTrack.playlist_id.in_(existing_ids)))
-    await session.execute(delete(UserPlaylist).where(UserPlaylist.user_id == user_id))
-    await session.flush()
+    """Apply playlist changes as a diff; playlists without ``track_uris`` keep their rows."""
+    existing = {
+        record.id: record
+        for record in (
+            await session.execute(select(UserPlaylist).where(UserPlaylist.user_id == user_id))
+        ).scalars()
+    }
+    fetched_ids = {playlist["id"] for playlist in playlists}
+    removed_ids = [playlist_id for playlist_id in existing if playlist_id not in fetched_ids]
+    if removed_ids:
+        await session.execute(delete(PlaylistTrack).where(PlaylistTrack.playlist_id.in_(removed_ids)))
+        await session.execute(delete(UserPlaylist).where(UserPlaylist.id.in_(removed_ids)))
+        await delete_sketches(session, [playlist_scope(playlist_id) for playlist_id in removed_ids])
 
     for playlist in playlists:
-        session.add(
-            UserPlaylist(
-                id=playlist["id"],
-                user_id=user_id,
-                name=playlist.get("name"),
-                description=playlist.get("description"),
-                tracks=playlist.get("tracks_total"),
-            )
-        )
-        unique_uris = list(dict.fromkeys(playlist.get("track_uris") or []))
-        if unique_uris:
-            stmt = (
-                insert(PlaylistTrack)
-                .values([{"playlist_id": playlist["id"], "track_uri": uri} for uri in unique_uris])
-                .on_conflict_do_nothing(index_elements=[PlaylistTrack.playlist_id, PlaylistTrack.track_uri])
-            )
-            await session.execute(stmt)
+        record = existing.get(playlist["id"])
+        if record is None:
+            record = UserPlaylist(id=playlist["id"], user_id=user_id)
+            session.add(record)
+        record.name = playlist.get("name")
+        record.description = playlist.get("description")
+        record.tracks = playlist.get("tracks_total")
+        record.snapshot_id = playlist.get("snapshot_id")
+
+    await sync_playlist_tracks(
+        session,
+        {playlist["id"]: playlist["track_uris"] for playlist in playlists if playlist.get("track_uris") is not None},
+    )
     await session.flush()
+    await refresh_playlist_stats(
+        session,
+        user_id,
+        {playlist["id"]: playlist.get("snapshot_id") for playlist in playlists},
+    )
     await session.commit()
 
 
 async def _persist_user_tracks(session: AsyncSession, user_id: str, weights: Dict[str, float]) -> None:
     if not weights:
         return
-    await session.execute(delete(UserTrack).where(UserTrack.user_id == user_id))
-    await session.flush()
-    rows = [
-        {"user_id": user_id, "track_uri": uri, "weight": float(weight)}
-        for uri, weight in weights.items()
-    ]
-    if rows:
-        insert_stmt = insert(UserTrack)
-        stmt = insert_stmt.values(rows).on_conflict_do_update(
-            index_elements=[UserTrack.user_id, UserTrack.track_uri],
-            set_={"weight": insert_stmt.excluded.weight},
-        )
-        await session.execute(stmt)
+    await sync_user_tracks(session, user_id, weights)
+    await session.commit()
+
+
+async def _bump_library_version(session: AsyncSession, user_id: str, synced_at: float) -> None:
+    state = await session.get(UserLibraryState, user_id)
+    if state is None:
+        state = UserLibraryState(user_id=user_id, version=0)
+        session.add(state)
+    state.version = (state.version or 0) + 1
+    state.synced_at = synced_at
     await session.commit()
 
 
-async def sync_user_library(session: AsyncSession, user_id: str, saved_limit: int = 400) -> None:
+async def sync_user_library(
+    session: AsyncSession,
+    user_id: str,
+    saved_limit: int = 400,
+    force: bool = False,
+    progress: Optional[SyncProgress] = None,
+    refetch: bool = False,
+) -> bool:
+    """Crawl the user's Spotify library and persist it; returns whether this call synced.
+
+    A user syncs at most once per ``LIBRARY_SYNC_TTL_SECONDS`` across all workers unless
+    ``force`` is set, and never concurrently: a second caller gets ``False`` while the lock is held.
+    ``refetch`` (an explicit resync) also bypasses the cached top-tracks window.
+    """
+    if not force and await is_marked(f"spotify:synced:{user_id}"):
+        return False
+    async with distributed_lock(f"spotify:sync-lock:{user_id}", _SYNC_LOCK_TTL_SECONDS, renew=True) as acquired:
+        if not acquired:
+            return False
+        await _sync_library(session, user_id, saved_limit, progress, refetch)
+        return True
+
+
+async def _sync_library(
+    session: AsyncSession,
+    user_id: str,
+    saved_limit: int,
+    progress: Optional[SyncProgress],
+    refetch: bool = False,
+) -> None:
     now = time.time()
-    if _library_sync_memory.get(user_id, 0) + _LIBRARY_SYNC_TTL > now:
-        return
 
-    token = await session.get(SpotifyToken, user_id)
-    if not token:
-        raise SpotifyServiceError("Spotify account not linked.")
-    access_token = await _ensure_access_token(session, token)
-    if not access_token:
-        raise SpotifyServiceError("Spotify access token unavailable.")
-
-    range_weights = {
-        "short_term": 1.0,
-        "medium_term": 0.85,
-        "long_term": 0.7,
-    }
-    weights: Dict[str, float] = {}
+    async def _report(stage: str, fraction: float) -> None:
+        if progress is not None:
+            await progress(stage, fraction)
 
-    for time_range, base_weight in range_weights.items():
-        tracks = await _pull_user_top_tracks(session, user_id, limit=50, time_range=time_range)
+    await _report("fetching", 0.1)
+    known_snapshots = dict(
+        (
+            await session.execute(
+                select(UserPlaylist.id, UserPlaylist.snapshot_id).where(UserPlaylist.user_id == user_id)
+            )
+        ).all()
+    )
+
+    # The session is not safe for concurrent use, so only HTTP work is fanned out.
+    async def _fetch_library(access_token: str) -> tuple:
+        return await asyncio.gather(
+            _fetch_all_top_tracks(access_token, user_id, 50, _TOP_TRACK_RANGES, refetch),
+            _sync_saved_tracks(access_token, user_id),
+            _fetch_user_playlists(access_token, user_id, limit=20, known_snapshots=known_snapshots),
+        )
+
+    top_tracks, _, playlists = await _call_with_refresh(session, user_id, _fetch_library)
+    saved_tracks = await newest_saved_tracks(session, user_id, saved_limit)
+
+    weights: Dict[str, float] = {}
+    for base_weight, tracks in zip(_RANGE_WEIGHTS.values(), top_tracks):
         for idx, track in enumerate(tracks):
             weight = base_weight - idx * 0.01
             if weight <= 0:
@@ -301,18 +449,23 @@ async def sync_user_library(session: AsyncSession, user_id: str, saved_limit: in
             if weight > current:
                 weights[track.track_uri] = weight
 
-    saved_tracks = await _fetch_saved_tracks(access_token, limit=saved_limit)
-    for idx, track in enumerate(saved_tracks):
+    for idx, track_uri in enumerate(saved_tracks):
         weight = max(0.4 - idx * 0.001, 0.05)
-        current = weights.get(track.track_uri, 0.0)
+        current = weights.get(track_uri, 0.0)
         if weight > current:
-            weights[track.track_uri] = weight
+            weights[track_uri] = weight
 
+    await _report("saving tracks", 0.5)
     await _persist_user_tracks(session, user_id, weights)
-
-    playlists = await _fetch_user_playlists(access_token, user_id, limit=20)
+    await _report("saving playlists", 0.7)
     await _persist_user_playlists(session, user_id, playlists)
-    _library_sync_memory[user_id] = now
+    await _report("aggregating", 0.85)
+    await update_library_sketches(session, user_id)
+    await refresh_taste_profile(session, user_id)
+    await rebuild_exclusion_filter(session, user_id)
+    await _bump_library_version(session, user_id, now)
+    await refresh_user_library_stats(session, user_id)
+    await mark(f"spotify:synced:{user_id}", LIBRARY_SYNC_TTL_SECONDS)
 
 
 async def fetch_spotify_seed_tracks(
@@ -322,14 +475,19 @@ async def fetch_spotify_seed_tracks(
     annotate_catalog: bool = False,
     time_range: str | None = None,
 ) -> List[SpotifySeedTrack]:
-    ranges = ["short_term", "medium_term", "long_term"]
+    ranges = list(_TOP_TRACK_RANGES)
     if time_range in ranges:
         ranges = [time_range]
 
+    batches = await _call_with_refresh(
+        session,
+        user_id,
+        lambda access_token: _fetch_all_top_tracks(access_token, user_id, min(limit, 50), ranges),
+    )
+
     seen: set[str] = set()
     tracks: List[SpotifySeedTrack] = []
-    for tr in ranges:
-        batch = await _pull_user_top_tracks(session, user_id, limit=min(limit, 50), time_range=tr)
+    for batch in batches:
         for track in batch:
             if track.track_uri in seen:
                 continue
@@ -345,33 +503,14 @@ async def fetch_spotify_seed_tracks(
 
 
 async def fetch_spotify_seed_uris(session: AsyncSession, user_id: str, limit: int = 3) -> List[str]:
-    try:
-        await sync_user_library(session, user_id)
-    except SpotifyServiceError:
-        pass
-
+    """Top-weighted catalog tracks from the stored library; never calls Spotify or syncs."""
     rows = (
         await session.execute(
             select(UserTrack.track_uri)
+            .join(Track, Track.track_uri == UserTrack.track_uri)
             .where(UserTrack.user_id == user_id)
-            .order_by(UserTrack.weight.desc())
-            .limit(max(limit * 5, 50))
+            .order_by(UserTrack.weight.desc(), UserTrack.track_uri)
+            .limit(limit)
         )
     ).scalars().all()
-
-    if rows:
-        dataset_rows = (
-            await session.execute(select(Track.track_uri).where(Track.track_uri.in_(rows)))
-        ).scalars().all()
-        if dataset_rows:
-            return dataset_rows[:limit]
-
-    # Fallback to direct API fetch if sync failed or no matches
-    raw_tracks = await fetch_spotify_seed_tracks(
-        session,
-        user_id,
-        limit=min(limit * 5, 50),
-        annotate_catalog=True,
-    )
-    available = [track.track_uri for track in raw_tracks if track.in_catalog]
-    return available[:limit]
+    return list(rows)
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..cache import get_json, set_json
+from ..config import get_settings
+
+_logger = logging.getLogger(__name__)
+
+_BACKOFF_BASE_SECONDS = 0.5
+_BACKOFF_CAP_SECONDS = 8.0
+_COOLDOWN_JITTER_SECONDS = 0.25
+# Longer Retry-After values (app-level bans) are surfaced instead of slept through.
+_MAX_RETRY_AFTER_SECONDS = 30.0
+_THROUGHPUT_WINDOW_SECONDS = 60.0
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_bucket: Optional["TokenBucket"] = None
+_blocked_until = 0.0  # monotonic deadline set by the last 429
+
+
+class SpotifyServiceError(Exception):
+    """Raised when Spotify data cannot be fetched or refreshed."""
+
+
+class SpotifyUnauthorizedError(SpotifyServiceError):
+    """Raised when Spotify rejects the access token; callers may refresh once and retry."""
+
+
+class SpotifyHTTPError(Exception):
+    """Raised when a paged Spotify request still fails after retries."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"Spotify request failed with status {status_code}")
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Admits ``rate`` requests per second on average with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting for it."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+@dataclass
+class SpotifyMetrics:
+    started_at: float = field(default_factory=time.time)
+    requests: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    transport_errors: int = 0
+    retries: int = 0
+    wait_seconds: float = 0.0
+    cache_hits: int = 0
+    not_modified: int = 0
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=10_000))
+
+    def record_request(self) -> None:
+        self.requests += 1
+        self.recent.append(time.monotonic())
+
+    def snapshot(self) -> Dict[str, Any]:
+        cutoff = time.monotonic() - _THROUGHPUT_WINDOW_SECONDS
+        while self.recent and self.recent[0] < cutoff:
+            self.recent.popleft()
+        data = asdict(self)
+        data.pop("recent")
+        data["requests_per_second"] = len(self.recent) / _THROUGHPUT_WINDOW_SECONDS
+        data["cooling_down_seconds"] = max(0.0, _blocked_until - time.monotonic())
+        return data
+
+
+_metrics = SpotifyMetrics()
+
+
+async def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        settings = get_settings()
+        _client = httpx.AsyncClient(
+            base_url=settings.spotify_api_base_url,
+            timeout=httpx.Timeout(20.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.spotify_max_concurrency * 2,
+                max_keepalive_connections=settings.spotify_max_concurrency,
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Caps in-flight Spotify calls for this process across every concurrent sync.
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_settings().spotify_max_concurrency)
+    return _semaphore
+
+
+def _get_bucket() -> TokenBucket:
+    global _bucket
+    if _bucket is None:
+        settings = get_settings()
+        _bucket = TokenBucket(settings.spotify_requests_per_second, settings.spotify_burst)
+    return _bucket
+
+
+def spotify_metrics() -> Dict[str, Any]:
+    return _metrics.snapshot()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _throttle() -> None:
+    delay = _blocked_until - time.monotonic()
+    if delay > 0:
+        # Spread the callers released by a shared cooldown instead of waking them together.
+        delay += random.uniform(0.0, _COOLDOWN_JITTER_SECONDS)
+        _metrics.wait_seconds += delay
+        await asyncio.sleep(delay)
+    _metrics.wait_seconds += await _get_bucket().acquire()
+
+
+async def _backoff(attempt: int) -> None:
+    ceiling = min(_BACKOFF_CAP_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** attempt)
+    await asyncio.sleep(random.uniform(ceiling / 2, ceiling))
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+
+async def _request(method: str, url: str, retry_server_errors: bool, **kwargs: Any) -> httpx.Response:
+    """Send through the process-wide rate limiter, retrying 429s and (when safe) 5xx/transport errors."""
+    global _blocked_until
+    client = await _get_client()
+    max_retries = get_settings().spotify_max_retries
+    attempt = 0
+    while True:
+        last_attempt = attempt >= max_retries
+        await _throttle()
+        _metrics.record_request()
+        try:
+            async with _get_semaphore():
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            _metrics.transport_errors += 1
+            if last_attempt or not retry_server_errors:
+                raise
+            _metrics.retries += 1
+            await _backoff(attempt)
+            attempt += 1
+            continue
+
+        if response.status_code == 429:
+            _metrics.throttled += 1
+            retry_after = _retry_after(response)
+            _blocked_until = max(_blocked_until, time.monotonic() + retry_after)
+            _logger.warning("Spotify rate limited %s %s; retry after %.1fs", method, url, retry_after)
+            if last_attempt or retry_after > _MAX_RETRY_AFTER_SECONDS:
+                return response
+            _metrics.retries += 1
+            attempt += 1
+            continue
+        if response.status_code >= 500:
+            _metrics.server_errors += 1
+            if last_attempt or not retry_server_errors:
+                return response
+            _metrics.retries += 1
+            await _backoff(attempt)
+            attempt += 1
+            continue
+        return response
+
+
+async def spotify_get(
+    url: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> httpx.Response:
+    """GET a Web API path (or an absolute ``next`` URL) over the shared connection pool."""
+    return await _request(
+        "GET",
+        url,
+        retry_server_errors=True,
+        params=params,
+        headers={**(headers or {}), "Authorization": f"Bearer {access_token}"},
+    )
+
+
+async def cached_get(
+    cache_key: str,
+    url: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]],
+    transform: Callable[[dict], Any],
+    fresh_seconds: int,
+    keep_seconds: int,
+) -> Tuple[int, Any]:
+    """GET through a Redis response cache; returns ``(status_code, value)``.
+
+    Entries younger than ``fresh_seconds`` are served without a request. Older ones are
+    revalidated with ``If-None-Match`` and kept for ``keep_seconds``. Only ``transform(body)``
+    is stored, and ``value`` is ``None`` when the request failed.
+    """
+    cached = await get_json(cache_key)
+    if cached is not None and time.time() - float(cached.get("fetched_at") or 0.0) < fresh_seconds:
+        _metrics.cache_hits += 1
+        return 200, cached["value"]
+
+    headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else None
+    response = await spotify_get(url, access_token, params, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        _metrics.not_modified += 1
+        value = cached["value"]
+    elif response.status_code >= 400:
+        return response.status_code, None
+    else:
+        value = transform(response.json())
+    entry = {
+        "etag": response.headers.get("ETag") or (cached or {}).get("etag"),
+        "fetched_at": time.time(),
+        "value": value,
+    }
+    await set_json(cache_key, entry, ttl_seconds=keep_seconds)
+    return 200, value
+
+
+async def spotify_post_token(data: Dict[str, str], auth_header: str) -> httpx.Response:
+    headers = {
+        "Authorization": f"Basic {auth_header}",
+        "Content-Type": "application/x-www-form-urlencoded",
+    }
+    url = f"{get_settings().spotify_accounts_base_url}/api/token"
+    # Refresh grants may rotate the refresh token, so only throttled (unprocessed) calls are retried.
+    return await _request("POST", url, retry_server_errors=False, data=data, headers=headers)
+
+
+async def _get_page(path: str, access_token: str, params: Dict[str, Any]) -> dict:
+    response = await spotify_get(path, access_token, params)
+    if response.status_code >= 400:
+        raise SpotifyHTTPError(response.status_code)
+    return response.json()
+
+
+async def fetch_pages(
+    path: str,
+    access_token: str,
+    page_size: int,
+    limit: int,
+    params: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    """Collect up to ``limit`` items from an offset-paged endpoint.
+
+    The first page reports ``total``; the remaining offsets are requested concurrently.
+    Raises ``SpotifyHTTPError`` if any page still fails after retries, so callers never
+    mistake a truncated listing for the full one.
+    """
+    base_params = dict(params or {})
+    data = await _get_page(path, access_token, {**base_params, "limit": page_size, "offset": 0})
+    items: List[dict] = list(data.get("items") or [])
+    if not data.get("next"):
+        return items[:limit]
+
+    total = min(int(data.get("total") or 0), limit)
+    pages = await asyncio.gather(
+        *(
+            _get_page(path, access_token, {**base_params, "limit": page_size, "offset": offset})
+            for offset in range(page_size, total, page_size)
+        )
+    )
+    for page in pages:
+        items.extend(page.get("items") or [])
+    return items[:limit]
+
+
+async def iter_pages(
+    path: str,
+    access_token: str,
+    page_size: int,
+    window: int = 1,
+    params: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Tuple[int, List[dict]]]:
+    """Yield ``(total, items)`` for each page of an offset-paged endpoint, in order.
+
+    After the first page, ``window`` pages are requested at a time, so at most that many
+    are held in memory. Stop iterating to stop paging; failures raise ``SpotifyHTTPError``.
+    """
+    base_params = dict(params or {})
+    data = await _get_page(path, access_token, {**base_params, "limit": page_size, "offset": 0})
+    total = int(data.get("total") or 0)
+    yield total, list(data.get("items") or [])
+    if not data.get("next"):
+        return
+
+    offset = page_size
+    while offset < total:
+        offsets = range(offset, min(total, offset + window * page_size), page_size)
+        pages = await asyncio.gather(
+            *(
+                _get_page(path, access_token, {**base_params, "limit": page_size, "offset": page_offset})
+                for page_offset in offsets
+            )
+        )
+        for page in pages:
+            yield total, list(page.get("items") or [])
+            if not page.get("next"):
+                return
+        offset += len(offsets) * page_size
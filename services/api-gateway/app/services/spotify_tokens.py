@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache import get_client, get_json, set_json
+from ..config import get_settings
+from ..coordination import TTLMirror, distributed_lock
+from ..db import session_scope
+from ..models import SpotifyToken
+from .spotify_client import SpotifyServiceError, spotify_post_token
+
+_logger = logging.getLogger(__name__)
+
+# Only access tokens are cached; refresh tokens never leave Postgres.
+_CACHE_PREFIX = "spotify:token:v1:"
+_ACTIVE_KEY = "spotify:token:active:v1"
+_LOCK_PREFIX = "spotify:token-refresh:"
+
+EXPIRY_MARGIN_SECONDS = 90
+_REFRESH_AHEAD_SECONDS = 600
+_REFRESH_INTERVAL_SECONDS = 60
+_REFRESH_CONCURRENCY = 4
+# Tokens are only kept warm for users who called Spotify through us recently.
+_ACTIVE_WINDOW_SECONDS = 24 * 3600
+_ACTIVE_TOUCH_SECONDS = 300
+_LOCK_TTL_SECONDS = 30
+_LOCK_WAIT_SECONDS = 5.0
+
+_tokens: TTLMirror[dict] = TTLMirror()
+_active: TTLMirror[float] = TTLMirror()
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def _usable(entry: Optional[dict], min_valid_seconds: float = EXPIRY_MARGIN_SECONDS) -> bool:
+    return bool(entry) and float(entry["expires_at"]) - min_valid_seconds > time.time()
+
+
+async def _read_cached(user_id: str) -> Optional[dict]:
+    entry = _tokens.get(user_id)
+    if _usable(entry):
+        return entry
+    entry = await get_json(f"{_CACHE_PREFIX}{user_id}")
+    if _usable(entry):
+        _tokens.set(user_id, entry, float(entry["expires_at"]) - EXPIRY_MARGIN_SECONDS - time.time())
+        return entry
+    return None
+
+
+async def cache_access_token(user_id: str, access_token: str, expires_at: int) -> None:
+    """Publish a freshly issued access token to this process and the shared cache."""
+    ttl = int(expires_at - time.time())
+    if not access_token or ttl <= 0:
+        return
+    entry = {"access_token": access_token, "expires_at": int(expires_at)}
+    _tokens.set(user_id, entry, ttl - EXPIRY_MARGIN_SECONDS)
+    await set_json(f"{_CACHE_PREFIX}{user_id}", entry, ttl_seconds=ttl)
+
+
+async def _touch(user_id: str) -> None:
+    now = time.time()
+    last = _active.get(user_id)
+    if last is not None and now - last < _ACTIVE_TOUCH_SECONDS:
+        return
+    _active.set(user_id, now, _ACTIVE_WINDOW_SECONDS)
+    client = await get_client()
+    if client:
+        await client.zadd(_ACTIVE_KEY, {user_id: now})
+
+
+async def get_access_token(session: AsyncSession, user_id: str) -> str:
+    """Return a usable access token, reading Postgres or refreshing only on a cache miss."""
+    await _touch(user_id)
+    entry = await _read_cached(user_id)
+    if entry:
+        return entry["access_token"]
+
+    token = await session.get(SpotifyToken, user_id)
+    if not token:
+        raise SpotifyServiceError("Spotify account not linked.")
+    if (token.expires_at and token.expires_at - EXPIRY_MARGIN_SECONDS > time.time()) or not token.refresh_token:
+        if not token.access_token:
+            raise SpotifyServiceError("Spotify access token unavailable.")
+        await cache_access_token(user_id, token.access_token, token.expires_at or 0)
+        return token.access_token
+    return await refresh_access_token(session, user_id)
+
+
+async def refresh_access_token(session: AsyncSession, user_id: str, rejected: Optional[str] = None) -> str:
+    """Renew the user's token once across the fleet; concurrent callers reuse the result.
+
+    ``rejected`` is the token Spotify just answered 401 for; it is never handed back.
+    """
+    async with distributed_lock(f"{_LOCK_PREFIX}{user_id}", _LOCK_TTL_SECONDS) as acquired:
+        if acquired:
+            return await _refresh(session, user_id, rejected, EXPIRY_MARGIN_SECONDS)
+
+    deadline = time.monotonic() + _LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        entry = await _read_cached(user_id)
+        if entry and entry["access_token"] != rejected:
+            return entry["access_token"]
+    raise SpotifyServiceError("Unable to refresh Spotify token.")
+
+
+async def _refresh(
+    session: AsyncSession,
+    user_id: str,
+    rejected: Optional[str],
+    min_valid_seconds: float,
+) -> str:
+    # Another worker may have refreshed between our cache miss and taking the lock.
+    token = await session.get(SpotifyToken, user_id, populate_existing=True)
+    if not token:
+        raise SpotifyServiceError("Spotify account not linked.")
+    if (
+        token.access_token
+        and token.access_token != rejected
+        and (token.expires_at or 0) - min_valid_seconds > time.time()
+    ):
+        await cache_access_token(user_id, token.access_token, token.expires_at)
+        return token.access_token
+
+    settings = get_settings()
+    if not settings.spotify_client_id or not settings.spotify_client_secret:
+        raise SpotifyServiceError("Spotify credentials are not configured")
+    if not token.refresh_token:
+        raise SpotifyServiceError("Spotify refresh token missing")
+
+    credentials = f"{settings.spotify_client_id}:{settings.spotify_client_secret}".encode("utf-8")
+    auth_header = base64.b64encode(credentials).decode("utf-8")
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": token.refresh_token,
+    }
+    response = await spotify_post_token(data, auth_header)
+    if response.status_code >= 400:
+        raise SpotifyServiceError("Failed to refresh Spotify token")
+    payload = response.json()
+    token.access_token = payload.get("access_token", token.access_token)
+    expires_in = int(payload.get("expires_in") or 3600)
+    token.expires_at = int(time.time()) + expires_in
+    if payload.get("refresh_token"):
+        token.refresh_token = payload["refresh_token"]
+    await session.commit()
+    await cache_access_token(user_id, token.access_token, token.expires_at)
+    return token.access_token
+
+
+async def _active_user_ids() -> List[str]:
+    client = await get_client()
+    if not client:
+        return _active.keys()
+    cutoff = time.time() - _ACTIVE_WINDOW_SECONDS
+    await client.zremrangebyscore(_ACTIVE_KEY, "-inf", cutoff)
+    members = await client.zrangebyscore(_ACTIVE_KEY, cutoff, "+inf")
+    return [member.decode() if isinstance(member, bytes) else member for member in members]
+
+
+async def refresh_expiring_tokens() -> int:
+    """Renew active users' tokens that expire within the look-ahead window; returns the count."""
+    user_ids = await _active_user_ids()
+    if not user_ids:
+        return 0
+    horizon = int(time.time()) + _REFRESH_AHEAD_SECONDS
+    async with session_scope() as session:
+        due = (
+            await session.execute(
+                select(SpotifyToken.user_id).where(
+                    SpotifyToken.user_id.in_(user_ids),
+                    SpotifyToken.refresh_token.is_not(None),
+                    SpotifyToken.expires_at < horizon,
+                )
+            )
+        ).scalars().all()
+
+    semaphore = asyncio.Semaphore(_REFRESH_CONCURRENCY)
+
+    async def _renew(user_id: str) -> bool:
+        async with semaphore:
+            async with distributed_lock(f"{_LOCK_PREFIX}{user_id}", _LOCK_TTL_SECONDS) as acquired:
+                if not acquired:
+                    return False
+                async with session_scope() as session:
+                    try:
+                        await _refresh(session, user_id, None, _REFRESH_AHEAD_SECONDS)
+                    except SpotifyServiceError as exc:
+                        _logger.info("Background refresh for %s failed: %s", user_id, exc)
+                        return False
+                    return True
+
+    return sum(await asyncio.gather(*(_renew(user_id) for user_id in due)))
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(_REFRESH_INTERVAL_SECONDS)
+        try:
+            await refresh_expiring_tokens()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - the next pass retries
+            _logger.warning("Spotify token refresher pass failed: %s", exc)
+
+
+async def start_token_refresher() -> None:
+    global _refresher_task
+    if _refresher_task is None:
+        _refresher_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_token_refresher() -> None:
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        await asyncio.gather(_refresher_task, return_exceptions=True)
+        _refresher_task = None
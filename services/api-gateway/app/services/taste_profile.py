@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Track, UserTasteProfile, UserTrack
+from .clustering import weighted_kmeans
+
+PROFILE_FEATURES = (
+    "danceability",
+    "energy",
+    "valence",
+    "acousticness",
+    "instrumentalness",
+    "speechiness",
+    "liveness",
+    "tempo",
+    "loudness",
+    "release_year",
+)
+# Features outside 0..1 are min-max scaled so no single one dominates distances.
+_FEATURE_RANGES = {
+    "tempo": (0.0, 250.0),
+    "loudness": (-60.0, 0.0),
+    "release_year": (1950.0, 2035.0),
+}
+MAX_CLUSTERS = 4
+_TRACKS_PER_CLUSTER = 20
+_SEEDS_PER_CLUSTER = 5
+
+
+@dataclass
+class TasteCluster:
+    weight: float
+    centroid: Dict[str, float]
+    seed_uris: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TasteProfile:
+    user_id: str
+    centroid: Dict[str, float]
+    clusters: List[TasteCluster]
+    track_count: int
+    updated_at: float
+
+
+def feature_matrix(rows: Sequence[Sequence[Optional[float]]], weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Scale raw ``PROFILE_FEATURES`` rows to 0..1, filling gaps with the (weighted) column mean."""
+    matrix = np.array(
+        [[np.nan if value is None else float(value) for value in row] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(PROFILE_FEATURES))
+    for column, name in enumerate(PROFILE_FEATURES):
+        low, high = _FEATURE_RANGES.get(name, (0.0, 1.0))
+        matrix[:, column] = np.clip((matrix[:, column] - low) / (high - low), 0.0, 1.0)
+
+    missing = np.isnan(matrix)
+    if missing.any():
+        w = np.ones(len(matrix)) if weights is None else np.asarray(weights, dtype=np.float64)
+        present = (~missing) * w[:, None]
+        totals = present.sum(axis=0)
+        means = np.divide(
+            np.where(missing, 0.0, matrix).T @ w,
+            totals,
+            out=np.full(matrix.shape[1], 0.5),
+            where=totals > 0,
+        )
+        matrix = np.where(missing, means[None, :], matrix)
+    return matrix
+
+
+def track_feature_row(track: Track) -> List[Optional[float]]:
+    return [getattr(track, name) for name in PROFILE_FEATURES]
+
+
+def denormalize(vector: np.ndarray) -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    for name, value in zip(PROFILE_FEATURES, vector):
+        low, high = _FEATURE_RANGES.get(name, (0.0, 1.0))
+        values[name] = float(low + value * (high - low))
+    return values
+
+
+def _build_profile(user_id: str, uris: List[str], weights: np.ndarray, matrix: np.ndarray) -> TasteProfile:
+    centroid = (matrix * weights[:, None]).sum(axis=0) / weights.sum()
+    k = min(MAX_CLUSTERS, max(1, len(uris) // _TRACKS_PER_CLUSTER))
+    centroids, shares, labels = weighted_kmeans(matrix, k, weights=weights)
+
+    clusters: List[TasteCluster] = []
+    distances = np.sqrt(((matrix - centroids[labels]) ** 2).sum(axis=1))
+    # Representatives are heavily weighted tracks close to their cluster's centre.
+    scores = weights / (1.0 + 4.0 * distances)
+    for index, (center, share) in enumerate(zip(centroids, shares)):
+        members = np.flatnonzero(labels == index)
+        best = members[np.argsort(-scores[members], kind="stable")[:_SEEDS_PER_CLUSTER]]
+        clusters.append(
+            TasteCluster(weight=float(share), centroid=denormalize(center), seed_uris=[uris[i] for i in best])
+        )
+    return TasteProfile(
+        user_id=user_id,
+        centroid=denormalize(centroid),
+        clusters=clusters,
+        track_count=len(uris),
+        updated_at=time.time(),
+    )
+
+
+async def refresh_taste_profile(session: AsyncSession, user_id: str) -> Optional[TasteProfile]:
+    """Rebuild the stored profile from the user's catalog-matched library; the caller commits."""
+    rows = (
+        await session.execute(
+            select(UserTrack.track_uri, UserTrack.weight, *(getattr(Track, name) for name in PROFILE_FEATURES))
+            .join(Track, Track.track_uri == UserTrack.track_uri)
+            .where(UserTrack.user_id == user_id, UserTrack.weight > 0)
+            .order_by(UserTrack.track_uri)
+        )
+    ).all()
+    stored = await session.get(UserTasteProfile, user_id)
+    if not rows:
+        if stored is not None:
+            await session.delete(stored)
+        return None
+
+    uris = [row[0] for row in rows]
+    weights = np.array([float(row[1]) for row in rows], dtype=np.float64)
+    profile = _build_profile(user_id, uris, weights, feature_matrix([row[2:] for row in rows], weights))
+
+    payload = json.dumps({"centroid": profile.centroid, "clusters": [asdict(c) for c in profile.clusters]})
+    if stored is None:
+        stored = UserTasteProfile(user_id=user_id)
+        session.add(stored)
+    stored.payload = payload
+    stored.track_count = profile.track_count
+    stored.updated_at = profile.updated_at
+    return profile
+
+
+async def load_taste_profile(session: AsyncSession, user_id: str) -> Optional[TasteProfile]:
+    stored = await session.get(UserTasteProfile, user_id)
+    if stored is None:
+        return None
+    data = json.loads(stored.payload)
+    return TasteProfile(
+        user_id=user_id,
+        centroid=data["centroid"],
+        clusters=[TasteCluster(**cluster) for cluster in data["clusters"]],
+        track_count=stored.track_count,
+        updated_at=stored.updated_at,
+    )
+
+
+def profile_seed_uris(profile: TasteProfile, limit: int) -> List[str]:
+    """Take representatives round-robin across clusters, heaviest cluster first."""
+    seeds: List[str] = []
+    for rank in range(_SEEDS_PER_CLUSTER):
+        for cluster in profile.clusters:
+            if rank < len(cluster.seed_uris) and cluster.seed_uris[rank] not in seeds:
+                seeds.append(cluster.seed_uris[rank])
+                if len(seeds) >= limit:
+                    return seeds
+    return seeds
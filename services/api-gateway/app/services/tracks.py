@@ -1,28 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import math
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 from sqlalchemy import and_, func, literal, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..db import session_scope
 from ..models import Track
+from ..stats import get_stats
+from ..sync_queue import request_sync
 from ..schemas import (
     DiscoveryJourney,
     JourneyStep,
     RecommendationResponseItem,
     StoryInsight,
-    StatsResponse,
     Suggestion,
     TrackDetail,
     TrackSummary,
 )
 from ..utils import to_detail_schema, to_suggestion_schema, to_summary_schema
-from .spotify import SpotifyServiceError, fetch_spotify_seed_uris
+from .clustering import weighted_kmeans
+from .diversify import RankedItem, diversify
+from .exclusions import filter_excluded
+from .spotify import fetch_spotify_seed_uris
 from .ml_client import MLServiceError, rank_candidates
+from .taste_profile import (
+    TasteProfile,
+    feature_matrix,
+    load_taste_profile,
+    profile_seed_uris,
+    track_feature_row,
+)
 from .user_stats import compute_user_library_stats
 
 
+_MIN_CANDIDATE_POOL = 200
+_MAX_SEED_CLUSTERS = 3
+# Seed groups closer than this in scaled feature space are treated as one mood.
+_CLUSTER_SPLIT_DISTANCE = 0.35
+
+
+@dataclass
+class SeedCluster:
+    seeds: List[Track]
+    weight: float
+    targets: Optional[Dict[str, float]] = None
+
+
 async def search_tracks(session: AsyncSession, query: str, limit: int = 25) -> List[TrackSummary]:
     tokens = [token.strip().lower() for token in query.split() if token.strip()]
     if not tokens:
@@ -112,53 +140,61 @@ async def get_track_detail(session: AsyncSession, uri: str) -> TrackDetail | Non
     return to_detail_schema(row)
 
 
-async def _resolve_seed_uris(
+async def _resolve_seeds(
     session: AsyncSession,
     uris: List[str],
     spotify_user_id: str | None,
     seed_limit: int,
-) -> List[str]:
+) -> Tuple[List[str], Optional[TasteProfile]]:
     unique = [uri for uri in dict.fromkeys(uris) if uri]
     if unique:
-        return unique[:seed_limit]
+        return unique[:seed_limit], None
     if not spotify_user_id:
-        return []
-    try:
-        return await fetch_spotify_seed_uris(session, spotify_user_id, limit=seed_limit)
-    except SpotifyServiceError:
-        return []
+        return [], None
+    # Linked users start from the profile built at sync time; a stale library is
+    # only queued for a background refresh, never synced inline.
+    await request_sync(session, spotify_user_id)
+    profile = await load_taste_profile(session, spotify_user_id)
+    if profile is not None:
+        return profile_seed_uris(profile, seed_limit), profile
+    return await fetch_spotify_seed_uris(session, spotify_user_id, limit=seed_limit), None
 
 
 def _clamp_range(value: float, margin: float, min_value: float = 0.0, max_value: float = 1.0) -> tuple[float, float]:
     return max(min_value, value - margin), min(max_value, value + margin)
 
 
-def _extract_seed_filters(seeds: List[Track]) -> tuple[list, dict[str, float]]:
+def _extract_seed_filters(
+    seeds: List[Track],
+    targets: Optional[Dict[str, float]] = None,
+) -> tuple[list, dict[str, float]]:
+    """Build candidate filters around the seeds; ``targets`` (a taste centroid) overrides seed means."""
     filters: list = []
     stats: dict[str, float] = {}
+    targets = targets or {}
 
     years = [seed.release_year for seed in seeds if isinstance(seed.release_year, int)]
     if years:
         min_year = min(years) - 5
         max_year = max(years) + 5
         filters.append(Track.release_year.between(max(min_year, 1950), min(max_year, 2035)))
-        stats["release_year"] = float(np.mean(years))
+        stats["release_year"] = targets.get("release_year", float(np.mean(years)))
 
     energies = [seed.energy for seed in seeds if isinstance(seed.energy, (int, float))]
     if energies:
-        energy_avg = float(np.mean(energies))
+        energy_avg = targets.get("energy", float(np.mean(energies)))
         filters.append(Track.energy.between(*_clamp_range(energy_avg, 0.2)))
         stats["energy"] = energy_avg
 
     dances = [seed.danceability for seed in seeds if isinstance(seed.danceability, (int, float))]
     if dances:
-        dance_avg = float(np.mean(dances))
+        dance_avg = targets.get("danceability", float(np.mean(dances)))
         filters.append(Track.danceability.between(*_clamp_range(dance_avg, 0.2)))
         stats["danceability"] = dance_avg
 
     valences = [seed.valence for seed in seeds if isinstance(seed.valence, (int, float))]
     if valences:
-        valence_avg = float(np.mean(valences))
+        valence_avg = targets.get("valence", float(np.mean(valences)))
         filters.append(Track.valence.between(*_clamp_range(valence_avg, 0.25)))
         stats["valence"] = valence_avg
 
@@ -199,8 +235,14 @@ def _order_expressions(stats: dict[str, float]) -> List:
     return orders
 
 
-def _candidate_statement(seed_uris: List[str], filters: Optional[list], stats: dict[str, float], limit: int) -> select:
-    stmt = select(Track).where(~Track.track_uri.in_(seed_uris)).limit(max(limit * 10, 200))
+def _candidate_statement(
+    seed_uris: List[str],
+    filters: Optional[list],
+    stats: dict[str, float],
+    limit: int,
+    min_pool: int = _MIN_CANDIDATE_POOL,
+) -> select:
+    stmt = select(Track).where(~Track.track_uri.in_(seed_uris)).limit(max(limit * 10, min_pool))
     if filters:
         stmt = stmt.where(and_(*filters))
     orders = _order_expressions(stats)
@@ -211,50 +253,60 @@ def _candidate_statement(seed_uris: List[str], filters: Optional[list], stats: d
     return stmt
 
 
-async def fetch_recommendations(
-    session: AsyncSession,
-    uris: List[str],
-    limit: int = 25,
-    spotify_user_id: str | None = None,
-    seed_limit: int = 3,
-) -> List[RecommendationResponseItem]:
-    seed_uris = await _resolve_seed_uris(session, uris, spotify_user_id, seed_limit)
-    if not seed_uris:
-        return []
-
-    seeds = (await session.execute(select(Track).where(Track.track_uri.in_(seed_uris)))).scalars().all()
-    if not seeds:
-        return []
-
-    filters, stats = _extract_seed_filters(seeds)
-    candidate_stmt = _candidate_statement(seed_uris, filters, stats, limit)
-    candidates = (await session.execute(candidate_stmt)).scalars().all()
-
-    if not candidates:
-        # fall back to a relaxed pool to guarantee output
-        relaxed_stmt = _candidate_statement(seed_uris, None, {}, limit)
-        candidates = (await session.execute(relaxed_stmt)).scalars().all()
+def _seed_weight(seed: Track) -> float:
+    popularity = float(seed.popularity) if seed.popularity is not None else 50.0
+    return max(popularity / 100.0, 0.01)
 
-    if not candidates:
-        return []
 
-    seeds_payload = []
-    for seed in seeds:
-        popularity = float(seed.popularity) if seed.popularity is not None else 50.0
-        weight = max(popularity / 100.0, 0.01)
-        seeds_payload.append({"track_uri": seed.track_uri, "weight": weight})
-    candidate_map: Dict[str, Track] = {candidate.track_uri: candidate for candidate in candidates}
-    candidate_uris = list(candidate_map.keys())
-
-    ranked_items: Optional[List[Tuple[Track, float, Optional[Dict[str, float]]]]] = None
+def _cluster_seeds(seeds: List[Track], profile: Optional[TasteProfile]) -> List[SeedCluster]:
+    """Split seeds into mood groups so distant seeds are not averaged into an empty middle."""
+    if profile is not None:
+        by_uri = {seed.track_uri: seed for seed in seeds}
+        clusters = [
+            SeedCluster([by_uri[uri] for uri in cluster.seed_uris if uri in by_uri], cluster.weight, cluster.centroid)
+            for cluster in profile.clusters
+        ]
+        clusters = [cluster for cluster in clusters if cluster.seeds]
+        if len(clusters) > 1:
+            total = sum(cluster.weight for cluster in clusters)
+            return [SeedCluster(cluster.seeds, cluster.weight / total, cluster.targets) for cluster in clusters]
+        return [SeedCluster(list(seeds), 1.0, profile.centroid)]
+
+    if len(seeds) < 2:
+        return [SeedCluster(list(seeds), 1.0)]
+    weights = np.array([_seed_weight(seed) for seed in seeds])
+    points = feature_matrix([track_feature_row(seed) for seed in seeds], weights)
+    for k in range(min(_MAX_SEED_CLUSTERS, len(seeds)), 1, -1):
+        centroids, shares, labels = weighted_kmeans(points, k, weights=weights)
+        if len(centroids) < 2:
+            continue
+        gaps = np.sqrt(((centroids[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+        if gaps[np.triu_indices(len(centroids), 1)].min() >= _CLUSTER_SPLIT_DISTANCE:
+            return [
+                SeedCluster([seed for seed, label in zip(seeds, labels) if label == index], float(share))
+                for index, share in enumerate(shares)
+            ]
+    return [SeedCluster(list(seeds), 1.0)]
+
+
+async def _rank(seeds: List[Track], candidates: List[Track]) -> List[RankedItem]:
+    # Dense ids keep the ML payload small. The importer and startup assign them, so URIs are
+    # only sent for a batch touching tracks inserted since.
+    by_id = all(track.track_id is not None for track in (*seeds, *candidates))
+    key = "track_id" if by_id else "track_uri"
+    seeds_payload = [{key: getattr(seed, key), "weight": _seed_weight(seed)} for seed in seeds]
+    candidate_map: Dict[object, Track] = {getattr(candidate, key): candidate for candidate in candidates}
+    candidate_keys = list(candidate_map.keys())
+
+    ranked_items: Optional[List[RankedItem]] = None
     try:
-        ml_results = await rank_candidates(seeds_payload, candidate_uris)
+        if by_id:
+            ml_results = await rank_candidates(seeds_payload, candidate_ids=candidate_keys)
+        else:
+            ml_results = await rank_candidates(seeds_payload, candidate_uris=candidate_keys)
         ranked_items = []
         for item in ml_results:
-            uri = item.get("track_uri")
-            if not isinstance(uri, str):
-                continue
-            track = candidate_map.get(uri)
+            track = candidate_map.get(item.get(key))
             if track is None:
                 continue
             score = float(item.get("score", 0.0))
@@ -267,125 +319,125 @@ async def fetch_recommendations(
 
     if not ranked_items:
         ranked_items = _fallback_rank(seeds, candidates)
-
     ranked_items.sort(key=lambda entry: entry[1], reverse=True)
+    return ranked_items
 
-    return [
-        RecommendationResponseItem(
-            **to_summary_schema(track).dict(),
-            similarity=score,
-            components=components,
-        )
-        for track, score, components in ranked_items[:limit]
-    ]
 
+async def _load_candidates(session: AsyncSession, stmt: select, spotify_user_id: str | None) -> List[Track]:
+    candidates = (await session.execute(stmt)).scalars().all()
+    if not spotify_user_id or not candidates:
+        return list(candidates)
+    # Skip tracks the user already owns or turned down before spending ranking work on them.
+    allowed = set(await filter_excluded(spotify_user_id, [candidate.track_uri for candidate in candidates]))
+    return [candidate for candidate in candidates if candidate.track_uri in allowed]
 
-async def compute_statistics(session: AsyncSession) -> StatsResponse:
-    totals_row = (
-        await session.execute(
-            select(
-                func.count(Track.track_uri),
-                func.count(func.distinct(Track.track_uri)),
-                func.count(func.distinct(Track.artist_names)),
-                func.avg(Track.popularity),
-                func.avg(Track.danceability),
-                func.avg(Track.energy),
-                func.min(Track.release_year),
-                func.max(Track.release_year),
-            )
-        )
-    ).first()
-
-    totals = {
-        "total_rows": int(totals_row[0] or 0),
-        "unique_tracks": int(totals_row[1] or 0),
-        "unique_artists": int(totals_row[2] or 0),
-        "average_popularity": float(totals_row[3]) if totals_row[3] is not None else None,
-        "average_danceability": float(totals_row[4]) if totals_row[4] is not None else None,
-        "average_energy": float(totals_row[5]) if totals_row[5] is not None else None,
-        "release_year_range": {
-            "min": int(totals_row[6]) if totals_row[6] is not None else None,
-            "max": int(totals_row[7]) if totals_row[7] is not None else None,
-        },
-    }
-
-    top_artists_rows = (
-        await session.execute(
-            select(Track.artist_names, func.count())
-            .group_by(Track.artist_names)
-            .order_by(func.count().desc())
-            .limit(10)
-        )
-    ).all()
-    top_artists = [
-        {"name": row[0], "count": int(row[1])}
-        for row in top_artists_rows
-        if row[0]
-    ]
 
-    top_genres_rows = (
-        await session.execute(
-            select(Track.genres)
-            .where(Track.genres.isnot(None))
-            .limit(10000)
-        )
-    ).all()
-    genre_counter: dict[str, int] = {}
-    for row in top_genres_rows:
-        for genre in (row[0] or "").split(","):
-            genre = genre.strip()
-            if genre:
-                genre_counter[genre] = genre_counter.get(genre, 0) + 1
-    top_genres = [
-        {"name": name, "count": count}
-        for name, count in sorted(genre_counter.items(), key=lambda item: item[1], reverse=True)[:15]
-    ]
+async def _recommend_for_cluster(
+    session: AsyncSession,
+    cluster: SeedCluster,
+    exclude_uris: List[str],
+    limit: int,
+    min_pool: int,
+    diversity: float,
+    spotify_user_id: str | None,
+) -> List[RankedItem]:
+    filters, stats = _extract_seed_filters(cluster.seeds, cluster.targets)
+    candidate_stmt = _candidate_statement(exclude_uris, filters, stats, limit, min_pool)
+    candidates = await _load_candidates(session, candidate_stmt, spotify_user_id)
 
-    yearly_rows = (
-        await session.execute(
-            select(Track.release_year, func.count())
-            .where(Track.release_year.isnot(None))
-            .group_by(Track.release_year)
-            .order_by(Track.release_year)
-        )
-    ).all()
-    yearly_counts = [
-        {"year": int(row[0]), "count": int(row[1])}
-        for row in yearly_rows
-    ]
+    if not candidates:
+        # fall back to a relaxed pool to guarantee output
+        relaxed_stmt = _candidate_statement(exclude_uris, None, {}, limit, min_pool)
+        candidates = await _load_candidates(session, relaxed_stmt, spotify_user_id)
+
+    if not candidates:
+        return []
+
+    ranked_items = await _rank(cluster.seeds, candidates)
+    if diversity > 0:
+        ranked_items = diversify(ranked_items, limit, diversity)
+    return ranked_items
+
+
+def _interleave(ranked_lists: List[List[RankedItem]], weights: List[float], limit: int) -> List[RankedItem]:
+    """Smooth weighted round-robin: each slot goes to the cluster furthest behind its share."""
+    positions = [0] * len(ranked_lists)
+    credit = [0.0] * len(ranked_lists)
+    seen: set[str] = set()
+    merged: List[RankedItem] = []
+    while len(merged) < limit:
+        for index, items in enumerate(ranked_lists):
+            # Tracks another cluster already placed do not cost this cluster its turn.
+            while positions[index] < len(items) and items[positions[index]][0].track_uri in seen:
+                positions[index] += 1
+        active = [index for index, items in enumerate(ranked_lists) if positions[index] < len(items)]
+        if not active:
+            break
+        for index in active:
+            credit[index] += weights[index]
+        chosen = max(active, key=lambda index: credit[index])
+        credit[chosen] -= sum(weights[index] for index in active)
+        item = ranked_lists[chosen][positions[chosen]]
+        positions[chosen] += 1
+        seen.add(item[0].track_uri)
+        merged.append(item)
+    return merged
+
+
+async def fetch_recommendations(
+    session: AsyncSession,
+    uris: List[str],
+    limit: int = 25,
+    spotify_user_id: str | None = None,
+    seed_limit: int = 3,
+    diversity: float = 0.0,
+) -> List[RecommendationResponseItem]:
+    seed_uris, profile = await _resolve_seeds(session, uris, spotify_user_id, seed_limit)
+    if not seed_uris:
+        return []
+
+    seeds = (await session.execute(select(Track).where(Track.track_uri.in_(seed_uris)))).scalars().all()
+    if not seeds:
+        return []
+
+    clusters = _cluster_seeds(list(seeds), profile)
+    if len(clusters) == 1:
+        ranked_lists = [
+            await _recommend_for_cluster(
+                session, clusters[0], seed_uris, limit, _MIN_CANDIDATE_POOL, diversity, spotify_user_id
+            )
+        ]
+    else:
+        # Each cluster gets its share of the candidate pool, so the total work matches a single centroid.
+        min_pool = max(_MIN_CANDIDATE_POOL // len(clusters), 50)
+
+        async def _retrieve(cluster: SeedCluster) -> List[RankedItem]:
+            # AsyncSession is not safe for concurrent use; each cluster queries on its own.
+            async with session_scope() as cluster_session:
+                cluster_limit = max(1, math.ceil(limit * cluster.weight))
+                return await _recommend_for_cluster(
+                    cluster_session, cluster, seed_uris, cluster_limit, min_pool, diversity, spotify_user_id
+                )
 
-    top_tracks_rows = (
-        await session.execute(
-            select(Track.track_uri, Track.track_name, Track.artist_names, Track.popularity)
-            .order_by(Track.popularity.desc().nullslast())
-            .limit(10)
+        ranked_lists = list(await asyncio.gather(*(_retrieve(cluster) for cluster in clusters)))
+
+    ranked_items = _interleave(ranked_lists, [cluster.weight for cluster in clusters], limit)
+    return [
+        RecommendationResponseItem(
+            **to_summary_schema(track).dict(),
+            similarity=score,
+            components=components,
         )
-    ).all()
-    top_tracks = [
-        {
-            "Track URI": row[0],
-            "Track Name": row[1],
-            "Artist Name(s)": row[2],
-            "Popularity": float(row[3]) if row[3] is not None else None,
-        }
-        for row in top_tracks_rows
+        for track, score, components in ranked_items
     ]
 
-    return StatsResponse(
-        totals=totals,
-        top_artists=top_artists,
-        top_genres=top_genres,
-        yearly_release_counts=yearly_counts,
-        top_tracks=top_tracks,
-    )
-
 
 async def build_story_insights(session: AsyncSession, user_id: str | None = None) -> List[StoryInsight]:
     if user_id:
         stats = await compute_user_library_stats(session, user_id)
         scope = "your library"
     else:
-        stats = await compute_statistics(session)
+        stats = await get_stats()
         scope = "the catalog"
 
     if stats.totals.total_rows == 0:
@@ -488,7 +540,7 @@ async def _genre_neighbors(
 
 async def build_discovery_journeys(session: AsyncSession, limit: int = 3, user_id: str | None = None) -> List[DiscoveryJourney]:
     journeys: List[DiscoveryJourney] = []
-    stats = await compute_user_library_stats(session, user_id) if user_id else await compute_statistics(session)
+    stats = await compute_user_library_stats(session, user_id) if user_id else await get_stats()
     anchors = [item["name"] for item in stats.top_artists if item.get("name")]
     if not anchors:
         return journeys
@@ -1,13 +1,33 @@
 from __future__ import annotations
 
-from collections import Counter
-from typing import List, Sequence
-
-from sqlalchemy import select
+import json
+import time
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import PlaylistTrack, Track, UserTrack
-from ..schemas import StatsResponse, StatsTotals
+from ..cache import get_json, set_json
+from ..models import PlaylistStats, PlaylistTrack, Track, UserLibraryState, UserTrack
+from ..schemas import SpotifyPlaylistStats, StatsResponse, StatsTotals
+
+_CACHE_PREFIX = "user-stats:v1:"
+_CACHE_TTL_SECONDS = 24 * 3600
+
+# Only the columns the dashboard aggregates need; avoids hydrating full ORM rows.
+_STATS_COLUMNS = (
+    Track.track_uri,
+    Track.track_name,
+    Track.artist_names,
+    Track.genres,
+    Track.release_year,
+    Track.popularity,
+    Track.danceability,
+    Track.energy,
+)
 
 
 def _empty_stats() -> StatsResponse:
@@ -28,129 +48,198 @@ def _empty_stats() -> StatsResponse:
     )
 
 
-def _build_stats(tracks: Sequence[Track], weights: dict[str, float] | None = None) -> StatsResponse:
-    if not tracks:
-        return _empty_stats()
+def _float_column(rows: Sequence[Sequence[object]], index: int) -> np.ndarray:
+    return np.array([row[index] for row in rows], dtype=np.float64)
 
-    total_rows = len(tracks)
-    unique_track_uris = {track.track_uri for track in tracks}
-    unique_tracks = len(unique_track_uris)
-    artist_tokens = []
-    genres_tokens = []
-    release_years = []
-    pop_values = []
-    dance_values = []
-    energy_values = []
-
-    for track in tracks:
-        if track.artist_names:
-            for artist in track.artist_names.split(","):
-                artist_tokens.append(artist.strip())
-        if track.genres:
-            for genre in track.genres.split(","):
-                genres_tokens.append(genre.strip().lower())
-        if track.release_year is not None:
-            release_years.append(int(track.release_year))
-        if track.popularity is not None:
-            pop_values.append(float(track.popularity))
-        if track.danceability is not None:
-            dance_values.append(float(track.danceability))
-        if track.energy is not None:
-            energy_values.append(float(track.energy))
-
-    unique_artists = len({token for token in artist_tokens if token})
-
-    def _average(values: list[float]) -> float | None:
-        return sum(values) / len(values) if values else None
-
-    release_range = {
-        "min": min(release_years) if release_years else None,
-        "max": max(release_years) if release_years else None,
-    }
 
-    top_artists = [
-        {"name": name, "count": count}
-        for name, count in Counter(token for token in artist_tokens if token).most_common(10)
-    ]
+def _average(values: np.ndarray) -> float | None:
+    valid = values[~np.isnan(values)]
+    return float(valid.mean()) if valid.size else None
 
-    top_genres = [
-        {"name": name, "count": count}
-        for name, count in Counter(token for token in genres_tokens if token).most_common(15)
-    ]
 
-    yearly_counts = [
-        {"year": year, "count": count}
-        for year, count in Counter(release_years).items()
-    ]
-    yearly_counts.sort(key=lambda item: item["year"])
-
-    weight_map = weights or {}
-
-    top_tracks = sorted(
-        [
-            {
-                "Track URI": track.track_uri,
-                "Track Name": track.track_name,
-                "Artist Name(s)": track.artist_names,
-                "Popularity": float(track.popularity) if track.popularity is not None else None,
-                "weight": weight_map.get(track.track_uri, 0.0),
-            }
-            for track in tracks
-        ],
-        key=lambda item: (item["weight"], item.get("Popularity") or 0.0),
-        reverse=True,
-    )[:10]
+def _split(raw: str | None, lower: bool = False) -> list[str]:
+    if not raw:
+        return []
+    tokens = (token.strip() for token in raw.split(","))
+    return [token.lower() if lower else token for token in tokens if token]
 
-    for item in top_tracks:
-        item.pop("weight", None)
+
+def _build_stats(rows: Sequence[Sequence[object]], weights: np.ndarray | None = None) -> StatsResponse:
+    """Aggregate rows shaped like ``_STATS_COLUMNS`` with column-wise numpy operations."""
+    if not rows:
+        return _empty_stats()
+
+    uris = [row[0] for row in rows]
+    years = _float_column(rows, 4)
+    popularity = _float_column(rows, 5)
+    danceability = _float_column(rows, 6)
+    energy = _float_column(rows, 7)
+
+    artist_counts = Counter(chain.from_iterable(_split(row[2]) for row in rows))
+    genre_counts = Counter(chain.from_iterable(_split(row[3], lower=True) for row in rows))
+
+    valid_years = years[~np.isnan(years)].astype(np.int64)
+    year_values, year_counts = np.unique(valid_years, return_counts=True)
+
+    weight_values = weights if weights is not None else np.zeros(len(rows), dtype=np.float64)
+    # lexsort sorts by the last key first: weight, then popularity, both descending.
+    order = np.lexsort((-np.nan_to_num(popularity, nan=0.0), -weight_values))[:10]
+    top_tracks = [
+        {
+            "Track URI": rows[index][0],
+            "Track Name": rows[index][1],
+            "Artist Name(s)": rows[index][2],
+            "Popularity": None if np.isnan(popularity[index]) else float(popularity[index]),
+        }
+        for index in order
+    ]
 
     totals = StatsTotals(
-        total_rows=total_rows,
-        unique_tracks=unique_tracks,
-        unique_artists=unique_artists,
-        average_popularity=_average(pop_values),
-        average_danceability=_average(dance_values),
-        average_energy=_average(energy_values),
-        release_year_range=release_range,
+        total_rows=len(rows),
+        unique_tracks=len(set(uris)),
+        unique_artists=len(artist_counts),
+        average_popularity=_average(popularity),
+        average_danceability=_average(danceability),
+        average_energy=_average(energy),
+        release_year_range={
+            "min": int(valid_years.min()) if valid_years.size else None,
+            "max": int(valid_years.max()) if valid_years.size else None,
+        },
     )
 
     return StatsResponse(
         totals=totals,
-        top_artists=top_artists,
-        top_genres=top_genres,
-        yearly_release_counts=yearly_counts,
+        top_artists=[{"name": name, "count": count} for name, count in artist_counts.most_common(10)],
+        top_genres=[{"name": name, "count": count} for name, count in genre_counts.most_common(15)],
+        yearly_release_counts=[
+            {"year": int(year), "count": int(count)} for year, count in zip(year_values, year_counts)
+        ],
         top_tracks=top_tracks,
     )
 
 
-async def compute_user_library_stats(session: AsyncSession, user_id: str) -> StatsResponse:
+def _cache_key(user_id: str) -> str:
+    return f"{_CACHE_PREFIX}{user_id}"
+
+
+async def library_version(session: AsyncSession, user_id: str) -> int:
+    state = await session.get(UserLibraryState, user_id)
+    return int(state.version) if state else 0
+
+
+async def _aggregate_user_library(session: AsyncSession, user_id: str) -> StatsResponse:
     records = (
         await session.execute(
-            select(Track, UserTrack.weight)
+            select(*_STATS_COLUMNS, UserTrack.weight)
             .join(UserTrack, Track.track_uri == UserTrack.track_uri)
             .where(UserTrack.user_id == user_id)
         )
     ).all()
-
     if not records:
         return _empty_stats()
+    weights = np.array([row[-1] or 0.0 for row in records], dtype=np.float64)
+    return _build_stats(records, weights)
+
+
+async def refresh_user_library_stats(session: AsyncSession, user_id: str) -> StatsResponse:
+    """Recompute and cache the user's stats stamped with the current library version."""
+    version = await library_version(session, user_id)
+    stats = await _aggregate_user_library(session, user_id)
+    await set_json(
+        _cache_key(user_id),
+        {"version": version, "stats": stats.model_dump()},
+        ttl_seconds=_CACHE_TTL_SECONDS,
+    )
+    return stats
 
-    tracks: List[Track] = []
-    weights: dict[str, float] = {}
-    for track, weight in records:
-        tracks.append(track)
-        weights[track.track_uri] = float(weight or 0.0)
 
-    return _build_stats(tracks, weights)
+async def compute_user_library_stats(session: AsyncSession, user_id: str) -> StatsResponse:
+    """Serve cached stats while their version stamp matches the library; recompute otherwise."""
+    cached = await get_json(_cache_key(user_id))
+    if cached and "stats" in cached and cached.get("version") == await library_version(session, user_id):
+        return StatsResponse.model_validate(cached["stats"])
+    return await refresh_user_library_stats(session, user_id)
+
+
+async def refresh_playlist_stats(
+    session: AsyncSession,
+    user_id: str,
+    snapshots: Mapping[str, Optional[str]],
+) -> None:
+    """Bring stored playlist aggregates in line with the given Spotify snapshot ids.
+
+    Only playlists whose snapshot moved (or is unknown) are recomputed; stats for
+    playlists missing from ``snapshots`` are dropped. The caller commits.
+    """
+    await session.execute(
+        delete(PlaylistStats).where(
+            PlaylistStats.user_id == user_id,
+            PlaylistStats.playlist_id.notin_(list(snapshots)),
+        )
+    )
+    stored = dict(
+        (
+            await session.execute(
+                select(PlaylistStats.playlist_id, PlaylistStats.snapshot_id).where(PlaylistStats.user_id == user_id)
+            )
+        ).all()
+    )
+    stale = {
+        playlist_id: snapshot_id
+        for playlist_id, snapshot_id in snapshots.items()
+        if snapshot_id is None or playlist_id not in stored or stored[playlist_id] != snapshot_id
+    }
+    if not stale:
+        return
+
+    rows = (
+        await session.execute(
+            select(PlaylistTrack.playlist_id, *_STATS_COLUMNS)
+            .join(Track, Track.track_uri == PlaylistTrack.track_uri)
+            .where(PlaylistTrack.playlist_id.in_(list(stale)))
+        )
+    ).all()
+    grouped: Dict[str, List[Sequence[object]]] = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(tuple(row[1:]))
+
+    now = time.time()
+    for playlist_id, snapshot_id in stale.items():
+        record = await session.get(PlaylistStats, playlist_id)
+        if record is None:
+            record = PlaylistStats(playlist_id=playlist_id)
+            session.add(record)
+        record.user_id = user_id
+        record.snapshot_id = snapshot_id
+        record.payload = json.dumps(_build_stats(grouped.get(playlist_id, [])).model_dump())
+        record.updated_at = now
+
+
+async def load_playlist_stats(session: AsyncSession, user_id: str) -> List[SpotifyPlaylistStats]:
+    records = (
+        await session.execute(select(PlaylistStats).where(PlaylistStats.user_id == user_id))
+    ).scalars().all()
+    return [
+        SpotifyPlaylistStats(
+            playlist_id=record.playlist_id,
+            snapshot_id=record.snapshot_id,
+            stats=StatsResponse.model_validate(json.loads(record.payload)),
+        )
+        for record in records
+    ]
 
 
 async def compute_playlist_stats(session: AsyncSession, user_id: str, playlist_id: str) -> StatsResponse:
-    tracks = (
+    record = await session.get(PlaylistStats, playlist_id)
+    if record is not None and record.user_id == user_id:
+        return StatsResponse.model_validate(json.loads(record.payload))
+
+    rows = (
         await session.execute(
-            select(Track)
+            select(*_STATS_COLUMNS)
             .join(PlaylistTrack, PlaylistTrack.track_uri == Track.track_uri)
             .where(PlaylistTrack.playlist_id == playlist_id)
         )
-    ).scalars().all()
+    ).all()
 
-    return _build_stats(tracks)
+    return _build_stats(rows)
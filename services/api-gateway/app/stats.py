@@ -1,31 +1,144 @@
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import logging
+import time
+from typing import Optional, Tuple
 
-from .db import get_session, session_scope
+from .db import session_scope
 from .schemas import StatsResponse
-from .services.tracks import compute_statistics
-from .cache import get_json, set_json
+from .services.catalog_stats import empty_catalog_stats, get_catalog_stats, load_catalog_stats
+from .cache import get_client, get_json, set_json
+from .coordination import distributed_lock
 
-_REDIS_KEY = "stats:v1"
+_logger = logging.getLogger(__name__)
 
-_stats_cache: Optional[StatsResponse] = None
+_REDIS_KEY = "stats:v2"
+_LOCK_KEY = "stats:v2:lock"
+_CHANNEL = "stats:v2:refreshed"
 
+SOFT_TTL_SECONDS = 300
+HARD_TTL_SECONDS = 3600
+_LOCK_TTL_SECONDS = 60
+_LOCK_WAIT_SECONDS = 5.0
 
-async def get_stats(force: bool = False) -> StatsResponse:
+# (stats, fetched_at) for this worker; refreshed in the background once soft-stale.
+_stats_cache: Optional[Tuple[StatsResponse, float]] = None
+_refresh_task: Optional[asyncio.Task] = None
+_listener_task: Optional[asyncio.Task] = None
+
+
+async def get_stats() -> StatsResponse:
+    """Serve the materialised catalog stats; requests never compute them (see ``refresh_catalog_stats``)."""
     global _stats_cache
-    if _stats_cache is not None and not force:
-        return _stats_cache
+    now = time.time()
+    if _stats_cache is not None:
+        stats, fetched_at = _stats_cache
+        age = now - fetched_at
+        if age < SOFT_TTL_SECONDS:
+            return stats
+        if age < HARD_TTL_SECONDS:
+            _schedule_refresh()
+            return stats
+
+    cached = await _read_shared()
+    if cached is not None:
+        _stats_cache = cached
+        if now - cached[1] >= SOFT_TTL_SECONDS:
+            _schedule_refresh()
+        return cached[0]
+
+    return await _refresh()
+
+
+async def start_stats_listener() -> None:
+    global _listener_task
+    if _listener_task is None and await get_client():
+        _listener_task = asyncio.create_task(_listen_for_refreshes())
+
+
+async def stop_stats_listener() -> None:
+    global _listener_task, _refresh_task
+    for task in (_listener_task, _refresh_task):
+        if task is not None:
+            task.cancel()
+    await asyncio.gather(*(task for task in (_listener_task, _refresh_task) if task), return_exceptions=True)
+    _listener_task = None
+    _refresh_task = None
+
 
-    if not force:
-        cached = await get_json(_REDIS_KEY)
-        if cached:
-            _stats_cache = StatsResponse.parse_obj(cached)
-            return _stats_cache
+def _schedule_refresh() -> None:
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh(background=True))
 
+
+async def _read_shared() -> Optional[Tuple[StatsResponse, float]]:
+    cached = await get_json(_REDIS_KEY)
+    if not cached or "stats" not in cached:
+        return None
+    fetched_at = float(cached.get("fetched_at") or 0.0)
+    if time.time() - fetched_at >= HARD_TTL_SECONDS:
+        return None
+    return StatsResponse.model_validate(cached["stats"]), fetched_at
+
+
+async def _refresh(background: bool = False) -> StatsResponse:
+    """Single-flight refresh: only the worker holding the lock reloads the stored row."""
+    global _stats_cache
+    async with distributed_lock(_LOCK_KEY, _LOCK_TTL_SECONDS) as acquired:
+        if not acquired:
+            if background and _stats_cache is not None:
+                return _stats_cache[0]
+            deadline = time.monotonic() + _LOCK_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                cached = await _read_shared() or _stats_cache
+                if cached is not None and cached[1] >= time.time() - SOFT_TTL_SECONDS:
+                    _stats_cache = cached
+                    return cached[0]
+            # Lock holder is slow or gone: serve what this worker has, else read the row itself
+            # without publishing it; a follower never does more than the leader would.
+            if _stats_cache is not None:
+                return _stats_cache[0]
+            async with session_scope() as session:
+                return await get_catalog_stats(session)
+        return await _compute()
+
+
+async def _compute() -> StatsResponse:
+    global _stats_cache
     async with session_scope() as session:
-        _stats_cache = await compute_statistics(session)
+        stats = await load_catalog_stats(session)
+    if stats is None:
+        # Not imported yet; skip caching so the imported row is picked up on the next request.
+        return empty_catalog_stats()
+    fetched_at = time.time()
+    _stats_cache = (stats, fetched_at)
+    await set_json(_REDIS_KEY, {"stats": stats.model_dump(), "fetched_at": fetched_at}, ttl_seconds=HARD_TTL_SECONDS)
+    client = await get_client()
+    if client:
+        await client.publish(_CHANNEL, str(fetched_at))
+    return stats
 
-    await set_json(_REDIS_KEY, _stats_cache.dict())
 
-    return _stats_cache
+async def _listen_for_refreshes() -> None:
+    global _stats_cache
+    client = await get_client()
+    if not client:
+        return
+    pubsub = client.pubsub()
+    await pubsub.subscribe(_CHANNEL)
+    try:
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            cached = await _read_shared()
+            if cached is not None and (_stats_cache is None or cached[1] > _stats_cache[1]):
+                _stats_cache = cached
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:  # pragma: no cover - L1 falls back to TTL expiry
+        _logger.warning("Stats refresh listener stopped: %s", exc)
+    finally:
+        await pubsub.aclose()
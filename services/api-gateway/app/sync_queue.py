@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import get_client, get_json, set_json
+from .coordination import TTLMirror
+from .db import session_scope
+from .models import UserLibraryState
+from .schemas import SyncStatus
+from .services.spotify import LIBRARY_SYNC_TTL_SECONDS, SpotifyServiceError, sync_user_library
+
+_logger = logging.getLogger(__name__)
+
+_QUEUE_KEY = "sync:queue:v1"
+_STATUS_PREFIX = "sync:status:v1:"
+_STATUS_TTL_SECONDS = 24 * 3600
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_REFRESH = 1
+# Queue score = priority * span + enqueue time, so lower priorities pop first and FIFO within one.
+_PRIORITY_SPAN = 1e10
+
+_WORKER_COUNT = 2
+# A running sync renews its lease; once a dead worker's lease lapses the user can be queued again.
+_RUNNING_LEASE_SECONDS = 120
+_HEARTBEAT_SECONDS = 30
+_POP_TIMEOUT_SECONDS = 1
+
+# Without Redis the queue and status live in this process only.
+_local_queue: Optional[asyncio.PriorityQueue[Tuple[float, str]]] = None
+_local_status: TTLMirror[dict] = TTLMirror()
+_redis_mode = False
+_workers: List[asyncio.Task] = []
+
+
+async def start_sync_workers() -> None:
+    global _local_queue, _redis_mode
+    if _workers:
+        return
+    _redis_mode = bool(await get_client())
+    if not _redis_mode:
+        _local_queue = asyncio.PriorityQueue()
+    for _ in range(_WORKER_COUNT):
+        _workers.append(asyncio.create_task(_worker_loop()))
+
+
+async def stop_sync_workers() -> None:
+    global _local_queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _local_queue = None
+
+
+async def get_sync_status(session: AsyncSession, user_id: str) -> SyncStatus:
+    record = await _read_status(user_id)
+    state = await session.get(UserLibraryState, user_id)
+    synced_at = state.synced_at if state else None
+    if record is None:
+        return SyncStatus(user_id=user_id, state="done" if synced_at else "idle", synced_at=synced_at)
+    return SyncStatus(user_id=user_id, synced_at=synced_at, **record)
+
+
+async def request_sync(session: AsyncSession, user_id: str, force: bool = False) -> SyncStatus:
+    """Queue a library sync unless the stored library is still fresh; never waits for Spotify."""
+    state = await session.get(UserLibraryState, user_id)
+    synced_at = state.synced_at if state else None
+    record = await _read_status(user_id) or {}
+    # Back off after a failure (e.g. unlinked account) until the user retries explicitly.
+    backing_off = (
+        record.get("state") == "failed"
+        and time.time() - float(record.get("updated_at") or 0.0) < LIBRARY_SYNC_TTL_SECONDS
+    )
+    priority: Optional[int] = None
+    if force or synced_at is None:
+        priority = PRIORITY_INTERACTIVE
+    elif time.time() - synced_at >= LIBRARY_SYNC_TTL_SECONDS:
+        priority = PRIORITY_REFRESH
+    if priority is not None and (force or not backing_off):
+        await enqueue_sync(user_id, priority, refetch=force)
+    return await get_sync_status(session, user_id)
+
+
+async def enqueue_sync(user_id: str, priority: int = PRIORITY_REFRESH, refetch: bool = False) -> None:
+    """Queue ``user_id`` once; ``refetch`` marks an explicit resync that skips Spotify response caches."""
+    record = await _read_status(user_id)
+    if record and record.get("state") == "running" and float(record.get("lease_until") or 0.0) > time.time():
+        return
+    score = priority * _PRIORITY_SPAN + time.time()
+    if _redis_mode:
+        client = await get_client()
+        if not client:
+            return
+        # LT keeps one entry per user and only ever raises its priority.
+        await client.zadd(_QUEUE_KEY, {user_id: score}, lt=True)
+    elif _local_queue is not None:
+        if record and record.get("state") == "queued":
+            return
+        _local_queue.put_nowait((score, user_id))
+    else:
+        return
+    # A queued explicit resync stays explicit when a routine refresh merges into it.
+    pending_refetch = bool(record and record.get("state") == "queued" and record.get("refetch"))
+    await _write_status(
+        user_id, state="queued", stage=None, progress=0.0, error=None, refetch=refetch or pending_refetch
+    )
+
+
+async def _read_status(user_id: str) -> Optional[dict]:
+    if _redis_mode:
+        return await get_json(f"{_STATUS_PREFIX}{user_id}")
+    return _local_status.get(user_id)
+
+
+async def _write_status(user_id: str, **fields: object) -> None:
+    record = dict(await _read_status(user_id) or {})
+    record.update(fields, updated_at=time.time())
+    if _redis_mode:
+        await set_json(f"{_STATUS_PREFIX}{user_id}", record, ttl_seconds=_STATUS_TTL_SECONDS)
+    else:
+        _local_status.set(user_id, record, _STATUS_TTL_SECONDS)
+
+
+async def _next_job() -> Optional[str]:
+    if not _redis_mode:
+        if _local_queue is None:
+            return None
+        _, user_id = await _local_queue.get()
+        return user_id
+    client = await get_client()
+    if not client:
+        await asyncio.sleep(_POP_TIMEOUT_SECONDS)
+        return None
+    popped = await client.bzpopmin(_QUEUE_KEY, timeout=_POP_TIMEOUT_SECONDS)
+    return popped[1] if popped else None
+
+
+async def _worker_loop() -> None:
+    while True:
+        try:
+            user_id = await _next_job()
+            if user_id:
+                await _run_sync(user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - keep the worker alive
+            _logger.warning("Sync worker iteration failed: %s", exc)
+            await asyncio.sleep(1.0)
+
+
+def _lease() -> float:
+    return time.time() + _RUNNING_LEASE_SECONDS
+
+
+async def _renew_lease(user_id: str) -> None:
+    while True:
+        await asyncio.sleep(_HEARTBEAT_SECONDS)
+        await _write_status(user_id, lease_until=_lease())
+
+
+async def _run_sync(user_id: str) -> None:
+    refetch = bool((await _read_status(user_id) or {}).get("refetch"))
+    await _write_status(
+        user_id, state="running", stage="starting", progress=0.0, error=None, lease_until=_lease(), refetch=False
+    )
+
+    async def _progress(stage: str, fraction: float) -> None:
+        await _write_status(user_id, stage=stage, progress=fraction, lease_until=_lease())
+
+    error: Optional[str] = None
+    synced = False
+    heartbeat = asyncio.create_task(_renew_lease(user_id))
+    try:
+        async with session_scope() as session:
+            synced = await sync_user_library(session, user_id, force=True, progress=_progress, refetch=refetch)
+    except SpotifyServiceError as exc:
+        error = str(exc)
+    except Exception:
+        _logger.exception("Library sync failed for %s", user_id)
+        error = "Library sync failed"
+    finally:
+        # Stopped before the final write so a late renewal cannot overwrite it.
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+    if error is not None:
+        await _write_status(user_id, state="failed", stage=None, error=error)
+    elif synced:
+        await _write_status(user_id, state="done", stage=None, progress=1.0)
+    else:
+        # Another worker holds the sync lock; its run owns the status from here, and if it
+        # is not a queued job our lease lapses and the user can be queued again.
+        _logger.info("Sync for %s skipped: already running elsewhere", user_id)
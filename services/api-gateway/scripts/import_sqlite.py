@@ -2,16 +2,26 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import os
 import sqlite3
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import repeat
 from pathlib import Path
-from typing import Dict, Iterator, Sequence, Tuple
+from typing import Tuple
 
+import numpy as np
+import pandas as pd
 import psycopg
 from psycopg import sql
+from sqlalchemy import MetaData, Table
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.engine import make_url
-from sqlalchemy.schema import CreateTable
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 SERVICE_ROOT = Path(__file__).resolve().parents[1]
 PROJECT_ROOT = SERVICE_ROOT.parent.parent
@@ -19,10 +29,20 @@ if str(SERVICE_ROOT) not in sys.path:
     sys.path.insert(0, str(SERVICE_ROOT))
 
 from app.config import get_settings  # noqa: E402
-from app.models import Track  # noqa: E402
+from app.db import TRACK_IDS_LOCK_KEY  # noqa: E402
+from app.models import CatalogStats, FeatureDistribution, Track  # noqa: E402
+from app.services.catalog_stats import CATALOG_STATS_ID, refresh_catalog_stats  # noqa: E402
 
 
 DEFAULT_SQLITE_PATH = PROJECT_ROOT / "data" / "combined_spotify_tracks.sqlite"
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+STAGE_TABLE = "tracks_stage"
+# Full reloads build the new catalog here and swap it in, so readers keep the old one until then.
+NEXT_TABLE = "tracks_next"
+# Full-catalog load budget; the run reports against it.
+TARGET_SECONDS = 60.0
+# Unquoted in the CSV stream, so empty strings still load as empty strings.
+NULL_MARKER = "\\N"
 
 
 def _normalize_postgres_url(url: str) -> str:
@@ -35,130 +55,277 @@ def _normalize_postgres_url(url: str) -> str:
     return sa_url.render_as_string(hide_password=False)
 
 
-def _normalize_row(row: sqlite3.Row) -> Dict[str, object | None]:
-    data: Dict[str, object | None] = {}
-    keys = row.keys()
-
-    for column in Track.__table__.columns:
-        name = column.name
-        value = row[name] if name in keys else None
-
-        if value is None:
-            data[name] = None
-            continue
-
-        if name in {"Release Year", "Time Signature", "Key", "Mode"}:
-            try:
-                data[name] = int(float(value))
-            except (TypeError, ValueError):
-                data[name] = None
-        elif name == "Duration (ms)":
-            try:
-                data[name] = int(float(value))
-            except (TypeError, ValueError):
-                data[name] = None
-        elif name == "Popularity":
-            try:
-                data[name] = float(value)
-            except (TypeError, ValueError):
-                data[name] = None
-        elif name == "Explicit":
-            try:
-                data[name] = str(int(value))
-            except (TypeError, ValueError):
-                data[name] = str(value)
-        else:
-            data[name] = value
-
-    return data
-
-
-def _yield_batches(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[list[Dict[str, object | None]]]:
-    while True:
-        rows = cursor.fetchmany(batch_size)
-        if not rows:
-            break
-        yield [_normalize_row(row) for row in rows]
-
-
-def _prepare_schema(connection: psycopg.Connection, reset: bool, truncate: bool, create_schema: bool) -> None:
-    with connection.cursor() as cur:
-        if reset:
-            cur.execute('DROP TABLE IF EXISTS "tracks" CASCADE')
+# Assigned by the merge, never taken from the source rows.
+SURROGATE_COLUMNS = {"track_id"}
+
+
+def _import_columns() -> list[str]:
+    return [column.name for column in Track.__table__.columns if column.name not in SURROGATE_COLUMNS]
+
+
+# Source columns are loosely typed; these are coerced column-wise before COPY.
+INTEGER_COLUMNS = ("Release Year", "Duration (ms)", "Time Signature", "Key", "Mode")
+
+
+def _coerce_integer(column: pd.Series) -> pd.Series:
+    """Truncate numeric-looking values toward zero; anything else becomes NULL."""
+    values = pd.to_numeric(column, errors="coerce").astype("float64")
+    return np.trunc(values.where(np.isfinite(values))).astype("Int64")
+
+
+def _normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.reindex(columns=["src_rowid", *_import_columns()])
+    for name in INTEGER_COLUMNS:
+        frame[name] = _coerce_integer(frame[name])
+    frame["Popularity"] = pd.to_numeric(frame["Popularity"], errors="coerce").astype("float64")
+    # Numeric flags collapse to "0"/"1"; other non-null values are kept as text.
+    explicit = _coerce_integer(frame["Explicit"])
+    frame["Explicit"] = frame["Explicit"].where(explicit.isna(), explicit.astype(str))
+    return frame
 
-        if create_schema or reset:
-            ddl = str(CreateTable(Track.__table__).compile(dialect=postgresql.dialect()))
+
+def _prepare_schema(connection: psycopg.Connection, create_schema: bool) -> None:
+    with connection.cursor() as cur:
+        if create_schema:
+            ddl = str(CreateTable(Track.__table__, if_not_exists=True).compile(dialect=postgresql.dialect()))
             cur.execute(ddl)
-            for index in Track.__table__.indexes:
-                cur.execute(str(index.compile(dialect=postgresql.dialect())))
 
-        if truncate and not reset:
-            cur.execute('TRUNCATE TABLE "tracks"')
+        # Catalogs created before dense ids existed.
+        cur.execute('ALTER TABLE "tracks" ADD COLUMN IF NOT EXISTS "track_id" INTEGER')
 
 
-def _build_insert_query() -> sql.Composed:
-    columns = [column.name for column in Track.__table__.columns]
-    identifiers = [sql.Identifier(column) for column in columns]
-    placeholders = [sql.Placeholder()] * len(columns)
-    assignments = [
-        sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(column), sql.Identifier(column))
-        for column in columns
-        if column != "Track URI"
-    ]
+def _next_table() -> Table:
+    return Track.__table__.to_metadata(MetaData(), name=NEXT_TABLE)
 
-    return sql.SQL(
-        "INSERT INTO {table} ({cols}) VALUES ({values}) "
-        "ON CONFLICT ({pk}) DO UPDATE SET {updates}"
-    ).format(
-        table=sql.Identifier("tracks"),
-        cols=sql.SQL(", ").join(identifiers),
-        values=sql.SQL(", ").join(placeholders),
-        pk=sql.Identifier("Track URI"),
-        updates=sql.SQL(", ").join(assignments),
-    )
+
+def _create_next_table(connection: psycopg.Connection) -> Table:
+    """An empty copy of the catalog schema; its indexes are built after the load."""
+    table = _next_table()
+    with connection.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(NEXT_TABLE)))
+        cur.execute(str(CreateTable(table).compile(dialect=postgresql.dialect())))
+    return table
 
 
-def _rows_to_sequence(columns: Sequence[str], batch: Sequence[Dict[str, object | None]]) -> Sequence[Tuple[object | None, ...]]:
-    return [tuple(row.get(column) for column in columns) for row in batch]
+def _swap_in_next_table(connection: psycopg.Connection, cascade: bool) -> None:
+    """Replace ``tracks`` with the loaded table; only catalog metadata changes under the lock."""
+    live_names = {tuple(index.columns.keys()): index.name for index in Track.__table__.indexes}
+    renames = [(f"{NEXT_TABLE}_pkey", "tracks_pkey")] + [
+        (index.name, live_names[tuple(index.columns.keys())]) for index in _next_table().indexes
+    ]
+    with connection.cursor() as cur:
+        cur.execute(sql.SQL('DROP TABLE IF EXISTS "tracks"{}').format(sql.SQL(" CASCADE" if cascade else "")))
+        cur.execute(sql.SQL('ALTER TABLE {} RENAME TO "tracks"').format(sql.Identifier(NEXT_TABLE)))
+        for old_name, new_name in renames:
+            cur.execute(
+                sql.SQL("ALTER INDEX {} RENAME TO {}").format(sql.Identifier(old_name), sql.Identifier(new_name))
+            )
+
+
+def _create_stage(connection: psycopg.Connection) -> None:
+    """Unlogged and constraint-free: rows land here once and are merged set-wise.
+
+    Built from the model rather than ``LIKE "tracks"`` so the live table is not needed (or touched) yet.
+    """
+    dialect = postgresql.dialect()
+    columns = [
+        sql.SQL("{} {}").format(sql.Identifier(column.name), sql.SQL(column.type.compile(dialect=dialect)))
+        for column in Track.__table__.columns
+        if column.name not in SURROGATE_COLUMNS
+    ]
+    with connection.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(STAGE_TABLE)))
+        cur.execute(
+            sql.SQL('CREATE UNLOGGED TABLE {} ("src_rowid" BIGINT NOT NULL, {})').format(
+                sql.Identifier(STAGE_TABLE), sql.SQL(", ").join(columns)
+            )
+        )
 
 
-def import_tracks(sqlite_path: Path, postgres_url: str, batch_size: int, reset: bool, truncate: bool, create_schema: bool) -> int:
+def _create_secondary_indexes(connection: psycopg.Connection, table: Table) -> None:
+    with connection.cursor() as cur:
+        for index in table.indexes:
+            cur.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect())))
+
+
+def _rowid_ranges(sqlite_path: Path, workers: int) -> list[Tuple[int, int]]:
+    """Split the source rowid span into at most ``workers`` contiguous, inclusive ranges."""
+    with closing(sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)) as source:
+        low, high = source.execute("SELECT MIN(rowid), MAX(rowid) FROM tracks").fetchone()
+    if low is None:
+        return []
+    step = -(-(high - low + 1) // max(1, workers))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def _copy_range(sqlite_path: str, psycopg_url: str, bounds: Tuple[int, int], batch_size: int) -> int:
+    """Worker: stream one rowid range from SQLite into the staging table with COPY."""
+    statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT csv, NULL {})").format(
+        sql.Identifier(STAGE_TABLE),
+        sql.SQL(", ").join(sql.Identifier(column) for column in ["src_rowid", *_import_columns()]),
+        sql.Literal(NULL_MARKER),
+    )
+    copied = 0
+    with closing(sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)) as source:
+        # dtype=object keeps SQLite's values as-is until the explicit coercions run.
+        chunks = pd.read_sql_query(
+            'SELECT rowid AS "src_rowid", * FROM tracks WHERE rowid BETWEEN ? AND ?',
+            source,
+            params=bounds,
+            chunksize=batch_size,
+            dtype=object,
+        )
+        with psycopg.connect(psycopg_url) as connection, connection.cursor() as cur:
+            with cur.copy(statement) as copy:
+                for frame in chunks:
+                    copy.write(_normalize_frame(frame).to_csv(header=False, index=False, na_rep=NULL_MARKER))
+                    copied += len(frame)
+    return copied
+
+
+def _merge_stage(connection: psycopg.Connection, target: str, upsert: bool) -> int:
+    """Move staged rows into ``target`` in one statement; the last source row wins per URI.
+
+    Rows without an id (new URIs, or catalogs from before dense ids) get the next ones in the
+    same pass; existing ids never change across re-imports.
+    """
+    columns = _import_columns()
+    names = sql.SQL(", ").join(sql.Identifier(column) for column in columns)
+    conflict = sql.SQL("")
+    if upsert:
+        conflict = sql.SQL(" ON CONFLICT ({pk}) DO UPDATE SET {updates}").format(
+            pk=sql.Identifier("Track URI"),
+            updates=sql.SQL(", ").join(
+                sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(column), sql.Identifier(column))
+                for column in [*columns, "track_id"]
+                if column != "Track URI"
+            ),
+        )
+    with connection.cursor() as cur:
+        if upsert:
+            # Gateway startups number id-less rows of the live table too.
+            cur.execute(sql.SQL("SELECT pg_advisory_xact_lock({})").format(sql.Literal(TRACK_IDS_LOCK_KEY)))
+        cur.execute(
+            sql.SQL(
+                'WITH "latest" AS ('
+                'SELECT DISTINCT ON ("Track URI") {cols} FROM {stage} ORDER BY "Track URI", "src_rowid" DESC'
+                '), "numbered" AS ('
+                'SELECT {latest_cols}, COALESCE("live"."track_id", '
+                '(SELECT COALESCE(MAX("track_id"), 0) FROM {target}) '
+                '+ ROW_NUMBER() OVER (PARTITION BY "live"."track_id" IS NULL ORDER BY "latest"."Track URI")'
+                ') AS "track_id" '
+                'FROM "latest" LEFT JOIN {target} AS "live" ON "live"."Track URI" = "latest"."Track URI"'
+                ') '
+                'INSERT INTO {target} ({cols}, "track_id") SELECT {cols}, "track_id" FROM "numbered"{conflict}'
+            ).format(
+                cols=names,
+                latest_cols=sql.SQL(", ").join(sql.Identifier("latest", column) for column in columns),
+                stage=sql.Identifier(STAGE_TABLE),
+                target=sql.Identifier(target),
+                conflict=conflict,
+            )
+        )
+        return cur.rowcount
+
+
+def _report(label: str, rows: int, seconds: float) -> None:
+    rate = rows / seconds if seconds > 0 else float("inf")
+    print(f"{label}: {rows} rows in {seconds:.1f}s ({rate:,.0f} rows/s)")
+
+
+def import_tracks(
+    sqlite_path: Path,
+    postgres_url: str,
+    batch_size: int,
+    reset: bool,
+    truncate: bool,
+    create_schema: bool,
+    workers: int = DEFAULT_WORKERS,
+) -> int:
     if not sqlite_path.exists():
         raise FileNotFoundError(f"SQLite file not found: {sqlite_path}")
 
-    sqlite_conn = sqlite3.connect(str(sqlite_path))
-    sqlite_conn.row_factory = sqlite3.Row
-    cursor = sqlite_conn.execute("SELECT * FROM tracks")
-    total_rows = 0
-
     normalized_url = _normalize_postgres_url(postgres_url)
     psycopg_url = normalized_url.replace("+psycopg", "")
     display_url = make_url(normalized_url).set(password="***")
     print(f"Connecting to {display_url}")
     print(f"psycopg connection string: {psycopg_url!r}")
-    columns = [column.name for column in Track.__table__.columns]
-    insert_query = _build_insert_query()
 
+    started = time.perf_counter()
+    # Full reloads fill an unindexed copy and swap it in; incremental imports upsert in place,
+    # which only takes row locks, so readers are never blocked for the length of the load.
+    fresh = reset or truncate
     with psycopg.connect(psycopg_url) as connection:
-        connection.autocommit = False
-        _prepare_schema(connection, reset=reset, truncate=truncate, create_schema=create_schema)
-
-        insert_sql = insert_query.as_string(connection)
-
-        with connection.cursor() as cur:
-            for batch in _yield_batches(cursor, batch_size):
-                if not batch:
-                    continue
-                values = _rows_to_sequence(columns, batch)
-                cur.executemany(insert_sql, values)
-                total_rows += len(batch)
-                if total_rows % 50000 == 0:
-                    print(f"Imported {total_rows} rows...")
-
+        _create_stage(connection)
         connection.commit()
-
-    sqlite_conn.close()
-    return total_rows
+        try:
+            ranges = _rowid_ranges(sqlite_path, workers)
+            print(f"Copying {len(ranges)} rowid ranges with {min(workers, len(ranges))} workers")
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as pool:
+                copied = sum(
+                    pool.map(
+                        _copy_range,
+                        repeat(str(sqlite_path)),
+                        repeat(psycopg_url),
+                        ranges,
+                        repeat(batch_size),
+                    )
+                )
+            loaded = time.perf_counter()
+            _report("Extract + COPY", copied, loaded - started)
+
+            if fresh:
+                table = _create_next_table(connection)
+                merged = _merge_stage(connection, NEXT_TABLE, upsert=False)
+            else:
+                # Own transaction: the column check takes a brief exclusive lock on the live table.
+                _prepare_schema(connection, create_schema=create_schema)
+                connection.commit()
+                table = Track.__table__
+                merged = _merge_stage(connection, "tracks", upsert=True)
+            merged_at = time.perf_counter()
+            _report("Merge", merged, merged_at - loaded)
+
+            _create_secondary_indexes(connection, table)
+            connection.commit()
+            indexed = time.perf_counter()
+            print(f"Indexes: {indexed - merged_at:.1f}s")
+
+            if fresh:
+                # A failed load never gets here, so the live catalog stays as it was.
+                _swap_in_next_table(connection, cascade=reset)
+                connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            for table_name in (STAGE_TABLE, NEXT_TABLE):
+                connection.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table_name)))
+            connection.commit()
+
+        connection.autocommit = True
+        connection.execute('ANALYZE "tracks"')
+
+    elapsed = time.perf_counter() - started
+    _report("Total", copied, elapsed)
+    if elapsed > TARGET_SECONDS:
+        print(f"Load took longer than the {TARGET_SECONDS:.0f}s target; try more --workers or a larger --batch-size")
+    return copied
+
+
+async def _refresh_catalog_stats(postgres_url: str) -> int:
+    """Materialise catalog aggregates and feature CDFs once so the API serves them with a single read."""
+    engine = create_async_engine(_normalize_postgres_url(postgres_url))
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(CatalogStats.__table__.create, checkfirst=True)
+            await connection.run_sync(FeatureDistribution.__table__.create, checkfirst=True)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await refresh_catalog_stats(session)
+            row = await session.get(CatalogStats, CATALOG_STATS_ID)
+            return int(row.version) if row else 0
+    finally:
+        await engine.dispose()
 
 
 def parse_args() -> argparse.Namespace:
@@ -179,29 +346,45 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--batch-size",
         type=int,
-        default=5000,
-        help="Number of rows per insert batch",
+        default=50000,
+        help="Number of SQLite rows read and coerced per chunk",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Parallel loader processes, each copying one rowid range (default: {DEFAULT_WORKERS})",
     )
     parser.add_argument(
         "--reset",
         action="store_true",
-        help="Drop and recreate the tracks table before importing",
+        help="Replace the tracks table with the imported rows, dropping dependent objects",
     )
     parser.add_argument(
         "--truncate",
         action="store_true",
-        help="Delete existing rows before importing (ignored if --reset)",
+        help="Replace the existing rows with the imported ones instead of upserting",
     )
     parser.add_argument(
         "--create-schema",
         action="store_true",
         help="Ensure tables exist before importing",
     )
+    parser.add_argument(
+        "--stats-only",
+        action="store_true",
+        help="Skip the import and only refresh the materialised catalog statistics and feature CDFs",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    if args.stats_only:
+        version = asyncio.run(_refresh_catalog_stats(args.postgres_url))
+        print(f"Catalog statistics refreshed (version {version})")
+        return
+
     total = import_tracks(
         sqlite_path=args.sqlite_path,
         postgres_url=args.postgres_url,
@@ -209,8 +392,11 @@ def main() -> None:
         reset=args.reset,
         truncate=args.truncate,
         create_schema=args.create_schema,
+        workers=args.workers,
     )
     print(f"Imported {total} rows from {args.sqlite_path}")
+    version = asyncio.run(_refresh_catalog_stats(args.postgres_url))
+    print(f"Catalog statistics refreshed (version {version})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.coordination import TTLMirror, distributed_lock, is_marked, mark, take
+
+
+def test_mirror_is_bounded_and_expires() -> None:
+    mirror: TTLMirror[int] = TTLMirror(max_entries=2)
+    mirror.set("a", 1, ttl_seconds=60)
+    mirror.set("b", 2, ttl_seconds=60)
+    assert mirror.get("a") == 1  # refreshes "a", so "b" is evicted next
+    mirror.set("c", 3, ttl_seconds=60)
+
+    assert len(mirror) == 2
+    assert mirror.get("b") is None
+    assert mirror.get("a") == 1
+
+    mirror.set("gone", 4, ttl_seconds=0)
+    assert mirror.get("gone") is None
+
+
+@pytest.mark.asyncio
+async def test_marks_and_locks(test_client: AsyncClient) -> None:
+    await mark("test:flag", ttl_seconds=60)
+    assert await is_marked("test:flag")
+    assert await take("test:flag")
+    assert not await take("test:flag")
+
+    async with distributed_lock("test:lock", ttl_seconds=5) as first:
+        async with distributed_lock("test:lock", ttl_seconds=5) as second:
+            assert first and not second
+    async with distributed_lock("test:lock", ttl_seconds=5) as again:
+        assert again
+
+
+
+@pytest.mark.asyncio
+async def test_renewed_lock_outlives_its_ttl(test_client: AsyncClient, fake_redis) -> None:
+    async with distributed_lock("test:renewed", ttl_seconds=1, renew=True) as held:
+        await asyncio.sleep(1.5)
+        async with distributed_lock("test:renewed", ttl_seconds=1) as contender:
+            assert held and not contender
+    assert await fake_redis.get("test:renewed") is None
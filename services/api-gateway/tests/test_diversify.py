@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from app.models import Track
+from app.services.diversify import diversify
+
+
+def _track(uri: str, artist: str, genres: str, energy: float) -> Track:
+    return Track(
+        track_uri=uri,
+        track_name=uri,
+        artist_names=artist,
+        genres=genres,
+        energy=energy,
+        danceability=energy,
+        valence=0.5,
+    )
+
+
+def _ranked() -> list:
+    same_artist = [
+        (_track(f"spotify:track:a{idx}", "Artist A", "metal", 0.9), 1.0 - idx * 0.01, None)
+        for idx in range(5)
+    ]
+    others = [
+        (_track("spotify:track:b", "Artist B", "ambient", 0.1), 0.9, None),
+        (_track("spotify:track:c", "Artist C", "jazz", 0.4), 0.95, None),
+    ]
+    return same_artist + others
+
+
+def test_zero_weight_keeps_relevance_order() -> None:
+    ranked = _ranked()
+    result = diversify(ranked, limit=3, weight=0.0)
+    assert [track.track_uri for track, _, _ in result] == [track.track_uri for track, _, _ in ranked[:3]]
+
+
+def test_diversity_spreads_artists() -> None:
+    result = diversify(_ranked(), limit=3, weight=0.7)
+    uris = [track.track_uri for track, _, _ in result]
+    assert uris[0] == "spotify:track:a0"
+    assert {"spotify:track:b", "spotify:track:c"} <= set(uris)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.db import session_scope
+from app.feedback import _flush
+from app.models import TrackFeedbackEvent, UserSavedTrack, UserTrack
+from app.services.exclusions import (
+    BLOOM_BITS,
+    BLOOM_HASHES,
+    bloom_offsets,
+    build_bloom,
+    exclusion_key,
+    filter_excluded,
+    rebuild_exclusion_filter,
+)
+
+
+def _is_set(bloom: bytes, offset: int) -> bool:
+    # Redis numbers bits from the most significant bit of the first byte.
+    return bool(bloom[offset // 8] >> (7 - offset % 8) & 1)
+
+
+def test_bloom_layout_matches_redis_bit_offsets() -> None:
+    library = [f"spotify:track:lib{index}" for index in range(5_000)]
+    bloom = build_bloom(library)
+
+    assert len(bloom) * 8 == BLOOM_BITS
+    assert all(_is_set(bloom, offset) for uri in library for offset in bloom_offsets(uri))
+    assert len(set(bloom_offsets("spotify:track:x"))) == BLOOM_HASHES
+
+    strangers = [f"spotify:track:new{index}" for index in range(2_000)]
+    false_positives = sum(all(_is_set(bloom, offset) for offset in bloom_offsets(uri)) for uri in strangers)
+    assert false_positives <= 2
+
+
+@pytest.mark.asyncio
+async def test_filter_drops_hits_and_downvotes_set_bits(test_client: AsyncClient, fake_redis) -> None:
+    await fake_redis.set(exclusion_key("bloom-user"), build_bloom(["spotify:track:owned"]))
+    candidates = ["spotify:track:owned", "spotify:track:fresh", "spotify:track:meh"]
+    assert await filter_excluded("bloom-user", candidates) == candidates[1:]
+
+    await _flush([{"track_uri": "spotify:track:meh", "verdict": "down", "spotify_user_id": "bloom-user", "ts": 1.0}])
+    assert await filter_excluded("bloom-user", candidates) == ["spotify:track:fresh"]
+    # Without a filter nothing is dropped.
+    assert await filter_excluded("someone-else", candidates) == candidates
+
+
+@pytest.mark.asyncio
+async def test_rebuild_covers_library_and_standing_downvotes(test_client: AsyncClient, fake_redis) -> None:
+    user = "rebuild-user"
+    async with session_scope() as session:
+        session.add_all(
+            [
+                UserTrack(user_id=user, track_uri="spotify:track:top", weight=1.0),
+                UserSavedTrack(user_id=user, track_uri="spotify:track:saved", added_at=1.0, seen_at=1.0),
+                TrackFeedbackEvent(track_uri="spotify:track:hated", verdict="down", spotify_user_id=user, created_at=1.0),
+                TrackFeedbackEvent(track_uri="spotify:track:forgiven", verdict="down", spotify_user_id=user, created_at=1.0),
+                TrackFeedbackEvent(track_uri="spotify:track:forgiven", verdict="up", spotify_user_id=user, created_at=2.0),
+            ]
+        )
+        await session.commit()
+        size = await rebuild_exclusion_filter(session, user)
+        for model in (UserTrack, UserSavedTrack, TrackFeedbackEvent):
+            await session.execute(delete(model))
+        await session.commit()
+
+    assert size == 3
+    candidates = ["spotify:track:top", "spotify:track:saved", "spotify:track:hated", "spotify:track:forgiven"]
+    assert await filter_excluded(user, candidates) == ["spotify:track:forgiven"]
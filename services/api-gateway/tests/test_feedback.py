@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app import feedback
+from app.db import session_scope
+from app.feedback import record_feedback, start_feedback_writer, stop_feedback_writer
+from app.models import TrackFeedbackEvent
+from app.schemas import TrackFeedback
+
+
+@pytest.mark.asyncio
+async def test_feedback_is_written_behind(test_client: AsyncClient) -> None:
+    for verdict in ("up", "down", "up"):
+        response = await test_client.post(
+            "/tracks/feedback",
+            json={"track_uri": "spotify:track:1", "verdict": verdict, "seed_context": ["spotify:track:9"]},
+        )
+        assert response.status_code == 204
+
+    await stop_feedback_writer()
+
+    async with session_scope() as session:
+        rows = (await session.execute(select(TrackFeedbackEvent))).scalars().all()
+        await session.execute(delete(TrackFeedbackEvent))
+        await session.commit()
+    assert [row.verdict for row in rows] == ["up", "down", "up"]
+    assert rows[0].seed_context == "spotify:track:9"
+
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_in_flight_batch(test_client: AsyncClient) -> None:
+    for index in range(3):
+        await record_feedback(TrackFeedback(track_uri=f"spotify:track:{index}", verdict="up"))
+    # Let the writer take the first event off the queue and start collecting a batch.
+    await asyncio.sleep(0.01)
+
+    await stop_feedback_writer()
+
+    async with session_scope() as session:
+        uris = (await session.execute(select(TrackFeedbackEvent.track_uri))).scalars().all()
+        await session.execute(delete(TrackFeedbackEvent))
+        await session.commit()
+    assert sorted(uris) == ["spotify:track:0", "spotify:track:1", "spotify:track:2"]
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_writes_inline(test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    await stop_feedback_writer()
+    monkeypatch.setattr(feedback, "_QUEUE_SIZE", 1)
+    monkeypatch.setattr(feedback, "_FLUSH_INTERVAL", 60.0)
+    await start_feedback_writer()
+
+    for index in range(3):
+        await record_feedback(TrackFeedback(track_uri=f"spotify:track:{index}", verdict="up"))
+
+    async with session_scope() as session:
+        inline = (await session.execute(select(TrackFeedbackEvent.track_uri))).scalars().all()
+    await stop_feedback_writer()
+    async with session_scope() as session:
+        total = (await session.execute(select(TrackFeedbackEvent.track_uri))).scalars().all()
+        await session.execute(delete(TrackFeedbackEvent))
+        await session.commit()
+
+    assert len(inline) >= 1
+    assert sorted(total) == ["spotify:track:0", "spotify:track:1", "spotify:track:2"]
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.models import Track
+from scripts.import_sqlite import _rowid_ranges, _swap_in_next_table
+
+
+@pytest.mark.parametrize("workers", [1, 3, 4, 50])
+def test_rowid_ranges_cover_the_span_without_overlap(tmp_path: Path, workers: int) -> None:
+    source = tmp_path / "tracks.sqlite"
+    with sqlite3.connect(source) as connection:
+        connection.execute('CREATE TABLE tracks ("Track URI" TEXT)')
+        connection.executemany("INSERT INTO tracks VALUES (?)", [(f"uri{i}",) for i in range(10)])
+        # Holes in the rowid sequence still fall inside some range.
+        connection.execute("DELETE FROM tracks WHERE rowid IN (1, 5)")
+    connection.close()
+
+    ranges = _rowid_ranges(source, workers)
+
+    assert 1 <= len(ranges) <= min(workers, 9)
+    assert ranges[0][0] == 2 and ranges[-1][1] == 10
+    assert all(low <= high for low, high in ranges)
+    assert all(current[0] == previous[1] + 1 for previous, current in zip(ranges, ranges[1:]))
+
+
+def test_rowid_ranges_empty_source(tmp_path: Path) -> None:
+    source = tmp_path / "tracks.sqlite"
+    with sqlite3.connect(source) as connection:
+        connection.execute('CREATE TABLE tracks ("Track URI" TEXT)')
+    connection.close()
+
+    assert _rowid_ranges(source, 4) == []
+
+
+class _RecordingConnection:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    def cursor(self) -> "_RecordingConnection":
+        return self
+
+    def __enter__(self) -> "_RecordingConnection":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    def execute(self, statement) -> None:
+        self.statements.append(statement.as_string(None))
+
+
+def test_swap_restores_the_live_table_and_index_names() -> None:
+    connection = _RecordingConnection()
+
+    _swap_in_next_table(connection, cascade=False)
+
+    assert connection.statements[:2] == ['DROP TABLE IF EXISTS "tracks"', 'ALTER TABLE "tracks_next" RENAME TO "tracks"']
+    renamed = {statement.rsplit(" ", 1)[-1].strip('"') for statement in connection.statements[2:]}
+    assert renamed == {"tracks_pkey", *(index.name for index in Track.__table__.indexes)}
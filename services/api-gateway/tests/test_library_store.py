@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app.db import session_scope
+from app.models import PlaylistTrack, UserTrack
+from app.services.library_store import sync_playlist_tracks, sync_user_tracks
+
+
+@pytest.mark.asyncio
+async def test_user_tracks_write_only_the_diff(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        first = await sync_user_tracks(session, "diff-user", {"a": 1.0, "b": 0.5, "c": 0.2})
+        await session.commit()
+        second = await sync_user_tracks(session, "diff-user", {"a": 1.0, "b": 0.7, "d": 0.1})
+        await session.commit()
+        unchanged = await sync_user_tracks(session, "diff-user", {"a": 1.0, "b": 0.7, "d": 0.1})
+        stored = dict(
+            (
+                await session.execute(
+                    select(UserTrack.track_uri, UserTrack.weight).where(UserTrack.user_id == "diff-user")
+                )
+            ).all()
+        )
+        await session.execute(delete(UserTrack))
+        await session.commit()
+
+    assert (first.inserted, first.updated, first.deleted) == (3, 0, 0)
+    assert (second.inserted, second.updated, second.deleted) == (1, 1, 1)
+    assert (unchanged.inserted, unchanged.updated, unchanged.deleted) == (0, 0, 0)
+    assert stored == {"a": 1.0, "b": 0.7, "d": 0.1}
+
+
+@pytest.mark.asyncio
+async def test_playlist_tracks_write_only_the_diff(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        await sync_playlist_tracks(session, {"p1": ["a", "b"], "p2": ["a"]})
+        await session.commit()
+        diff = await sync_playlist_tracks(session, {"p1": ["b", "c", "c"], "p2": ["a"]})
+        await session.commit()
+        rows = (
+            await session.execute(select(PlaylistTrack.playlist_id, PlaylistTrack.track_uri))
+        ).all()
+        await session.execute(delete(PlaylistTrack))
+        await session.commit()
+
+    assert (diff.inserted, diff.deleted) == (1, 1)
+    assert sorted(rows) == [("p1", "b"), ("p1", "c"), ("p2", "a")]
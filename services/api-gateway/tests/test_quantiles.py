@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.db import session_scope
+from app.models import CatalogStats, FeatureDistribution, Track, UserTrack
+from app.services import quantiles
+from app.services.catalog_stats import refresh_catalog_stats
+from app.services.quantiles import FeatureCDF, compare_user_to_catalog, load_feature_cdfs, rebuild_feature_cdfs
+
+
+def test_feature_cdf_lookups() -> None:
+    counts = np.zeros(100, dtype=np.int64)
+    counts[:50] = 1
+    counts[50:] = 3
+    cdf = FeatureCDF(0.0, 1.0, counts)
+
+    assert cdf.percentiles(np.array([0.495]))[0] == pytest.approx(25.0)
+    assert cdf.percentiles(np.array([2.0]))[0] == pytest.approx(100.0)
+    assert 0.6 < cdf.quantile(0.5) < 0.7
+
+
+@pytest.mark.asyncio
+async def test_compare_user_to_catalog(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        session.add_all(
+            [
+                Track(track_uri=f"spotify:track:q{idx}", track_name=str(idx), energy=idx / 10, danceability=0.5)
+                for idx in range(10)
+            ]
+        )
+        session.add_all(
+            [UserTrack(user_id="listener", track_uri=f"spotify:track:q{idx}", weight=1.0) for idx in (8, 9)]
+        )
+        await session.commit()
+        await rebuild_feature_cdfs(session)
+        comparison = await compare_user_to_catalog(session, "listener")
+        await session.execute(delete(UserTrack))
+        await session.execute(delete(Track))
+        await session.commit()
+
+    energy = next(item for item in comparison.features if item.feature == "energy")
+    assert comparison.tracks == 2
+    assert energy.user_mean == pytest.approx(0.85)
+    assert energy.percentile == pytest.approx(90.0)
+
+
+@pytest.mark.asyncio
+async def test_cdfs_are_built_by_the_stats_refresh_not_on_read(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(quantiles, "_cdf_cache", None)
+    async with session_scope() as session:
+        await session.execute(delete(FeatureDistribution))
+        session.add_all(
+            [Track(track_uri=f"spotify:track:r{idx}", track_name=str(idx), energy=idx / 10) for idx in range(10)]
+        )
+        await session.commit()
+        before = await load_feature_cdfs(session)
+        no_catalog = await compare_user_to_catalog(session, "listener")
+        await refresh_catalog_stats(session)
+        monkeypatch.setattr(quantiles, "_cdf_cache", None)
+        after = await load_feature_cdfs(session)
+        await session.execute(delete(Track))
+        await session.execute(delete(FeatureDistribution))
+        await session.execute(delete(CatalogStats))
+        await session.commit()
+
+    assert before == {}
+    assert no_catalog.features == []
+    assert after["energy"].total == 10
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app import db
+from app.db import init_db, session_scope
+from app.models import Track
+from app.services import tracks
+from app.services.tracks import _cluster_seeds, _interleave
+
+
+def _track(uri: str, energy: float, acousticness: float) -> Track:
+    return Track(track_uri=uri, track_name=uri, energy=energy, acousticness=acousticness, popularity=50)
+
+
+def test_distant_seeds_get_their_own_clusters() -> None:
+    metal = [_track("metal1", 0.95, 0.02), _track("metal2", 0.9, 0.05)]
+    ambient = [_track("ambient", 0.1, 0.95)]
+    clusters = _cluster_seeds(metal + ambient, profile=None)
+
+    assert [[seed.track_uri for seed in cluster.seeds] for cluster in clusters] == [["metal1", "metal2"], ["ambient"]]
+    assert [round(cluster.weight, 2) for cluster in clusters] == [0.67, 0.33]
+
+    close = _cluster_seeds([_track("a", 0.5, 0.5), _track("b", 0.55, 0.45)], profile=None)
+    assert len(close) == 1
+
+
+def test_interleave_follows_cluster_weights() -> None:
+    heavy = [(_track(f"h{index}", 0.9, 0.1), 1.0, None) for index in range(10)]
+    light = [(_track(f"l{index}", 0.1, 0.9), 1.0, None) for index in range(10)]
+    light.insert(1, heavy[0])  # duplicates across clusters are only kept once
+
+    merged = [track.track_uri for track, _, _ in _interleave([heavy, light], [2 / 3, 1 / 3], 6)]
+    assert merged == ["h0", "l0", "h1", "h2", "l1", "h3"]
+
+
+@pytest.mark.asyncio
+async def test_ml_payload_uses_dense_ids(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent: dict = {}
+
+    async def fake_rank(seeds, candidate_uris=None, candidate_ids=None, **_):
+        sent.update(seeds=seeds, uris=candidate_uris, ids=candidate_ids)
+        return [{"track_id": 12, "score": 0.9}, {"track_id": 11, "score": 0.4}]
+
+    monkeypatch.setattr(tracks, "rank_candidates", fake_rank)
+    seed = _track("seed", 0.5, 0.5)
+    seed.track_id = 10
+    candidates = [_track("c1", 0.4, 0.5), _track("c2", 0.6, 0.5)]
+    candidates[0].track_id, candidates[1].track_id = 11, 12
+
+    ranked = await tracks._rank([seed], candidates)
+
+    assert sent["ids"] == [11, 12] and sent["uris"] is None
+    assert sent["seeds"] == [{"track_id": 10, "weight": 0.5}]
+    assert [track.track_uri for track, _, _ in ranked] == ["c2", "c1"]
+
+
+@pytest.mark.asyncio
+async def test_startup_assigns_missing_track_ids(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        session.add_all(
+            [
+                Track(track_uri="spotify:track:c", track_name="c"),
+                Track(track_uri="spotify:track:a", track_name="a", track_id=7),
+                Track(track_uri="spotify:track:b", track_name="b"),
+            ]
+        )
+        await session.commit()
+
+    await init_db()
+
+    async with session_scope() as session:
+        ids = (await session.execute(select(Track.track_uri, Track.track_id).order_by(Track.track_uri))).all()
+        await session.execute(delete(Track))
+        await session.commit()
+    assert ids == [("spotify:track:a", 7), ("spotify:track:b", 8), ("spotify:track:c", 9)]
+
+
+@pytest.mark.asyncio
+async def test_startup_skips_id_assignment_when_every_track_has_one(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async with session_scope() as session:
+        session.add(Track(track_uri="spotify:track:a", track_name="a", track_id=1))
+        await session.commit()
+    # Would fail if executed: a warm start must not touch the catalog.
+    monkeypatch.setattr(db, "ASSIGN_TRACK_IDS_SQL", "UPDATE no_such_table SET x = 1")
+
+    await init_db()
+
+    async with session_scope() as session:
+        await session.execute(delete(Track))
+        await session.commit()
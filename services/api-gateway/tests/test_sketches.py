@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app.db import session_scope
+from app.models import AnalyticsSketch, PlaylistStats, PlaylistTrack, Track, UserPlaylist
+from app.services.sketch_store import update_library_sketches
+from app.services.sketches import HyperLogLog, SpaceSaving, TrackSketch
+from app.services.spotify import _persist_user_playlists
+
+
+def test_hyperloglog_estimate_and_merge() -> None:
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add_many([f"spotify:track:{idx}" for idx in range(0, 30_000)])
+    right.add_many([f"spotify:track:{idx}" for idx in range(20_000, 50_000)])
+
+    assert abs(left.estimate() - 30_000) / 30_000 < 0.05
+    assert abs(left.merge(right).estimate() - 50_000) / 50_000 < 0.05
+
+
+def test_space_saving_keeps_heavy_hitters() -> None:
+    sketch = SpaceSaving(capacity=8)
+    stream = ["rock"] * 500 + ["jazz"] * 300 + [f"rare-{idx}" for idx in range(400)]
+    sketch.add_many(stream)
+    assert [name for name, _ in sketch.top(2)] == ["rock", "jazz"]
+
+
+def test_track_sketch_round_trip() -> None:
+    sketch = TrackSketch()
+    sketch.add_rows([("spotify:track:1", "A, B", "Rock"), ("spotify:track:2", "A", "rock, pop")])
+    restored = TrackSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.rows == 2
+    assert restored.tracks.estimate() == 2
+    assert restored.artists.estimate() == 2
+    assert restored.top_genres.top(1) == [("rock", 2)]
+
+
+@pytest.mark.asyncio
+async def test_playlist_sync_drops_stale_sketches(test_client: AsyncClient) -> None:
+    def _playlist(playlist_id: str, uris: list[str]) -> dict:
+        return {"id": playlist_id, "name": playlist_id, "snapshot_id": "s", "track_uris": uris}
+
+    async def _scopes(session) -> list[str]:
+        return sorted((await session.execute(select(AnalyticsSketch.scope))).scalars())
+
+    async with session_scope() as session:
+        session.add(Track(track_uri="spotify:track:k1", track_name="One", artist_names="A"))
+        await session.commit()
+        playlists = [_playlist(name, ["spotify:track:k1"]) for name in ("keep", "emptied", "removed")]
+        await _persist_user_playlists(session, "sketch-user", playlists)
+        await update_library_sketches(session, "sketch-user")
+        before = await _scopes(session)
+
+        await _persist_user_playlists(
+            session, "sketch-user", [_playlist("keep", ["spotify:track:k1"]), _playlist("emptied", [])]
+        )
+        await update_library_sketches(session, "sketch-user")
+        after = await _scopes(session)
+        for model in (AnalyticsSketch, PlaylistStats, PlaylistTrack, UserPlaylist, Track):
+            await session.execute(delete(model))
+        await session.commit()
+
+    assert before == ["playlist:emptied", "playlist:keep", "playlist:removed", "user:sketch-user"]
+    assert after == ["playlist:keep", "user:sketch-user"]
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+
+from app.cache import get_json
+from app.config import get_settings
+from app.coordination import TTLMirror
+from app.db import session_scope
+from app.models import SpotifyToken, UserSavedTrack, UserSavedTracksState
+from app.services import spotify_client, spotify_tokens
+from app.services.spotify import (
+    SpotifyServiceError,
+    _fetch_all_pages,
+    _fetch_top_tracks,
+    _fetch_user_playlists,
+    _sync_saved_tracks,
+)
+
+_LATENCY = 0.05
+
+
+class _MockSpotify:
+    def __init__(self, playlists: int, saved: int) -> None:
+        self.playlists = playlists
+        # Newest first, as Spotify returns them.
+        self.saved = [(f"spotify:track:saved{index}", 1_700_000_000 - index * 60) for index in range(saved)]
+        self.requests: list[str] = []
+        # path -> queued status codes served before the real response
+        self.failures: dict[str, list[int]] = {}
+        self.in_flight = 0
+        self.peak = 0
+        # ETag served for /me/top/tracks; a matching If-None-Match gets a 304.
+        self.top_etag = '"v1"'
+        self.revalidations: list[str] = []
+
+    def _track(self, uri: str | None, added_at: int = 0) -> dict:
+        added = datetime.fromtimestamp(added_at, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+        # A ``None`` uri stands for a save Spotify no longer resolves (``"track": null``).
+        track = {"uri": uri, "name": uri, "artists": [{"name": "Artist"}]} if uri else None
+        return {"added_at": added, "track": track}
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        if request.url.path.endswith("/api/token"):
+            return httpx.Response(200, json={"access_token": "fresh-token", "expires_in": 3600})
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(_LATENCY)
+            path = request.url.path
+            queued = self.failures.get(f"{path}?offset={request.url.params.get('offset', 0)}")
+            if queued:
+                code = queued.pop(0)
+                return httpx.Response(code, headers={"Retry-After": "0.05"} if code == 429 else {})
+            offset = int(request.url.params.get("offset", 0))
+            limit = int(request.url.params.get("limit", 20))
+            if path.endswith("/me/playlists"):
+                items = [
+                    {"id": f"pl{index}", "name": f"Playlist {index}", "owner": {"id": "u1"}, "snapshot_id": "s"}
+                    for index in range(self.playlists)
+                ]
+                return httpx.Response(200, json={"items": items, "next": None, "total": len(items)})
+            if path.endswith("/me/top/tracks"):
+                etag = request.headers.get("If-None-Match")
+                if etag:
+                    self.revalidations.append(etag)
+                if etag == self.top_etag:
+                    return httpx.Response(304, headers={"ETag": self.top_etag})
+                version = self.top_etag.strip('"')
+                items = [{"uri": f"spotify:track:top-{version}", "name": "Top", "artists": [{"name": "Artist"}]}]
+                return httpx.Response(200, json={"items": items}, headers={"ETag": self.top_etag})
+            if path.endswith("/me/tracks"):
+                end = min(offset + limit, len(self.saved))
+                items = [self._track(uri, added_at) for uri, added_at in self.saved[offset:end]]
+                next_url = str(request.url) if end < len(self.saved) else None
+                return httpx.Response(200, json={"items": items, "next": next_url, "total": len(self.saved)})
+            playlist_id = path.split("/")[-2]
+            return httpx.Response(
+                200, json={"items": [self._track(f"spotify:track:{playlist_id}")], "next": None, "total": 1}
+            )
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture()
+def mock_spotify():
+    mock = _MockSpotify(playlists=20, saved=400)
+    spotify_client._client = httpx.AsyncClient(
+        base_url=get_settings().spotify_api_base_url,
+        transport=httpx.MockTransport(mock),
+    )
+    spotify_client._semaphore = None
+    spotify_client._bucket = None
+    spotify_client._blocked_until = 0.0
+    yield mock
+    spotify_client._client = None
+    spotify_client._semaphore = None
+    spotify_client._bucket = None
+
+
+@pytest.mark.asyncio
+async def test_playlist_tracks_are_fetched_concurrently(mock_spotify: _MockSpotify) -> None:
+    started = time.perf_counter()
+    playlists = await _fetch_user_playlists("token", "u1", limit=20)
+    elapsed = time.perf_counter() - started
+
+    assert [playlist["track_uris"] for playlist in playlists][:2] == [["spotify:track:pl0"], ["spotify:track:pl1"]]
+    assert 1 < mock_spotify.peak <= get_settings().spotify_max_concurrency
+    # 21 sequential round trips would take >1s; bounded fan-out needs a handful.
+    assert elapsed < 21 * _LATENCY / 2
+
+
+@pytest.mark.asyncio
+async def test_saved_tracks_sync_incrementally(test_client: AsyncClient, mock_spotify: _MockSpotify) -> None:
+    async def _stored() -> list[str]:
+        async with session_scope() as session:
+            rows = await session.execute(
+                select(UserSavedTrack.track_uri).order_by(UserSavedTrack.added_at.desc())
+            )
+            return list(rows.scalars())
+
+    await _sync_saved_tracks("token", "saved-user")
+    first_pass = len(mock_spotify.requests)
+    assert len(await _stored()) == 400
+
+    # Two new saves: one page from the newest save is enough.
+    mock_spotify.saved[:0] = [("spotify:track:new1", 1_800_000_001), ("spotify:track:new0", 1_800_000_000)]
+    await _sync_saved_tracks("token", "saved-user")
+    assert len(mock_spotify.requests) - first_pass == 1
+    assert (await _stored())[:3] == ["spotify:track:new1", "spotify:track:new0", "spotify:track:saved0"]
+
+    # A removal only shows up in the total, which triggers a reconciling full scan.
+    del mock_spotify.saved[100]
+    await _sync_saved_tracks("token", "saved-user")
+    stored = await _stored()
+    async with session_scope() as session:
+        await session.execute(delete(UserSavedTrack))
+        await session.execute(delete(UserSavedTracksState))
+        await session.commit()
+
+    assert len(stored) == 401
+    assert "spotify:track:saved98" not in stored
+    assert mock_spotify.peak > 1
+
+
+@pytest.mark.asyncio
+async def test_unplayable_saves_do_not_force_full_scans(test_client: AsyncClient, mock_spotify: _MockSpotify) -> None:
+    mock_spotify.saved[10] = (None, mock_spotify.saved[10][1])
+    await _sync_saved_tracks("token", "unplayable-user")
+    first_pass = len(mock_spotify.requests)
+
+    # Another unresolvable save plus a real one: still a single incremental page.
+    mock_spotify.saved[:0] = [("spotify:track:new", 1_800_000_001), (None, 1_800_000_000)]
+    await _sync_saved_tracks("token", "unplayable-user")
+    requests = len(mock_spotify.requests) - first_pass
+    await _sync_saved_tracks("token", "unplayable-user")
+    async with session_scope() as session:
+        stored = (await session.execute(select(UserSavedTrack.track_uri))).scalars().all()
+        state = await session.get(UserSavedTracksState, "unplayable-user")
+        await session.execute(delete(UserSavedTrack))
+        await session.execute(delete(UserSavedTracksState))
+        await session.commit()
+
+    assert requests == 1
+    assert len(mock_spotify.requests) - first_pass == 2
+    assert len(stored) == 400 and "spotify:track:new" in stored
+    assert state.spotify_total == 402
+
+
+@pytest.mark.asyncio
+async def test_unchanged_playlists_are_not_refetched(mock_spotify: _MockSpotify) -> None:
+    known = {f"pl{index}": "s" for index in range(19)}
+    playlists = await _fetch_user_playlists("token", "u1", limit=20, known_snapshots=known)
+
+    assert mock_spotify.requests.count("/v1/playlists/pl19/tracks") == 1
+    assert sum(path.endswith("/tracks") for path in mock_spotify.requests) == 1
+    assert playlists[0]["track_uris"] is None
+    assert playlists[19]["track_uris"] == ["spotify:track:pl19"]
+
+
+@pytest.mark.asyncio
+async def test_throttled_and_failed_pages_are_retried(
+    mock_spotify: _MockSpotify, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(spotify_client, "_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(spotify_client, "_COOLDOWN_JITTER_SECONDS", 0.01)
+    mock_spotify.failures["/v1/me/tracks?offset=50"] = [429, 429]
+    mock_spotify.failures["/v1/me/tracks?offset=100"] = [503]
+    before = spotify_client.spotify_metrics()
+
+    items = await _fetch_all_pages("/me/tracks", "token", page_size=50, limit=150)
+
+    after = spotify_client.spotify_metrics()
+    assert [item["track"]["uri"] for item in items] == [f"spotify:track:saved{index}" for index in range(150)]
+    assert after["throttled"] - before["throttled"] == 2
+    assert after["server_errors"] - before["server_errors"] == 1
+    assert after["retries"] - before["retries"] == 3
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retries_fail_instead_of_truncating(
+    mock_spotify: _MockSpotify, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(spotify_client, "_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(spotify_client, "_COOLDOWN_JITTER_SECONDS", 0.01)
+    mock_spotify.failures["/v1/me/tracks?offset=50"] = [429] * 10
+
+    with pytest.raises(SpotifyServiceError):
+        await _fetch_all_pages("/me/tracks", "token", page_size=50, limit=150)
+
+
+def test_token_bucket_paces_requests() -> None:
+    async def run() -> float:
+        bucket = spotify_client.TokenBucket(rate=100.0, capacity=5)
+        started = time.perf_counter()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # Five tokens are free; the other ten refill at 100/s.
+    assert asyncio.run(run()) >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_refreshed_once_and_cached(
+    test_client: AsyncClient, mock_spotify: _MockSpotify, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings = get_settings()
+    monkeypatch.setattr(settings, "spotify_client_id", "client")
+    monkeypatch.setattr(settings, "spotify_client_secret", "secret")
+    monkeypatch.setattr(spotify_tokens, "_tokens", TTLMirror())
+    monkeypatch.setattr(spotify_tokens, "_active", TTLMirror())
+    async with session_scope() as session:
+        session.add(
+            SpotifyToken(user_id="token-user", access_token="stale", refresh_token="refresh", expires_at=0)
+        )
+        await session.commit()
+
+    async def _get() -> str:
+        async with session_scope() as session:
+            return await spotify_tokens.get_access_token(session, "token-user")
+
+    tokens = await asyncio.gather(*(_get() for _ in range(5)))
+    async with session_scope() as session:
+        await session.execute(delete(SpotifyToken))
+        await session.commit()
+    # Served from the cache without touching the (now empty) token table.
+    cached = await _get()
+
+    assert tokens == ["fresh-token"] * 5
+    assert cached == "fresh-token"
+    assert mock_spotify.requests.count("/api/token") == 1
+
+
+def _cached_top(fresh_seconds: int, keep_seconds: int = 3600):
+    return spotify_client.cached_get(
+        "test:top", "/me/top/tracks", "token", {"limit": 50}, lambda body: body["items"], fresh_seconds, keep_seconds
+    )
+
+
+@pytest.mark.asyncio
+async def test_cached_get_serves_fresh_entries_without_a_request(
+    test_client: AsyncClient, fake_redis, mock_spotify: _MockSpotify
+) -> None:
+    first = await _cached_top(fresh_seconds=900, keep_seconds=600)
+    second = await _cached_top(fresh_seconds=900, keep_seconds=600)
+
+    assert first == second
+    assert first[0] == 200
+    assert mock_spotify.requests.count("/v1/me/top/tracks") == 1
+    assert 0 < await fake_redis.ttl("test:top") <= 600
+
+
+@pytest.mark.asyncio
+async def test_cached_get_revalidates_stale_entries_with_the_etag(
+    test_client: AsyncClient, fake_redis, mock_spotify: _MockSpotify
+) -> None:
+    _, value = await _cached_top(fresh_seconds=0)
+    # Unchanged upstream: the 304 keeps the cached value.
+    assert await _cached_top(fresh_seconds=0) == (200, value)
+    # Changed upstream: the full response replaces it.
+    mock_spotify.top_etag = '"v2"'
+    _, changed = await _cached_top(fresh_seconds=0)
+
+    assert mock_spotify.revalidations == ['"v1"', '"v1"']
+    assert changed[0]["uri"] == "spotify:track:top-v2"
+    assert (await get_json("test:top"))["etag"] == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_cached_get_refetches_after_the_entry_expires(
+    test_client: AsyncClient, fake_redis, mock_spotify: _MockSpotify
+) -> None:
+    await _cached_top(fresh_seconds=900)
+    await fake_redis.delete("test:top")
+    await _cached_top(fresh_seconds=900)
+
+    # Nothing left to revalidate against, so the second call is a plain GET.
+    assert mock_spotify.requests.count("/v1/me/top/tracks") == 2
+    assert mock_spotify.revalidations == []
+
+
+@pytest.mark.asyncio
+async def test_refetch_bypasses_the_top_tracks_fresh_window(
+    test_client: AsyncClient, fake_redis, mock_spotify: _MockSpotify
+) -> None:
+    await _fetch_top_tracks("token", "u1", 10)
+    await _fetch_top_tracks("token", "u1", 10)
+    assert mock_spotify.requests.count("/v1/me/top/tracks") == 1
+
+    mock_spotify.top_etag = '"v2"'
+    tracks = await _fetch_top_tracks("token", "u1", 10, refetch=True)
+
+    assert mock_spotify.requests.count("/v1/me/top/tracks") == 2
+    assert [track.track_uri for track in tracks] == ["spotify:track:top-v2"]
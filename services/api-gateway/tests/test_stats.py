@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app import stats as stats_module
+from app.coordination import distributed_lock
+from app.db import session_scope
+from app.models import (
+    CatalogStats,
+    FeatureDistribution,
+    PlaylistStats,
+    PlaylistTrack,
+    Track,
+    UserLibraryState,
+    UserTrack,
+)
+from app.services import catalog_stats
+from app.services.catalog_stats import CATALOG_STATS_ID, genre_histogram, refresh_catalog_stats
+from app.services.tracks import build_story_insights
+from app.services.user_stats import compute_user_library_stats, load_playlist_stats, refresh_playlist_stats
+
+
+@pytest.mark.asyncio
+async def test_stats_are_materialized(test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(stats_module, "_stats_cache", None)
+    async with session_scope() as session:
+        session.add(Track(track_uri="spotify:track:m1", track_name="One"))
+        await session.commit()
+
+    # A cold row is reported as empty instead of being computed inside the request.
+    cold = await test_client.get("/tracks/stats")
+    async with session_scope() as session:
+        missing = await session.get(CatalogStats, CATALOG_STATS_ID)
+        await refresh_catalog_stats(session)
+    warm = await test_client.get("/tracks/stats")
+    async with session_scope() as session:
+        await session.execute(delete(Track))
+        await session.execute(delete(CatalogStats))
+        await session.execute(delete(FeatureDistribution))
+        await session.commit()
+
+    assert cold.status_code == 200
+    assert cold.json()["totals"]["total_rows"] == 0
+    assert missing is None
+    assert warm.json()["totals"]["total_rows"] == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_readers_never_compute_behind_a_held_lock(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async with session_scope() as session:
+        session.add(Track(track_uri="spotify:track:f1", track_name="One", artist_names="A", genres="rock"))
+        await session.commit()
+        await refresh_catalog_stats(session)
+
+    async def _no_scan(session):
+        raise AssertionError("catalog aggregate computed on a request")
+
+    monkeypatch.setattr(catalog_stats, "compute_statistics", _no_scan)
+    monkeypatch.setattr(stats_module, "_stats_cache", None)
+    monkeypatch.setattr(stats_module, "_LOCK_WAIT_SECONDS", 0.2)
+    # Another worker holds the refresh lock and never publishes.
+    async with distributed_lock(stats_module._LOCK_KEY, 5):
+        async with session_scope() as session:
+            insights = await build_story_insights(session)
+        stats = await stats_module.get_stats()
+    async with session_scope() as session:
+        await session.execute(delete(Track))
+        await session.execute(delete(CatalogStats))
+        await session.execute(delete(FeatureDistribution))
+        await session.commit()
+
+    assert insights
+    assert stats.totals.total_rows == 1
+    assert stats_module._stats_cache is None
+
+
+@pytest.mark.asyncio
+async def test_catalog_stats_refresh_upserts_the_row(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        await session.execute(delete(CatalogStats))
+        await session.commit()
+        await refresh_catalog_stats(session)
+        session.add(Track(track_uri="spotify:track:u1", track_name="One"))
+        await session.commit()
+        await refresh_catalog_stats(session)
+        session.expire_all()
+        row = await session.get(CatalogStats, CATALOG_STATS_ID)
+        version, payload = row.version, row.payload
+        await session.execute(delete(Track))
+        await session.execute(delete(CatalogStats))
+        await session.commit()
+
+    assert version == 2
+    assert '"total_rows": 1' in payload
+
+
+@pytest.mark.asyncio
+async def test_genre_histogram_counts_every_row(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        session.add_all(
+            [
+                Track(track_uri="spotify:track:g1", track_name="One", genres="rock, indie"),
+                Track(track_uri="spotify:track:g2", track_name="Two", genres="rock"),
+                Track(track_uri="spotify:track:g3", track_name="Three", genres=None),
+            ]
+        )
+        await session.commit()
+        histogram = await genre_histogram(session)
+        await session.execute(delete(Track))
+        await session.commit()
+
+    assert histogram == [{"name": "rock", "count": 2}, {"name": "indie", "count": 1}]
+
+
+@pytest.mark.asyncio
+async def test_playlist_stats_are_precomputed(test_client: AsyncClient) -> None:
+    async with session_scope() as session:
+        session.add_all(
+            [
+                Track(track_uri="spotify:track:p1", track_name="One", artist_names="A", popularity=50),
+                Track(track_uri="spotify:track:p2", track_name="Two", artist_names="B", popularity=70),
+                PlaylistTrack(playlist_id="pl1", track_uri="spotify:track:p1"),
+                PlaylistTrack(playlist_id="pl1", track_uri="spotify:track:p2"),
+                PlaylistTrack(playlist_id="pl2", track_uri="spotify:track:p2"),
+            ]
+        )
+        await session.commit()
+        await refresh_playlist_stats(session, "u1", {"pl1": "snap-a", "pl2": "snap-b"})
+        await session.commit()
+        await refresh_playlist_stats(session, "u1", {"pl1": "snap-c"})
+        await session.commit()
+        entries = await load_playlist_stats(session, "u1")
+        for model in (PlaylistStats, PlaylistTrack, Track):
+            await session.execute(delete(model))
+        await session.commit()
+
+    assert [(entry.playlist_id, entry.snapshot_id) for entry in entries] == [("pl1", "snap-c")]
+    assert entries[0].stats.totals.total_rows == 2
+    assert entries[0].stats.totals.average_popularity == 60.0
+
+
+@pytest.mark.asyncio
+async def test_library_version_bump_invalidates_cached_stats(test_client: AsyncClient, fake_redis) -> None:
+    async with session_scope() as session:
+        session.add_all(
+            [
+                Track(track_uri="spotify:track:v1", track_name="One", artist_names="A"),
+                Track(track_uri="spotify:track:v2", track_name="Two", artist_names="B"),
+                UserTrack(user_id="versioned", track_uri="spotify:track:v1", weight=1.0),
+                UserLibraryState(user_id="versioned", version=1),
+            ]
+        )
+        await session.commit()
+        first = await compute_user_library_stats(session, "versioned")
+
+        # A write that bypasses refresh_user_library_stats: the cache still answers...
+        session.add(UserTrack(user_id="versioned", track_uri="spotify:track:v2", weight=1.0))
+        await session.commit()
+        cached = await compute_user_library_stats(session, "versioned")
+        # ...until the library version moves.
+        (await session.get(UserLibraryState, "versioned")).version = 2
+        await session.commit()
+        bumped = await compute_user_library_stats(session, "versioned")
+        for model in (UserLibraryState, UserTrack, Track):
+            await session.execute(delete(model))
+        await session.commit()
+
+    assert first.totals.total_rows == cached.totals.total_rows == 1
+    assert bumped.totals.total_rows == 2
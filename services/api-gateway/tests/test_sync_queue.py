@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app import sync_queue
+from app.coordination import distributed_lock
+from app.db import session_scope
+
+
+@pytest.mark.asyncio
+async def test_sync_runs_in_background(test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+    release = asyncio.Event()
+
+    async def fake_sync(session, user_id, force=False, progress=None, **_):
+        calls.append(user_id)
+        await progress("fetching", 0.1)
+        await release.wait()
+        return True
+
+    monkeypatch.setattr(sync_queue, "sync_user_library", fake_sync)
+
+    # Read endpoints answer immediately with whatever is stored and queue a sync once.
+    first, second = await asyncio.gather(
+        test_client.get("/auth/spotify/users/queued-user/playlists"),
+        test_client.get("/auth/spotify/users/queued-user/playlists/stats"),
+    )
+    assert first.status_code == 200 and first.json() == []
+    assert second.status_code == 200 and second.json() == []
+
+    for _ in range(50):
+        status = (await test_client.get("/auth/spotify/users/queued-user/sync")).json()
+        if status["state"] == "running":
+            break
+        await asyncio.sleep(0.01)
+    assert status["stage"] == "fetching"
+
+    release.set()
+    for _ in range(50):
+        status = (await test_client.get("/auth/spotify/users/queued-user/sync")).json()
+        if status["state"] == "done":
+            break
+        await asyncio.sleep(0.01)
+    assert status["state"] == "done"
+    assert status["progress"] == 1.0
+    assert calls == ["queued-user"]
+
+
+@pytest.mark.asyncio
+async def test_expired_running_lease_can_be_requeued(test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+
+    async def fake_sync(session, user_id, force=False, progress=None, **_):
+        calls.append(user_id)
+        return True
+
+    monkeypatch.setattr(sync_queue, "sync_user_library", fake_sync)
+
+    await sync_queue._write_status("lease-user", state="running", lease_until=time.time() + 60)
+    await sync_queue.enqueue_sync("lease-user", sync_queue.PRIORITY_INTERACTIVE)
+    assert (await sync_queue._read_status("lease-user"))["state"] == "running"
+
+    # The worker holding the lease died without renewing it.
+    await sync_queue._write_status("lease-user", lease_until=time.time() - 1)
+    await sync_queue.enqueue_sync("lease-user", sync_queue.PRIORITY_INTERACTIVE)
+    for _ in range(50):
+        if (await sync_queue._read_status("lease-user"))["state"] == "done":
+            break
+        await asyncio.sleep(0.01)
+    assert calls == ["lease-user"]
+
+
+@pytest.mark.asyncio
+async def test_sync_held_elsewhere_is_not_reported_done(test_client: AsyncClient) -> None:
+    async with distributed_lock("spotify:sync-lock:busy-user", ttl_seconds=5):
+        await sync_queue._run_sync("busy-user")
+    status = await sync_queue._read_status("busy-user")
+    assert status["state"] == "running" and status["lease_until"] > time.time()
+
+
+@pytest.mark.asyncio
+async def test_explicit_resync_refetches_cached_responses(
+    test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[tuple[str, bool]] = []
+
+    async def fake_sync(session, user_id, force=False, progress=None, refetch=False):
+        calls.append((user_id, refetch))
+        return True
+
+    monkeypatch.setattr(sync_queue, "sync_user_library", fake_sync)
+
+    async def _sync(user_id: str, explicit: bool) -> None:
+        async with session_scope() as session:
+            await sync_queue.request_sync(session, user_id, force=explicit)
+        for _ in range(50):
+            if (await sync_queue._read_status(user_id))["state"] == "done":
+                return
+            await asyncio.sleep(0.01)
+
+    # A first sync is queued for a missing library but is not an explicit resync.
+    await _sync("first-sync-user", explicit=False)
+    await _sync("resync-user", explicit=True)
+
+    assert calls == [("first-sync-user", False), ("resync-user", True)]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.db import session_scope
+from app.models import Track, UserTasteProfile, UserTrack
+from app.services.clustering import weighted_kmeans
+from app.services.taste_profile import load_taste_profile, profile_seed_uris, refresh_taste_profile
+
+
+def test_weighted_kmeans_separates_groups() -> None:
+    rng = np.random.default_rng(1)
+    calm = rng.normal(0.2, 0.02, size=(30, 3))
+    loud = rng.normal(0.8, 0.02, size=(10, 3))
+    centroids, shares, labels = weighted_kmeans(np.vstack([calm, loud]), k=2)
+
+    assert shares.tolist() == pytest.approx([0.75, 0.25])
+    assert centroids[0] == pytest.approx([0.2] * 3, abs=0.02)
+    assert set(labels[:30]) == {0} and set(labels[30:]) == {1}
+
+    # More clusters than points collapse instead of failing.
+    _, shares, _ = weighted_kmeans(np.zeros((3, 2)), k=4)
+    assert shares.tolist() == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_profile_is_built_and_seeds_span_clusters(test_client: AsyncClient) -> None:
+    tracks, library = [], []
+    for index in range(40):
+        mellow = index < 25
+        uri = f"spotify:track:{'mellow' if mellow else 'metal'}{index}"
+        tracks.append(
+            Track(
+                track_uri=uri,
+                track_name=uri,
+                energy=0.15 if mellow else 0.95,
+                acousticness=0.9 if mellow else 0.05,
+                tempo=80.0 if mellow else 170.0,
+                release_year=2015,
+            )
+        )
+        library.append(UserTrack(user_id="taste-user", track_uri=uri, weight=1.0 - index * 0.01))
+
+    async with session_scope() as session:
+        session.add_all(tracks + library)
+        await session.commit()
+        await refresh_taste_profile(session, "taste-user")
+        await session.commit()
+        profile = await load_taste_profile(session, "taste-user")
+        for model in (UserTasteProfile, UserTrack, Track):
+            await session.execute(delete(model))
+        await session.commit()
+
+    assert profile is not None and profile.track_count == 40
+    assert [round(cluster.weight, 2) for cluster in profile.clusters] == [0.68, 0.32]
+    assert profile.clusters[0].centroid["energy"] == pytest.approx(0.15)
+    seeds = profile_seed_uris(profile, 3)
+    assert seeds[0].startswith("spotify:track:mellow") and seeds[1].startswith("spotify:track:metal")
@@ -1,14 +1,25 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from .api import api_router
+from .cache import close_client as close_cache_client
 from .config import get_settings
 
 
 def create_app() -> FastAPI:
     settings = get_settings()
-    app = FastAPI(title=settings.app_name, version="0.1.0")
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        try:
+            yield
+        finally:
+            await close_cache_client()
+
+    app = FastAPI(title=settings.app_name, version="0.1.0", lifespan=lifespan)
     app.include_router(api_router)
 
     @app.get("/", summary="Service metadata", tags=["meta"])
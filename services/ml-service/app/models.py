@@ -10,6 +10,7 @@ class Track(Base):
     __tablename__ = "tracks"
 
     track_uri = Column("Track URI", String, primary_key=True)
+    track_id = Column("track_id", Integer, nullable=True, unique=True, index=True)
     track_name = Column("Track Name", String, nullable=False)
     album_name = Column("Album Name", String, nullable=True)
     artist_names = Column("Artist Name(s)", String, nullable=True)
@@ -2,25 +2,39 @@ from __future__ import annotations
 
 from typing import List
 
-from pydantic import BaseModel, Field, conlist
+from pydantic import BaseModel, Field, conlist, model_validator
 
 
 class SeedTrack(BaseModel):
-    track_uri: str = Field(..., description="Canonical track URI (spotify:track:…)" )
+    track_uri: str | None = Field(None, description="Canonical track URI (spotify:track:…)" )
+    track_id: int | None = Field(None, description="Dense catalog track id")
     weight: float = Field(1.0, ge=0.0, description="Optional per-seed weight")
 
 
 class HybridRecommendationRequest(BaseModel):
     seeds: conlist(SeedTrack, min_length=1) = Field(..., description="Seed tracks driving the hybrid rank")
-    candidate_uris: conlist(str, min_length=1) = Field(..., description="Candidate track URIs to score")
-    exploration: float = Field(0.05, ge=0.0, le=1.0, description="Bandit exploration rate (ε)")
+    candidate_ids: conlist(int, min_length=1) | None = Field(
+        None, description="Candidate dense track ids to score; seeds are then matched by track_id"
+    )
+    candidate_uris: conlist(str, min_length=1) | None = Field(None, description="Candidate track URIs to score")
+    exploration: float = Field(0.05, ge=0.0, le=1.0, description="Blend weight of the Thompson-sampled feedback posterior")
     alpha: float | None = Field(None, ge=0.0, le=1.0, description="Override for content weight")
     beta: float | None = Field(None, ge=0.0, le=1.0, description="Override for collaborative weight")
     gamma: float | None = Field(None, ge=0.0, le=1.0, description="Override for text weight")
 
+    @model_validator(mode="after")
+    def _check_identifiers(self) -> "HybridRecommendationRequest":
+        by_id = self.candidate_ids is not None
+        if not by_id and self.candidate_uris is None:
+            raise ValueError("candidate_ids or candidate_uris is required")
+        if any((seed.track_id if by_id else seed.track_uri) is None for seed in self.seeds):
+            raise ValueError("seeds must use the same identifier as the candidates")
+        return self
+
 
 class RankedTrack(BaseModel):
     track_uri: str
+    track_id: int | None = None
     score: float
     components: dict[str, float]
 
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import logging
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ..cache import get_client
+
+_logger = logging.getLogger(__name__)
+
+# Counter layout shared with the API gateway's feedback writer.
+TRACK_COUNTERS_KEY = "bandit:tracks:v1"
+SEED_COUNTERS_PREFIX = "bandit:seed:v1:"
+VERDICTS = ("up", "down")
+
+
+def seed_counters_key(seed_uri: str) -> str:
+    return f"{SEED_COUNTERS_PREFIX}{seed_uri}"
+
+
+async def fetch_feedback_counts(candidate_uris: Sequence[str], seed_uris: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return per-candidate (successes, failures) summed over global and seed contexts.
+
+    All hashes are read with a single pipelined round trip; missing Redis yields
+    zero counts so sampling degrades to an uninformed Beta(1, 1) prior.
+    """
+    size = len(candidate_uris)
+    successes = np.zeros(size, dtype=np.float64)
+    failures = np.zeros(size, dtype=np.float64)
+    client = await get_client()
+    if not client or not size:
+        return successes, failures
+
+    fields = [f"{uri}:{verdict}" for uri in candidate_uris for verdict in VERDICTS]
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hmget(TRACK_COUNTERS_KEY, fields)
+            for seed_uri in dict.fromkeys(seed_uris):
+                pipe.hmget(seed_counters_key(seed_uri), fields)
+            replies = await pipe.execute()
+    except Exception as exc:  # pragma: no cover - counters are best effort
+        _logger.debug("Failed to read bandit counters: %s", exc)
+        return successes, failures
+
+    for reply in replies:
+        counts = np.array([int(value) if value else 0 for value in reply], dtype=np.float64).reshape(size, 2)
+        successes += counts[:, 0]
+        failures += counts[:, 1]
+    return successes, failures
+
+
+def thompson_sample(successes: np.ndarray, failures: np.ndarray, rng: np.random.Generator | None = None) -> np.ndarray:
+    generator = rng or np.random.default_rng()
+    return generator.beta(successes + 1.0, failures + 1.0)
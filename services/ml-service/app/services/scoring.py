@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from sqlalchemy import select
@@ -9,6 +9,7 @@ from ..config import get_settings
 from ..db import get_session
 from ..models import Track
 from ..schemas import HybridRecommendationRequest, RankedTrack, SeedTrack
+from .bandit import fetch_feedback_counts, thompson_sample
 
 FEATURE_COLUMNS = [
     Track.danceability,
@@ -26,40 +27,45 @@ FEATURE_COLUMNS = [
 
 _settings = get_settings()
 
+TrackKey = Union[int, str]
+
 
 async def compute_hybrid_scores(request: HybridRecommendationRequest) -> List[RankedTrack]:
-    if not request.seeds or not request.candidate_uris:
+    by_id = request.candidate_ids is not None
+    candidate_keys: List[TrackKey] = list(dict.fromkeys(request.candidate_ids if by_id else request.candidate_uris or []))
+    if not request.seeds or not candidate_keys:
         return []
 
     alpha, beta, gamma = _resolve_weights(request)
 
     async with get_session() as session:
-        seed_uris = [seed.track_uri for seed in request.seeds]
-        candidate_uris = list(dict.fromkeys(request.candidate_uris))
+        seed_keys = [_seed_key(seed, by_id) for seed in request.seeds]
 
-        seeds = await _fetch_tracks(session, seed_uris)
+        seeds = await _fetch_tracks(session, seed_keys, by_id)
         if not seeds:
             return []
 
-        seed_weights = _normalize_seed_weights(request.seeds, seeds)
+        seed_weights = _normalize_seed_weights(request.seeds, seeds, by_id)
         if not seed_weights:
             return []
 
-        ordered_seed_uris = list(seed_weights.keys())
-        seed_tracks = [seeds[uri] for uri in ordered_seed_uris]
-        weight_values = [seed_weights[uri] for uri in ordered_seed_uris]
+        seed_tracks = [seeds[key] for key in seed_weights]
+        weight_values = list(seed_weights.values())
+        ordered_seed_uris = [track.track_uri for track in seed_tracks]
 
         centroid = _compute_weighted_centroid(seed_tracks, weight_values)
 
-        candidates = await _fetch_tracks(session, candidate_uris)
+        candidates = await _fetch_tracks(session, candidate_keys, by_id)
         if not candidates:
             return []
 
+        track_ids: Dict[str, Optional[int]] = {}
         results: List[Tuple[str, float, Dict[str, float]]] = []
-        for uri in candidate_uris:
-            track = candidates.get(uri)
+        for key in candidate_keys:
+            track = candidates.get(key)
             if track is None:
                 continue
+            track_ids[track.track_uri] = track.track_id
             content_component = _content_similarity(track, centroid)
             collaborative_component = _collaborative_component(track)
             text_component = _text_component(track, seed_tracks)
@@ -72,7 +78,7 @@ async def compute_hybrid_scores(request: HybridRecommendationRequest) -> List[Ra
             score = float(np.dot(weights, components_array) / np.clip(weights.sum(), 1e-6, None))
             results.append(
                 (
-                    uri,
+                    track.track_uri,
                     score,
                     {
                         "content": float(content_component),
@@ -82,11 +88,11 @@ async def compute_hybrid_scores(request: HybridRecommendationRequest) -> List[Ra
                 )
             )
 
-    results.sort(key=lambda item: item[1], reverse=True)
-    results = _apply_epsilon_greedy(results, request.exploration)
+    # Bandit counters are keyed by URI, the identifier feedback arrives with.
+    results = await _apply_thompson_sampling(results, request.exploration, ordered_seed_uris)
 
     return [
-        RankedTrack(track_uri=uri, score=score, components=components)
+        RankedTrack(track_uri=uri, track_id=track_ids.get(uri), score=score, components=components)
         for uri, score, components in results
     ]
 
@@ -98,29 +104,41 @@ def _resolve_weights(request: HybridRecommendationRequest) -> Tuple[float, float
     return alpha, beta, gamma
 
 
-async def _fetch_tracks(session, uris: Sequence[str]) -> Dict[str, Track]:
-    if not uris:
+def _seed_key(seed: SeedTrack, by_id: bool) -> Optional[TrackKey]:
+    return seed.track_id if by_id else seed.track_uri
+
+
+async def _fetch_tracks(session, keys: Sequence[Optional[TrackKey]], by_id: bool) -> Dict[TrackKey, Track]:
+    """Load tracks by dense ``track_id`` or by URI, keyed the same way they were requested."""
+    column = Track.track_id if by_id else Track.track_uri
+    wanted = [key for key in keys if key is not None]
+    if not wanted:
         return {}
-    rows = (await session.execute(select(Track).where(Track.track_uri.in_(uris)))).scalars().all()
-    return {row.track_uri: row for row in rows}
+    rows = (await session.execute(select(Track).where(column.in_(wanted)))).scalars().all()
+    return {getattr(row, column.key): row for row in rows}
 
 
-def _normalize_seed_weights(seeds: Sequence[SeedTrack], track_map: Dict[str, Track]) -> Dict[str, float]:
+def _normalize_seed_weights(
+    seeds: Sequence[SeedTrack],
+    track_map: Dict[TrackKey, Track],
+    by_id: bool,
+) -> Dict[TrackKey, float]:
     weighted = []
     for seed in seeds:
-        track = track_map.get(seed.track_uri)
+        key = _seed_key(seed, by_id)
+        track = track_map.get(key)
         if not track:
             continue
         weight = float(seed.weight) if seed.weight and seed.weight > 0 else 1.0
-        weighted.append((seed.track_uri, weight))
+        weighted.append((key, weight))
     if not weighted:
         return {}
     weights = np.array([weight for _, weight in weighted], dtype=np.float32)
     weights_sum = float(weights.sum())
     if weights_sum <= 0:
         normalized = 1.0 / len(weighted)
-        return {uri: normalized for uri, _ in weighted}
-    return {uri: float(weight / weights_sum) for uri, weight in weighted}
+        return {key: normalized for key, _ in weighted}
+    return {key: float(weight / weights_sum) for key, weight in weighted}
 
 
 def _track_vector(track: Track) -> np.ndarray:
@@ -177,14 +195,23 @@ def _text_component(track: Track, seed_tracks: Iterable[Track]) -> float:
     return float(np.clip(1.0 - min(best, 50) / 50.0, 0.0, 1.0))
 
 
-def _apply_epsilon_greedy(results: List[Tuple[str, float, Dict[str, float]]], epsilon: float) -> List[Tuple[str, float, Dict[str, float]]]:
-    if epsilon <= 0 or len(results) < 2:
-        return results
-    seed = hash(tuple(uri for uri, _, _ in results)) & 0xFFFFFFFF
-    rng = np.random.default_rng(seed)
-    exploration_span = max(1, int(round(epsilon * len(results))))
-    exploration_span = min(exploration_span, len(results) - 1)
-    swap_index = rng.integers(1, exploration_span + 1)
-    mutable = results.copy()
-    mutable[0], mutable[swap_index] = mutable[swap_index], mutable[0]
-    return mutable
+async def _apply_thompson_sampling(
+    results: List[Tuple[str, float, Dict[str, float]]],
+    exploration: float,
+    seed_uris: Sequence[str],
+) -> List[Tuple[str, float, Dict[str, float]]]:
+    if exploration <= 0 or len(results) < 2:
+        return sorted(results, key=lambda item: item[1], reverse=True)
+
+    uris = [uri for uri, _, _ in results]
+    successes, failures = await fetch_feedback_counts(uris, seed_uris)
+    samples = thompson_sample(successes, failures)
+    scores = np.array([score for _, score, _ in results], dtype=np.float64)
+    blended = (1.0 - exploration) * scores + exploration * samples
+
+    explored = [
+        (uri, float(blended[idx]), {**components, "bandit": float(samples[idx])})
+        for idx, (uri, _, components) in enumerate(results)
+    ]
+    explored.sort(key=lambda item: item[1], reverse=True)
+    return explored
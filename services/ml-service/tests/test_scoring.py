@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import pytest
+from pydantic import ValidationError
+
+from app.db import get_session
+from app.models import Track
+from app.schemas import HybridRecommendationRequest
+from app.services.scoring import compute_hybrid_scores
+
+
+def test_request_needs_matching_identifiers() -> None:
+    with pytest.raises(ValidationError):
+        HybridRecommendationRequest(seeds=[{"track_uri": "spotify:track:a"}])
+    with pytest.raises(ValidationError):
+        HybridRecommendationRequest(seeds=[{"track_uri": "spotify:track:a"}], candidate_ids=[1])
+
+    request = HybridRecommendationRequest(seeds=[{"track_id": 1}], candidate_ids=[2, 3])
+    assert request.candidate_ids == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_scores_candidates_by_dense_id(database: None) -> None:
+    async with get_session() as session:
+        session.add_all(
+            [
+                Track(track_uri="spotify:track:seed", track_id=1, track_name="seed", energy=0.9, valence=0.1),
+                Track(track_uri="spotify:track:near", track_id=2, track_name="near", energy=0.85, valence=0.1),
+                Track(track_uri="spotify:track:far", track_id=3, track_name="far", energy=0.05, valence=0.9),
+            ]
+        )
+        await session.commit()
+
+    request = HybridRecommendationRequest(seeds=[{"track_id": 1}], candidate_ids=[3, 2, 99], exploration=0.0)
+    results = await compute_hybrid_scores(request)
+
+    # Unknown ids are dropped; every result carries both identifiers.
+    assert [(item.track_id, item.track_uri) for item in results] == [
+        (2, "spotify:track:near"),
+        (3, "spotify:track:far"),
+    ]